@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Tiefenraster je Gewässer: minimale Fahrrinnentiefe (DRVAL2, Fallback
+DRVAL1) der DEPARE/DRGARE-Flächen auf einem georeferenzierten Gitter
+(Standard ~15 m), damit Live-Tiefe, Vorausschau und Routen-Check ohne
+Punkt-in-Polygon auskommen.
+
+Jede Zelle enthält:
+  NONE  — keine Tiefenfläche überdeckt die Zelle
+  EDGE  — mindestens eine Flächenkante läuft durch die Zelle; hier
+          entscheidet weiter der Polygon-Test (Aufrufer-Fallback)
+  k     — sonst: Code der minimalen Tiefe aller enthaltenden Flächen
+
+Weil durch eine Nicht-Kanten-Zelle keine Kante läuft, ist die Menge der
+enthaltenden Flächen in der ganzen Zelle gleich — der Rasterwert ist dort
+exakt, nicht nur eine Näherung.
+
+Das Gitter ist dünn besetzt (Flüsse füllen ihre Bbox kaum): nur Blöcke von
+BLOCK×BLOCK Zellen mit Inhalt werden gespeichert. Tiefen stehen als uint16-
+Code in einer aufsteigend sortierten Wertetabelle — so bleibt der Wert
+bitgenau der Kartenwert, und min() über Codes = min() über Tiefen.
+
+Datei (per mmap gelesen):
+  Header   magic, tag, x0, y0, dx, dy, Spalten, Zeilen, Blöcke x/y,
+           gespeicherte Blöcke, Anzahl Tiefenwerte
+  values   float64 × K          Tiefenwerte, aufsteigend
+  blocks   int32 × bx·by        Block → Nr. im Datenteil, -1 = leer
+  data     uint16 × BLOCK² je gespeichertem Block
+
+Reines Python, keine Abhängigkeiten — wie mvt.py / pmtiles.py.
+"""
+
+import math
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+
+MAGIC = b"BOATDG1\x00"
+BLOCK = 64
+RES_M = 15.0
+
+NONE = 0
+_EDGE_CODE = 0xFFFF
+EDGE = object()   # Rückgabe von lookup(): Kante → Polygon-Test nötig
+
+_HEADER = struct.Struct("<8sQ4d6I")
+_EPS = 1e-7       # in Zellen: Kanten auf Zellgrenzen markieren beide Seiten
+
+
+def _polygon_parts(geom: dict) -> list:
+    coords = geom.get("coordinates") or []
+    if geom.get("type") == "Polygon":
+        return [coords]
+    if geom.get("type") == "MultiPolygon":
+        return coords
+    return []
+
+
+class _Builder:
+    def __init__(self, x0, y0, dx, dy, ncols, nrows):
+        self.x0, self.y0, self.dx, self.dy = x0, y0, dx, dy
+        self.ncols, self.nrows = ncols, nrows
+        self.bx = math.ceil(ncols / BLOCK)
+        self.blocks = {}   # (bx, by) → array('H', BLOCK²)
+
+    def _block(self, c, r):
+        key = (c // BLOCK, r // BLOCK)
+        blk = self.blocks.get(key)
+        if blk is None:
+            blk = self.blocks[key] = array("H", bytes(2 * BLOCK * BLOCK))
+        return blk
+
+    def fill_span(self, r, c0, c1, code):
+        """Zellen [c0, c1) der Zeile r auf min(aktuell, code) setzen."""
+        c0, c1 = max(c0, 0), min(c1, self.ncols)
+        rr = (r % BLOCK) * BLOCK
+        c = c0
+        while c < c1:
+            blk = self._block(c, r)
+            stop = min(c1, (c // BLOCK + 1) * BLOCK)
+            for k in range(rr + c % BLOCK, rr + (stop - 1) % BLOCK + 1):
+                cur = blk[k]
+                if cur == NONE or code < cur:
+                    blk[k] = code
+            c = stop
+
+    def mark(self, c, r):
+        if 0 <= c < self.ncols and 0 <= r < self.nrows:
+            self._block(c, r)[(r % BLOCK) * BLOCK + c % BLOCK] = _EDGE_CODE
+
+    def _rows_crossed(self, ring):
+        """Zeile → x-Schnittpunkte der Zeilenmitte mit den Ring-Kanten (in
+        Zellkoordinaten) — gleiche Halboffen-Regel wie das Ray-Casting."""
+        rows = {}
+        n = len(ring)
+        for i in range(n):
+            ax, ay = (ring[i - 1][0] - self.x0) / self.dx, (ring[i - 1][1] - self.y0) / self.dy
+            bx, by = (ring[i][0] - self.x0) / self.dx, (ring[i][1] - self.y0) / self.dy
+            if ay == by:
+                continue
+            lo, hi = min(ay, by), max(ay, by)
+            r0 = max(0, math.ceil(lo - 0.5))
+            r1 = min(self.nrows, math.ceil(hi - 0.5))
+            for r in range(r0, r1):
+                yc = r + 0.5
+                rows.setdefault(r, []).append(ax + (bx - ax) * (yc - ay) / (by - ay))
+        return rows
+
+    @staticmethod
+    def _spans(xs):
+        """Sortierte Schnittpunkte → halboffene Zell-Spannen innen (Zellmitte)."""
+        xs.sort()
+        out = []
+        for k in range(0, len(xs) - 1, 2):
+            c0 = math.ceil(xs[k] - 0.5)
+            c1 = math.ceil(xs[k + 1] - 0.5)
+            if c1 > c0:
+                out.append((c0, c1))
+        return out
+
+    def fill_polygon(self, rings, code):
+        """Innen = im Außenring und in keinem Loch (wie _point_in_polygon)."""
+        outer = self._rows_crossed(rings[0])
+        holes = [self._rows_crossed(h) for h in rings[1:]]
+        for r, xs in outer.items():
+            spans = self._spans(xs)
+            cut = sorted(s for h in holes if r in h for s in self._spans(h[r]))
+            for c0, c1 in spans:
+                for h0, h1 in cut:
+                    if h1 <= c0 or h0 >= c1:
+                        continue
+                    if h0 > c0:
+                        self.fill_span(r, c0, h0, code)
+                    c0 = max(c0, h1)
+                if c1 > c0:
+                    self.fill_span(r, c0, c1, code)
+
+    def mark_ring(self, ring):
+        """Alle Zellen markieren, die eine Ring-Kante berührt (Supercover)."""
+        for i in range(len(ring)):
+            ax, ay = (ring[i - 1][0] - self.x0) / self.dx, (ring[i - 1][1] - self.y0) / self.dy
+            bx, by = (ring[i][0] - self.x0) / self.dx, (ring[i][1] - self.y0) / self.dy
+            if ax > bx:
+                ax, ay, bx, by = bx, by, ax, ay
+            c0 = max(0, math.floor(ax - _EPS))
+            c1 = min(self.ncols - 1, math.floor(bx + _EPS))
+            for c in range(c0, c1 + 1):
+                if bx == ax:
+                    ya, yb = ay, by
+                else:
+                    xa, xb = max(ax, c), min(bx, c + 1)
+                    ya = ay + (by - ay) * (xa - ax) / (bx - ax)
+                    yb = ay + (by - ay) * (xb - ax) / (bx - ax)
+                if ya > yb:
+                    ya, yb = yb, ya
+                for r in range(max(0, math.floor(ya - _EPS)),
+                               min(self.nrows - 1, math.floor(yb + _EPS)) + 1):
+                    self.mark(c, r)
+
+
+class DepthGrid:
+    """Gespeichertes Tiefenraster (build() oder load())."""
+
+    def __init__(self, header: tuple, values, blocks, data):
+        (_, self.tag, self.x0, self.y0, self.dx, self.dy,
+         self.ncols, self.nrows, self.bx, self.by, _, _) = header
+        self._header = header
+        self.values = values
+        self._blocks = blocks
+        self._data = data
+
+    def lookup(self, lon, lat):
+        """Tiefe (float), None (keine Fläche) oder EDGE (Polygon-Test nötig)."""
+        c = math.floor((lon - self.x0) / self.dx)
+        r = math.floor((lat - self.y0) / self.dy)
+        if not (0 <= c < self.ncols and 0 <= r < self.nrows):
+            return None
+        b = self._blocks[(r // BLOCK) * self.bx + c // BLOCK]
+        if b < 0:
+            return None
+        code = self._data[b * BLOCK * BLOCK + (r % BLOCK) * BLOCK + c % BLOCK]
+        if code == NONE:
+            return None
+        if code == _EDGE_CODE:
+            return EDGE
+        return self.values[code - 1]
+
+    def save(self, path):
+        """In eine Datei schreiben (atomar über .building)."""
+        path = Path(path)
+        tmp = path.with_suffix(".building")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(*self._header))
+            f.write(array("d", self.values).tobytes())
+            f.write(array("i", self._blocks).tobytes())
+            if len(self._blocks) % 2:
+                f.write(b"\x00" * 4)
+            f.write(array("H", self._data).tobytes())
+        os.replace(tmp, path)
+
+
+def build(entries, geometry, res_m=RES_M, tag=0):
+    """
+    Raster aus Tiefenflächen bauen. BLOCKING, CPU-lastig (Offline-Schritt).
+
+    entries:  Sequenz (minx, miny, maxx, maxy, depth)
+    geometry: Funktion Eintrags-Nr. → GeoJSON-(Multi-)Polygon
+    Rückgabe: DepthGrid oder None (keine Flächen / zu viele Tiefenwerte).
+    """
+    if not entries:
+        return None
+    values = sorted({e[4] for e in entries})
+    if len(values) >= _EDGE_CODE - 1:
+        return None
+    code_of = {v: k + 1 for k, v in enumerate(values)}
+
+    x0 = min(e[0] for e in entries)
+    y0 = min(e[1] for e in entries)
+    x1 = max(e[2] for e in entries)
+    y1 = max(e[3] for e in entries)
+    dy = res_m / 111320.0
+    dx = res_m / (111320.0 * max(math.cos(math.radians((y0 + y1) / 2)), 0.01))
+    ncols = max(1, math.ceil((x1 - x0) / dx) + 1)
+    nrows = max(1, math.ceil((y1 - y0) / dy) + 1)
+    b = _Builder(x0, y0, dx, dy, ncols, nrows)
+
+    for i, e in enumerate(entries):
+        code = code_of[e[4]]
+        for rings in _polygon_parts(geometry(i)):
+            if rings:
+                b.fill_polygon(rings, code)
+    # Kanten zuletzt — überschreiben jede Tiefe
+    for i in range(len(entries)):
+        for rings in _polygon_parts(geometry(i)):
+            for ring in rings:
+                b.mark_ring(ring)
+
+    nbx, nby = b.bx, math.ceil(nrows / BLOCK)
+    blocks = array("i", [-1]) * (nbx * nby)
+    data = array("H")
+    for n, ((kx, ky), blk) in enumerate(sorted(b.blocks.items())):
+        blocks[ky * nbx + kx] = n
+        data.extend(blk)
+    header = (MAGIC, tag, x0, y0, dx, dy, ncols, nrows, nbx, nby,
+              len(b.blocks), len(values))
+    return DepthGrid(header, array("d", values), blocks, data)
+
+
+def load(path) -> DepthGrid:
+    """Gespeichertes Raster per mmap öffnen (keine Kopie der Arrays)."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        header = _HEADER.unpack_from(mm, 0)
+        if header[0] != MAGIC:
+            raise ValueError(f"{path}: kein Tiefenraster")
+        nbx, nby, stored, nvals = header[8:12]
+        off = _HEADER.size
+        values = memoryview(mm)[off:off + 8 * nvals].cast("d")
+        off += 8 * nvals
+        blocks = memoryview(mm)[off:off + 4 * nbx * nby].cast("i")
+        off += 4 * (nbx * nby + (nbx * nby) % 2)
+        size = 2 * BLOCK * BLOCK * stored
+        data = memoryview(mm)[off:off + size].cast("H")
+        if len(data) * 2 != size:
+            raise ValueError(f"{path}: Tiefenraster unvollständig")
+    except Exception:
+        mm.close()
+        raise
+    # Die memoryviews halten das mmap offen, solange das Raster lebt
+    return DepthGrid(header, values, blocks, data)
@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+Kompakter, spaltenorientierter Feature-Speicher für die IENC-Daten.
+
+Die <klasse>.geojson-Dateien sind für Abfragen unhandlich: json.load der
+Elbe-depare kostet Sekunden und hunderte MB verschachtelter Python-Listen,
+obwohl check_route/depth_scan meist nur Bounding-Boxen und eine Handvoll
+Zahlen brauchen. extract_geojson schreibt deshalb zusätzlich EINE Datei je
+Gewässer (features.store) mit, je Objektklasse:
+
+  bbox      float64 × 4n     (lon_min, lat_min, lon_max, lat_max)
+  gtype     uint8   × n      GeoJSON-Typ (siehe _GTYPES)
+  geom_off  uint32  × n+1    Feature → Teile (Polygone/Linien/Punkte)
+  part_off  uint32  × P+1    Teil    → Ringe
+  ring_off  uint32  × R+1    Ring    → Koordinaten
+  coords    float64 × dim·C  flach, dim = 2 (oder 3 bei Lotungen mit Tiefe)
+  num:<A>   float64 × n      Hot-Attribute (DRVAL1/DRVAL2/VERCLR/SCAMIN), NaN = fehlt
+  prop_off  uint32  × n+1    Feature → Bytes in props
+  props     JSON je Feature (UTF-8), erst beim Zugriff dekodiert
+
+Die Datei wird per mmap geöffnet; die Spalten sind memoryviews direkt auf
+die gemappten Seiten, Geometrien und Attribute entstehen erst beim Zugriff.
+Das Inhaltsverzeichnis (JSON) steht am Dateiende, damit Klassen beim
+Schreiben nacheinander gestreamt werden können.
+
+Reines Python, keine Abhängigkeiten — wie mvt.py / pmtiles.py.
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from array import array
+from pathlib import Path
+
+MAGIC = b"BOATFS1\x00"
+VERSION = 1
+STORE_NAME = "features.store"
+
+# Attribute, die zusätzlich als float64-Spalte abgelegt werden (Tiefen-/
+# Durchfahrtshöhen-Checks, SCAMIN fürs Tile-Bucketing — ohne JSON-Dekodierung)
+NUMERIC_ATTRS = ("DRVAL1", "DRVAL2", "VERCLR", "SCAMIN")
+
+_GTYPES = ["Point", "LineString", "Polygon", "MultiPoint", "MultiLineString", "MultiPolygon"]
+_GTYPE_CODE = {t: i for i, t in enumerate(_GTYPES)}
+
+_TRAILER = struct.Struct("<QI8s")   # toc_offset, toc_length, magic
+
+# ClassBuilder mit spool_dir: ab so vielen gepufferten Koordinaten-/props-
+# Bytes wird in die Temp-Dateien ausgelagert
+SPOOL_BYTES = 1 << 20
+
+
+def _num(v) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _bbox(parts):
+    xs = [c[0] for rings in parts for ring in rings for c in ring]
+    ys = [c[1] for rings in parts for ring in rings for c in ring]
+    if not xs:
+        return None
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _parts(gtype: str, coords):
+    """GeoJSON-Koordinaten → einheitlich [teil][ring][koordinate]."""
+    if gtype == "Point":
+        return [[[coords]]]
+    if gtype == "MultiPoint":
+        return [[[c]] for c in coords]
+    if gtype == "LineString":
+        return [[coords]]
+    if gtype == "MultiLineString":
+        return [[line] for line in coords]
+    if gtype == "Polygon":
+        return [coords]
+    if gtype == "MultiPolygon":
+        return coords
+    return None
+
+
+# ==================== WRITER ====================
+
+class ClassBuilder:
+    """
+    Spalten EINER Objektklasse sammeln — kompakt in arrays statt
+    verschachtelter Python-Listen, damit extract_geojson alle Klassen
+    gleichzeitig streamen kann. Danach StoreWriter.add_builder().
+
+    Mit spool_dir wandern die Spalten ab SPOOL_BYTES gepufferten Daten in
+    Temp-Dateien <spool_dir>/<klasse>.<spalte> (angehängt); im Speicher
+    bleibt je Klasse nur der Puffer. add_builder hängt Datei + Rest an.
+    """
+
+    def __init__(self, cls: str, spool_dir=None):
+        self.cls = cls
+        self.bbox, self.gtype = array("d"), array("B")
+        self.geom_off, self.part_off, self.ring_off = array("I", [0]), array("I", [0]), array("I", [0])
+        self.coords = array("d")
+        self.nums = {a: array("d") for a in NUMERIC_ATTRS}
+        self.prop_off, self.props = array("I", [0]), bytearray()
+        self.dim = 2
+        self.spool_dir = Path(spool_dir) if spool_dir is not None else None
+        self._count = 0
+        # bereits ausgelagert: Einträge in ring_off/part_off, Koordinaten-
+        # Werte (floats) und props-Bytes — Basis für die Offsets
+        self._ring_base = self._part_base = self._coord_base = self._prop_base = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, feat: dict) -> bool:
+        """GeoJSON-Feature anhängen. Features ohne verwertbare Geometrie
+        (leer, GeometryCollection) fallen weg — wie beim Lesen der GeoJSON-
+        Dateien. False = übersprungen."""
+        geom = feat.get("geometry") or {}
+        t = geom.get("type")
+        parts = _parts(t, geom.get("coordinates")) if geom.get("coordinates") else None
+        if not parts:
+            return False
+        box = _bbox(parts)
+        if box is None:
+            return False
+        coords, dim = self.coords, self.dim
+        if dim == 2 and any(len(c) > 2 for rings in parts for ring in rings for c in ring):
+            # Erste 3D-Koordinate: bisherige Koordinaten auf dim=3 umstellen
+            coords, dim = self.coords, self.dim = _widen(coords), 3
+            self._widen_spool()
+        cbase = self._coord_base
+        for rings in parts:
+            for ring in rings:
+                for c in ring:
+                    if dim == 3:
+                        coords.extend((c[0], c[1], c[2] if len(c) > 2 else math.nan))
+                    else:
+                        coords.extend((c[0], c[1]))
+                self.ring_off.append((cbase + len(coords)) // dim)
+            self.part_off.append(self._ring_base + len(self.ring_off) - 1)
+        self.geom_off.append(self._part_base + len(self.part_off) - 1)
+        self.bbox.extend(box)
+        self.gtype.append(_GTYPE_CODE[t])
+        p = feat.get("properties") or {}
+        for a in NUMERIC_ATTRS:
+            self.nums[a].append(_num(p.get(a)))
+        self.props += json.dumps(p, ensure_ascii=False, default=str).encode("utf-8")
+        self.prop_off.append(self._prop_base + len(self.props))
+        self._count += 1
+        if self.spool_dir is not None and 8 * len(coords) + len(self.props) > SPOOL_BYTES:
+            self.spool()
+        return True
+
+    def columns(self) -> list:
+        """[(spalte, puffer), ...] in Store-Reihenfolge."""
+        return ([("bbox", self.bbox), ("gtype", self.gtype), ("geom_off", self.geom_off),
+                 ("part_off", self.part_off), ("ring_off", self.ring_off),
+                 ("coords", self.coords), ("prop_off", self.prop_off), ("props", self.props)]
+                + [("num:" + a, self.nums[a]) for a in NUMERIC_ATTRS])
+
+    def _spool_path(self, name: str) -> Path:
+        return self.spool_dir / f"{self.cls}.{name.replace(':', '_')}"
+
+    def spool(self):
+        """Puffer an die Temp-Dateien anhängen und leeren."""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._ring_base += len(self.ring_off)
+        self._part_base += len(self.part_off)
+        self._coord_base += len(self.coords)
+        self._prop_base += len(self.props)
+        for name, col in self.columns():
+            if col:
+                with open(self._spool_path(name), "ab") as f:
+                    f.write(col)
+                del col[:]
+
+    def _widen_spool(self):
+        """Ausgelagerte 2D-Koordinaten auf dim=3 umschreiben (einmal je Klasse)."""
+        if not self._coord_base:
+            return
+        src = self._spool_path("coords")
+        tmp = src.with_suffix(src.suffix + ".tmp")
+        with open(src, "rb") as fin, open(tmp, "wb") as fout:
+            for chunk in iter(lambda: fin.read(1 << 20), b""):
+                fout.write(_widen(array("d", chunk)))
+        os.replace(tmp, src)
+        self._coord_base = self._coord_base // 2 * 3
+
+    def chunks(self, name: str, col):
+        """Inhalt einer Spalte: ausgelagerter Teil, dann der Puffer."""
+        if self.spool_dir is not None and self._spool_path(name).exists():
+            with open(self._spool_path(name), "rb") as f:
+                yield from iter(lambda: f.read(1 << 20), b"")
+        if col:
+            yield bytes(col)
+
+
+def _widen(coords):
+    """Flache 2D-Koordinaten → 3D mit NaN als Tiefe."""
+    flat = array("d")
+    for i in range(0, len(coords), 2):
+        flat.extend((coords[i], coords[i + 1], math.nan))
+    return flat
+
+
+class StoreWriter:
+    """
+    features.store schreiben: Klassen nacheinander mit add_class() (oder
+    fertig gesammelt mit add_builder()) anhängen, am Ende close() (schreibt
+    das Inhaltsverzeichnis, ersetzt atomar).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._tmp = self.path.with_suffix(".building")
+        self._f = open(self._tmp, "wb")
+        self._f.write(MAGIC)
+        self._toc = {"version": VERSION, "classes": {}}
+
+    def _section(self, chunks, typecode: str) -> list:
+        # 8-Byte-Ausrichtung, damit memoryview.cast direkt passt
+        pad = (-self._f.tell()) % 8
+        if pad:
+            self._f.write(b"\x00" * pad)
+        off = self._f.tell()
+        for data in chunks:
+            self._f.write(data)
+        return [off, self._f.tell() - off, typecode]
+
+    def add_class(self, cls: str, features) -> int:
+        """GeoJSON-Features (Iterable von Dicts) einer Klasse anhängen. Gibt
+        die Anzahl der übernommenen Features zurück."""
+        b = ClassBuilder(cls)
+        for feat in features:
+            b.add(feat)
+        return self.add_builder(b)
+
+    def add_builder(self, b: ClassBuilder) -> int:
+        sections = {name: self._section(b.chunks(name, col), getattr(col, "typecode", "B"))
+                    for name, col in b.columns()}
+        self._toc["classes"][b.cls] = {"count": len(b), "dim": b.dim, "sections": sections}
+        return len(b)
+
+    def close(self):
+        toc = json.dumps(self._toc).encode("utf-8")
+        off = self._f.tell()
+        self._f.write(toc)
+        self._f.write(_TRAILER.pack(off, len(toc), MAGIC))
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        self._f.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+def write_store(path, classes: dict) -> dict:
+    """Komplett schreiben aus {klasse: [GeoJSON-Feature, ...]} → {klasse: n}."""
+    w = StoreWriter(path)
+    try:
+        counts = {cls: w.add_class(cls, feats) for cls, feats in sorted(classes.items())}
+    except Exception:
+        w.abort()
+        raise
+    w.close()
+    return counts
+
+
+def convert_geojson_dir(geojson_dir, classes=None) -> dict:
+    """Bestehende <klasse>.geojson-Dateien (vor Einführung des Stores
+    konvertierte Karten) in features.store überführen. Klasse für Klasse,
+    damit nie mehr als eine GeoJSON-Datei im Speicher liegt. BLOCKING."""
+    gdir = Path(geojson_dir)
+    w = StoreWriter(gdir / STORE_NAME)
+    counts = {}
+    try:
+        for gj in sorted(gdir.glob("*.geojson")):
+            if classes is not None and gj.stem not in classes:
+                continue
+            with open(gj, "r", encoding="utf-8") as f:
+                feats = json.load(f).get("features", [])
+            counts[gj.stem] = w.add_class(gj.stem, feats)
+            del feats
+    except Exception:
+        w.abort()
+        raise
+    w.close()
+    return counts
+
+
+# ==================== READER ====================
+
+class ClassLayer:
+    """Spalten einer Objektklasse (memoryviews auf die gemappte Datei)."""
+
+    def __init__(self, mm, meta: dict):
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+        cols = {}
+        for name, (off, length, typecode) in meta["sections"].items():
+            cols[name] = memoryview(mm)[off:off + length].cast(typecode)
+        self._cols = cols
+        self.bboxes = cols["bbox"]
+
+    def __len__(self):
+        return self.count
+
+    def bbox(self, i: int):
+        b = self.bboxes
+        return (b[4 * i], b[4 * i + 1], b[4 * i + 2], b[4 * i + 3])
+
+    def number(self, i: int, attr: str):
+        """Hot-Attribut als float (None wenn fehlend/nicht numerisch)."""
+        v = self.numbers(attr)[i]
+        return None if v != v else v
+
+    def numbers(self, attr: str):
+        """Spalte eines Hot-Attributs (float64 × n, NaN = fehlt). Stores von
+        vor Einführung der Spalte: einmal aus den props nachgerechnet."""
+        col = self._cols.get("num:" + attr)
+        if col is None:
+            col = self._cols["num:" + attr] = array(
+                "d", (_num(self.props(i).get(attr)) for i in range(self.count)))
+        return col
+
+    def props(self, i: int) -> dict:
+        po = self._cols["prop_off"]
+        return json.loads(bytes(self._cols["props"][po[i]:po[i + 1]]))
+
+    def gtype(self, i: int) -> str:
+        return _GTYPES[self._cols["gtype"][i]]
+
+    def _coord(self, k: int):
+        c, d = self._cols["coords"], self.dim
+        if d == 3:
+            z = c[3 * k + 2]
+            return [c[3 * k], c[3 * k + 1]] if z != z else [c[3 * k], c[3 * k + 1], z]
+        return [c[2 * k], c[2 * k + 1]]
+
+    def _nested(self, i: int):
+        go, po, ro = self._cols["geom_off"], self._cols["part_off"], self._cols["ring_off"]
+        return [[[self._coord(k) for k in range(ro[r], ro[r + 1])]
+                 for r in range(po[p], po[p + 1])]
+                for p in range(go[i], go[i + 1])]
+
+    def geometry(self, i: int) -> dict:
+        """GeoJSON-Geometrie-Dict (wie aus der .geojson-Datei gelesen)."""
+        t = self.gtype(i)
+        parts = self._nested(i)
+        if t == "Point":
+            coords = parts[0][0][0]
+        elif t == "MultiPoint":
+            coords = [p[0][0] for p in parts]
+        elif t == "LineString":
+            coords = parts[0][0]
+        elif t == "MultiLineString":
+            coords = [p[0] for p in parts]
+        elif t == "Polygon":
+            coords = parts[0]
+        else:
+            coords = parts
+        return {"type": t, "coordinates": coords}
+
+    def points(self, i: int) -> list:
+        """Alle Koordinaten eines Features als flache (lon, lat)-Liste."""
+        go, po, ro = self._cols["geom_off"], self._cols["part_off"], self._cols["ring_off"]
+        c, d = self._cols["coords"], self.dim
+        k0 = ro[po[go[i]]]
+        k1 = ro[po[go[i + 1]]]
+        return [(c[d * k], c[d * k + 1]) for k in range(k0, k1)]
+
+    def feature(self, i: int) -> dict:
+        return {"type": "Feature", "geometry": self.geometry(i), "properties": self.props(i)}
+
+
+class FeatureStore:
+    """Lesender Zugriff auf features.store; Klassen werden erst beim ersten
+    Zugriff aufgeschlüsselt."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._f = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._mm[:8] != MAGIC or len(self._mm) < 8 + _TRAILER.size:
+                raise ValueError(f"{self.path}: kein Feature-Store")
+            off, length, magic = _TRAILER.unpack(self._mm[-_TRAILER.size:])
+            if magic != MAGIC:
+                raise ValueError(f"{self.path}: Feature-Store unvollständig")
+            toc = json.loads(self._mm[off:off + length])
+            if toc.get("version") != VERSION:
+                raise ValueError(f"{self.path}: Store-Version {toc.get('version')}")
+        except Exception:
+            self._f.close()
+            raise
+        self._meta = toc["classes"]
+        self._layers = {}
+        self._lock = threading.Lock()
+
+    def classes(self) -> list:
+        return sorted(self._meta)
+
+    def layer(self, cls: str):
+        """ClassLayer einer Klasse oder None (Klasse nicht vorhanden)."""
+        lay = self._layers.get(cls)
+        if lay is None:
+            meta = self._meta.get(cls)
+            if meta is None:
+                return None
+            with self._lock:
+                lay = self._layers.get(cls)
+                if lay is None:
+                    lay = self._layers[cls] = ClassLayer(self._mm, meta)
+        return lay
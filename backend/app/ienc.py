@@ -10,6 +10,9 @@ Pipeline pro Gewässer:
   2. download_waterway()   — ZIP laden, .000-Zellen extrahieren
   3. extract_geojson()     — S-57 → GeoJSON pro Objektklasse (mit Attributen!)
                              + manifest.json (Zellen, Edition, Bounds, Zähler)
+                             + features.store (kompakt, für Abfragen/Tiles)
+                             + depth.rtree / depth.grid (Tiefen-Index/-Raster)
+                             + structures.rtree/.json (Bauwerks-Index)
 
 Die GeoJSON-Dateien landen in <chart_dir>/geojson/<klasse>.geojson und sind
 über den bestehenden Static-Mount /charts/<chart_id>/geojson/... abrufbar.
@@ -18,19 +21,29 @@ die späteren Source-Layer.
 """
 
 import gzip
+import hashlib
 import json
 import math
 import os
 import shutil
 import sqlite3
+import threading
 import zipfile
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 
 import requests
 from bs4 import BeautifulSoup
 
+import depth_grid
+import feature_store
 import mvt
+import pmtiles
+import spatial_index
+import worker_pool
 
 ELWIS_BASE_URL = "https://www.elwis.de"
 IENC_URL = "https://www.elwis.de/DE/dynamisch/IENC/"
@@ -264,41 +277,58 @@ def _read_dsid(ds) -> dict:
     return info
 
 
-def extract_geojson(chart_dir: Path, progress_cb=None) -> dict:
+class _ClassStream:
     """
-    Alle .000-Zellen in chart_dir lesen und pro IENC-Objektklasse eine
-    GeoJSON-Datei mit vollständigen Attributen schreiben. BLOCKING.
-
-    Ausgabe: <chart_dir>/geojson/<klasse>.geojson + manifest.json
-    Rückgabe: das Manifest-Dict.
+    Eine Objektklasse beim Extrahieren: die GeoJSON-Collection wird Feature
+    für Feature (aus den Teil-Dateien der Zellen) auf die Platte geschrieben
+    (gleiches Format wie json.dump der ganzen Collection), die Store-Spalten
+    kompakt mitgesammelt (mit spool_dir in Temp-Dateien ausgelagert). So
+    hält extract_geojson nie alle Features eines Gewässers im Speicher.
+    Gezählt wird im Store (ClassBuilder): Features ohne Geometrie stehen
+    in der GeoJSON-Datei, aber nicht im Store und nicht im Manifest.
     """
-    cells = sorted(chart_dir.rglob("*.000"))
-    if not cells:
-        raise ValueError(f"Keine .000-Zellen in {chart_dir}")
 
-    out_dir = chart_dir / "geojson"
-    if out_dir.exists():
-        shutil.rmtree(out_dir)
-    out_dir.mkdir(parents=True)
+    def __init__(self, out_dir: Path, cls: str, spool_dir=None):
+        self._written = 0   # Features in der GeoJSON-Datei
+        self.columns = feature_store.ClassBuilder(cls, spool_dir)
+        self._f = open(out_dir / f"{cls}.geojson", "w", encoding="utf-8")
+        self._f.write('{"type": "FeatureCollection", "name": %s, "features": ['
+                      % json.dumps(cls, ensure_ascii=False))
 
-    # klasse (lowercase) → Feature-Liste, über alle Zellen des Gewässers
-    features_by_class = {}
-    cell_infos = []
-    bounds = [180.0, 90.0, -180.0, -90.0]  # lon_min, lat_min, lon_max, lat_max
+    def add_raw(self, text: str):
+        """Fertig serialisiertes Feature (Zeile aus einer Teil-Datei)."""
+        if self._written:
+            self._f.write(", ")
+        self._f.write(text)
+        self.columns.add(json.loads(text))
+        self._written += 1
 
-    for i, cell in enumerate(cells):
-        if progress_cb:
-            progress_cb(f"Zelle {cell.name} ({i + 1}/{len(cells)})")
+    def close(self):
+        if not self._f.closed:
+            self._f.write("]}")
+            self._f.close()
 
-        ds = _open_s57(str(cell))
-        if ds is None:
-            cell_infos.append({"file": cell.name, "error": "GDAL konnte Zelle nicht öffnen"})
-            continue
 
-        info = _read_dsid(ds)
-        info["file"] = cell.name
-        cell_infos.append(info)
+def _extract_cell(cell: str, part_dir: str):
+    """
+    Worker: EINE S-57-Zelle dekodieren und ihre Features je Klasse als
+    Teil-Datei <part_dir>/<klasse>.jsonl ablegen (ein fertig serialisiertes
+    Feature pro Zeile). Läuft im Prozess-Pool von extract_geojson.
 
+    Rückgabe: (zell-info, bounds der Zelle oder None, [klassen mit Features])
+    """
+    name = Path(cell).name
+    ds = _open_s57(cell)
+    if ds is None:
+        return {"file": name, "error": "GDAL konnte Zelle nicht öffnen"}, None, []
+
+    info = _read_dsid(ds)
+    info["file"] = name
+    bounds = [180.0, 90.0, -180.0, -90.0]  # lon_min, lat_min, lon_max, lat_max
+    out = Path(part_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    files = {}
+    try:
         for layer_idx in range(ds.GetLayerCount()):
             layer = ds.GetLayerByIndex(layer_idx)
             if layer is None:
@@ -329,41 +359,150 @@ def extract_geojson(chart_dir: Path, progress_cb=None) -> dict:
                 bounds[2] = max(bounds[2], env[1])
                 bounds[3] = max(bounds[3], env[3])
 
-                features_by_class.setdefault(cls, []).append({
+                f = files.get(cls)
+                if f is None:
+                    f = files[cls] = open(out / f"{cls}.jsonl", "w",
+                                          encoding="utf-8", newline="\n")
+                # JSON maskiert Zeilenumbrüche in Strings → eine Zeile je Feature
+                f.write(json.dumps({
                     "type": "Feature",
                     "geometry": geometry,
                     "properties": _sanitize_props(feat.items()),
-                })
+                }, ensure_ascii=False, default=str))
+                f.write("\n")
+    finally:
+        for f in files.values():
+            f.close()
+    ds = None
+    return info, (bounds if files else None), list(files)
 
-        ds = None
 
-    # GeoJSON pro Klasse schreiben
-    class_counts = {}
-    for cls, feats in sorted(features_by_class.items()):
-        class_counts[cls] = len(feats)
-        collection = {
-            "type": "FeatureCollection",
-            "name": cls,
-            "features": feats,
-        }
-        with open(out_dir / f"{cls}.geojson", "w", encoding="utf-8") as f:
-            json.dump(collection, f, ensure_ascii=False, default=str)
+# Module, die der forkserver einmal lädt und an alle ENC-Worker vererbt
+_WORKER_PRELOAD = ("ienc",)
 
-    total = sum(class_counts.values())
-    manifest = {
-        "generated": datetime.now().isoformat(),
-        "cell_count": len(cells),
-        "cells": cell_infos,
-        "classes": class_counts,
-        "groups": {grp: [c.lower() for c in classes if c.lower() in class_counts]
-                   for grp, classes in IENC_CLASSES.items()},
-        "features_total": total,
-        "bounds": bounds if total > 0 else None,
-    }
-    with open(out_dir / "manifest.json", "w", encoding="utf-8") as f:
-        json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
 
-    return manifest
+def _cell_pool(workers: int):
+    """ProcessPoolExecutor für die Zellen-Dekodierung (None = seriell) —
+    wie _tile_pool über worker_pool (kein fork, kein Backend im Worker)."""
+    return worker_pool.process_pool(workers, preload=_WORKER_PRELOAD)
+
+
+def extract_geojson(chart_dir: Path, progress_cb=None, workers=None) -> dict:
+    """
+    Alle .000-Zellen in chart_dir lesen und pro IENC-Objektklasse eine
+    GeoJSON-Datei mit vollständigen Attributen schreiben. BLOCKING.
+
+    Ausgabe: <chart_dir>/geojson/<klasse>.geojson + manifest.json, dazu
+    features.store (feature_store.py) — daraus lesen Route-Check, Tiefen-
+    abfragen und Tile-Build; die GeoJSON-Dateien sind nur noch Export.
+    Rückgabe: das Manifest-Dict.
+
+    Features werden direkt beim Lesen je Klasse weggeschrieben (_ClassStream),
+    Zähler und Bounds laufend mitgeführt, die Store-Spalten in Temp-Dateien
+    ausgelagert — der Speicherbedarf hängt nicht an der Größe des Gewässers.
+    Schlägt etwas fehl, wird das geojson-Verzeichnis wieder entfernt.
+
+    Die Zellen dekodiert ein Prozess-Pool (_extract_cell, workers wie beim
+    Tile-Build: Default Kerne - 1) in Teil-Dateien, die anschließend in
+    Zellen-Reihenfolge zusammengeführt werden.
+    """
+    cells = sorted(chart_dir.rglob("*.000"))
+    if not cells:
+        raise ValueError(f"Keine .000-Zellen in {chart_dir}")
+
+    out_dir = chart_dir / "geojson"
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+
+    try:
+        # klasse (lowercase) → _ClassStream, über alle Zellen des Gewässers
+        streams = {}
+        cell_infos = []
+        bounds = [180.0, 90.0, -180.0, -90.0]  # lon_min, lat_min, lon_max, lat_max
+
+        parts_dir = out_dir / ".parts"
+        spool_dir = out_dir / ".columns"   # ausgelagerte Store-Spalten
+        workers = min(_tile_workers(workers), len(cells))
+        pool = _cell_pool(workers)
+        try:
+            if pool is None:
+                results = (_extract_cell(str(cell), str(parts_dir / str(n)))
+                           for n, cell in enumerate(cells))
+            else:
+                results = (f.result() for f in
+                           [pool.submit(_extract_cell, str(cell), str(parts_dir / str(n)))
+                            for n, cell in enumerate(cells)])
+            # In Zellen-Reihenfolge zusammenführen (während die restlichen Zellen
+            # noch dekodiert werden) — Ausgabe identisch zum seriellen Lesen
+            for n, (info, cell_bounds, classes) in enumerate(results):
+                if progress_cb:
+                    progress_cb(f"Zelle {cells[n].name} ({n + 1}/{len(cells)})")
+                cell_infos.append(info)
+                if cell_bounds is not None:
+                    bounds[0] = min(bounds[0], cell_bounds[0])
+                    bounds[1] = min(bounds[1], cell_bounds[1])
+                    bounds[2] = max(bounds[2], cell_bounds[2])
+                    bounds[3] = max(bounds[3], cell_bounds[3])
+                for cls in classes:
+                    stream = streams.get(cls)
+                    if stream is None:
+                        stream = streams[cls] = _ClassStream(out_dir, cls, spool_dir)
+                    with open(parts_dir / str(n) / f"{cls}.jsonl", "r",
+                              encoding="utf-8", newline="\n") as f:
+                        for line in f:
+                            stream.add_raw(line.rstrip("\n"))
+                shutil.rmtree(parts_dir / str(n), ignore_errors=True)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            for stream in streams.values():
+                stream.close()
+            shutil.rmtree(parts_dir, ignore_errors=True)
+
+        # Store aus den gesammelten Spalten, Klassen in Namensreihenfolge
+        class_counts = {}
+        writer = feature_store.StoreWriter(out_dir / feature_store.STORE_NAME)
+        try:
+            for cls in sorted(streams):
+                # Zähler des Stores — was Abfragen und Tiles tatsächlich sehen
+                class_counts[cls] = writer.add_builder(streams[cls].columns)
+                streams[cls].columns = None
+        except Exception:
+            writer.abort()
+            raise
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+        writer.close()
+        del streams
+
+        # Tiefen-Index + -Raster und Bauwerks-Index gleich hier bauen (Offline-
+        # Schritt) statt bei der ersten Live-Tiefenabfrage bzw. Routenprüfung
+        if progress_cb:
+            progress_cb("Tiefenraster")
+        _depth_index(chart_dir)
+        _structure_index(chart_dir)
+
+        total = sum(class_counts.values())
+        manifest = {
+            "generated": datetime.now().isoformat(),
+            "cell_count": len(cells),
+            "cells": cell_infos,
+            "classes": class_counts,
+            "groups": {grp: [c.lower() for c in classes if c.lower() in class_counts]
+                       for grp, classes in IENC_CLASSES.items()},
+            "features_total": total,
+            "bounds": bounds if total > 0 else None,
+        }
+        with open(out_dir / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+
+        return manifest
+    except BaseException:
+        # Keine halben <klasse>.geojson liegen lassen — _store_entry würde sie
+        # sonst als Altbestand ohne Store in einen Store überführen
+        shutil.rmtree(out_dir, ignore_errors=True)
+        raise
 
 
 def read_manifest(chart_dir: Path) -> dict:
@@ -386,6 +525,12 @@ TILE_MAXZOOM = 14  # wie die Basemap; darüber overzoomt MapLibre client-seitig
 # OGC-Standard-Skalennenner bei Zoom 0 (96 dpi) — für die SCAMIN-Auswertung
 _SCALE_Z0 = 559082264.0287178
 
+# Generalisierung unterhalb TILE_MAXZOOM (in Bildschirm-Pixeln bei 256-px-
+# Tiles): Douglas-Peucker-Toleranz und Mindestfläche für Polygone/Löcher.
+# Auf TILE_MAXZOOM bleibt volles Detail, weil MapLibre von dort overzoomt.
+SIMPLIFY_PX = 0.5
+MIN_AREA_PX = 1.0
+
 # S-57-Verwaltungsattribute, die in den Tiles nur Platz kosten würden.
 # In den GeoJSON-Dateien bleiben sie vollständig erhalten.
 _DROP_PROPS = {"RCID", "PRIM", "GRUP", "OBJL", "RVER", "AGEN", "FIDN", "FIDS",
@@ -419,42 +564,407 @@ def _geom_bbox(geom: dict):
     return (lon_min, lat_min, lon_max, lat_max)
 
 
-def _load_tile_features(charts, progress_cb=None) -> list:
+def _feature_layers(chart_dir) -> list:
+    """[(gruppe, klasse, ClassLayer), ...] eines Gewässers — Klassen in
+    Namensreihenfolge, leere Klassen fehlen. Legt die Feature-Reihenfolge
+    für Parent und Render-Worker gemeinsam fest."""
+    store = _chart_store(chart_dir)
+    if store is None:
+        return []
+    out = []
+    for cls in store.classes():
+        grp = _CLASS_GROUP.get(cls)
+        layer = store.layer(cls) if grp is not None else None
+        if layer is not None and len(layer):
+            out.append((grp, cls, layer))
+    return out
+
+
+def _tile_feature(grp: str, cls: str, layer, i: int) -> tuple:
+    """Feature i eines Layers → (gruppe, geom, props, scamin, bbox)."""
+    props = layer.props(i)
+    scamin = props.get("SCAMIN")
+    lean = {k: v for k, v in props.items() if k not in _DROP_PROPS}
+    lean["_cls"] = cls
+    return (grp, layer.geometry(i), lean, scamin, layer.bbox(i))
+
+
+def _load_chart_features(chart_dir) -> list:
+    """Features eines Gewässers aus dem Feature-Store laden → Liste
+    (gruppe, geom, props, scamin, bbox). Klassen in Namensreihenfolge."""
+    return [_tile_feature(grp, cls, layer, i)
+            for grp, cls, layer in _feature_layers(chart_dir)
+            for i in range(len(layer))]
+
+
+# Tiles pro Auftrag an einen Worker-Prozess — groß genug, dass Pickling und
+# IPC gegen Clip + Encode + gzip nicht ins Gewicht fallen
+TILE_BATCH = 256
+# Bucketing in Streifen zu so vielen Tile-Zeilen; gerendert und nach SQLite
+# geschrieben wird, sobald TILE_FLUSH Tiles gesammelt sind (hält den Pool
+# auch bei schmalen Streifen ausgelastet, Speicher bleibt begrenzt)
+TILE_STRIPE_ROWS = 32
+TILE_FLUSH = TILE_BATCH * 32
+
+# Speicher je Render-Worker: Interpreter + ienc samt Modulen (das Backend
+# selbst lädt der Worker nicht, siehe worker_pool) + die Features eines
+# Batches. Die Features liest jeder Worker aus den gemappten Feature-Stores.
+_TILE_WORKER_RAM = 100 * 1024 * 1024
+_TILE_RAM_MARGIN = 300 * 1024 * 1024   # so viel RAM soll frei bleiben
+
+
+def _mem_available_bytes():
+    """Aktuell verfügbarer RAM in Bytes (aus /proc/meminfo) oder None."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except Exception:
+        pass
+    return None
+
+
+class _StoreFeatures:
     """
-    GeoJSON aller Gewässer laden → Liste (gruppe, geom, props, scamin, bbox).
-    charts: Liste (name, chart_dir).
+    feats für Parent und Render-Worker: die Features aller Gewässer in
+    Chart-Reihenfolge (Klassen wie _load_chart_features), Feature i wird
+    erst beim Zugriff aus dem gemappten Feature-Store dekodiert. Das
+    Bucketing liest nur die bbox- und SCAMIN-Spalten (layers()) — der
+    Datensatz liegt nie als Ganzes im Speicher. Über die Prozessgrenze
+    gehen nur Chart-Pfade und Indizes, die Store-Seiten teilen sich alle
+    Prozesse über den Page-Cache.
     """
-    feats = []
-    for name, chart_dir in charts:
-        if progress_cb:
-            progress_cb(f"Lade {name}…")
-        gdir = Path(chart_dir) / "geojson"
-        for gj in sorted(gdir.glob("*.geojson")):
-            cls = gj.stem
-            grp = _CLASS_GROUP.get(cls)
-            if grp is None:
-                continue
-            try:
-                with open(gj, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-            except Exception:
+
+    def __init__(self, chart_dirs):
+        self._starts, self._layers = [], []
+        self.chart_starts = []   # Index des ersten Features je Gewässer
+        n = 0
+        for chart_dir in chart_dirs:
+            self.chart_starts.append(n)
+            for entry in _feature_layers(chart_dir):
+                self._starts.append(n)
+                self._layers.append(entry)
+                n += len(entry[2])
+        self._count = n
+
+    def __len__(self):
+        return self._count
+
+    def layers(self) -> list:
+        """[(erster Index, gruppe, ClassLayer), ...] in Indexfolge."""
+        return [(start, grp, layer) for start, (grp, _, layer) in zip(self._starts, self._layers)]
+
+    def __getitem__(self, i: int) -> tuple:
+        k = bisect_right(self._starts, i) - 1
+        grp, cls, layer = self._layers[k]
+        return _tile_feature(grp, cls, layer, i - self._starts[k])
+
+
+class _FeatureCache(dict):
+    """Index → Feature, einmal dekodiert je Batch bzw. je seriellem Block
+    (benachbarte Tiles teilen sich die meisten Features)."""
+
+    def __init__(self, source):
+        super().__init__()
+        self._source = source
+
+    def __missing__(self, i: int):
+        feat = self[i] = self._source[i]
+        return feat
+
+
+# Features im Worker-Prozess (per Initializer einmal je Prozess gesetzt)
+_worker_feats = None
+
+
+def _init_tile_worker(chart_dirs, count: int):
+    global _worker_feats
+    _worker_feats = _StoreFeatures(chart_dirs)
+    if len(_worker_feats) != count:
+        raise RuntimeError(f"Feature-Stores geändert ({len(_worker_feats)} statt {count} Features)")
+
+
+def _simplify_params(z: int):
+    """(Toleranz, Mindestfläche) in Tile-Einheiten für Zoomstufe z."""
+    if z >= TILE_MAXZOOM:
+        return 0.0, 0.0
+    px = mvt.EXTENT / 256
+    return SIMPLIFY_PX * px, MIN_AREA_PX * px * px
+
+
+def _render_tile(feats, z: int, tx: int, ty: int, idxs, encoder):
+    """Ein Tile clippen, generalisieren, encoden, gzippen → Blob oder None
+    (leer). Einzige Render-Funktion für seriellen und parallelen Build —
+    deshalb sind beide Ausgaben byte-identisch."""
+    tol, min_area = _simplify_params(z)
+    layers = {grp: [] for grp in _GROUP_ORDER}
+    for i in idxs:
+        grp, geom, props, scamin, bbox = feats[i]
+        clipped = mvt.clip_geometry(geom, z, tx, ty, tol, min_area)
+        if clipped is None:
+            continue
+        layers[grp].append((clipped[0], clipped[1], props))
+    data = encoder.encode(layers)
+    if not data:
+        return None
+    # mtime=0: gleicher Inhalt → gleicher Blob (auch über Rebuilds hinweg)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _render_batch(z: int, batch):
+    """Worker: [(tx, ty, idxs), ...] → [blob|None, ...] in gleicher Reihenfolge.
+    Feature-Cache und Encoder leben nur für den Batch (der Encoder hält
+    Referenzen auf die props) — der Worker-Speicher bleibt begrenzt."""
+    feats = _FeatureCache(_worker_feats)
+    encoder = mvt.TileEncoder()
+    return [_render_tile(feats, z, tx, ty, idxs, encoder) for tx, ty, idxs in batch]
+
+
+def _tile_workers(workers=None) -> int:
+    """Worker-Anzahl: explizit, sonst alle Kerne bis auf einen (Event-Loop,
+    SQLite-Writer, GPS laufen weiter). Gedeckelt durch den freien RAM
+    (_TILE_WORKER_RAM je Worker, _TILE_RAM_MARGIN bleibt frei)."""
+    if workers is None:
+        workers = (os.cpu_count() or 1) - 1
+    avail = _mem_available_bytes()
+    if avail is not None:
+        workers = min(int(workers), (avail - _TILE_RAM_MARGIN) // _TILE_WORKER_RAM)
+    return max(1, int(workers))
+
+
+def _tile_pool(chart_dirs, count: int, workers: int):
+    """ProcessPoolExecutor für die Render-Worker (None = seriell). Die Worker
+    öffnen die Feature-Stores von chart_dirs selbst (_StoreFeatures), count
+    = Anzahl Features in feats zur Kontrolle."""
+    # Kein fork: der Aufrufer ist ein Executor-Thread im Backend-Prozess
+    # (Event-Loop, Locks anderer Threads); die Worker laden nur ienc & Co.
+    return worker_pool.process_pool(workers, _init_tile_worker, (chart_dirs, count),
+                                    preload=_WORKER_PRELOAD)
+
+
+def _bucket_stripes(feats, z: int):
+    """
+    Features einer Zoomstufe per Bounding-Box auf Tiles verteilen — in
+    Streifen zu TILE_STRIPE_ROWS Tile-Zeilen, von Nord nach Süd. Generator:
+    je Streifen {(tx, ty): [feature-index, ...]} (Indizes aufsteigend).
+
+    Auf TILE_MAXZOOM hätte ein Dict über die ganze Zoomstufe Millionen
+    Einträge; so lebt immer nur ein Streifen. Je Feature bleiben nur sein
+    Tile-Bereich (4 × int32) und die Streifen-Zuordnung im Speicher —
+    gelesen werden nur bbox und SCAMIN aus den Store-Spalten (feats:
+    _StoreFeatures), keine Geometrie.
+    """
+    scale_den = _SCALE_Z0 / (1 << z)
+    n = 1 << z
+    pad = mvt.BUFFER / mvt.EXTENT
+    ranges = array("i", [-1]) * (4 * len(feats))
+    stripes = {}   # Streifen-Nr. → array('I') der Feature-Indizes
+    for start, _, layer in feats.layers():
+        bb, scamin = layer.bboxes, layer.numbers("SCAMIN")
+        for i in range(len(layer)):
+            # NaN (kein SCAMIN) vergleicht falsch → Feature bleibt
+            if z < TILE_MAXZOOM and scale_den > scamin[i]:
                 continue
-            for feat in data.get("features", []):
-                geom = feat.get("geometry")
-                if not geom:
-                    continue
-                bbox = _geom_bbox(geom)
-                if bbox is None:
-                    continue
-                props = feat.get("properties") or {}
-                scamin = props.get("SCAMIN")
-                lean = {k: v for k, v in props.items() if k not in _DROP_PROPS}
-                lean["_cls"] = cls
-                feats.append((grp, geom, lean, scamin, bbox))
-    return feats
+            idx = start + i
+            x0, y0 = mvt.project(bb[4 * i], bb[4 * i + 3], z)      # links oben
+            x1, y1 = mvt.project(bb[4 * i + 2], bb[4 * i + 1], z)  # rechts unten
+            tx0 = max(0, int(x0 - pad)); tx1 = min(n - 1, int(x1 + pad))
+            ty0 = max(0, int(y0 - pad)); ty1 = min(n - 1, int(y1 + pad))
+            ranges[4 * idx:4 * idx + 4] = array("i", (tx0, tx1, ty0, ty1))
+            for s in range(ty0 // TILE_STRIPE_ROWS, ty1 // TILE_STRIPE_ROWS + 1):
+                stripe = stripes.get(s)
+                if stripe is None:
+                    stripe = stripes[s] = array("I")
+                stripe.append(idx)
+
+    for s in sorted(stripes):
+        lo = s * TILE_STRIPE_ROWS
+        hi = lo + TILE_STRIPE_ROWS - 1
+        buckets = {}
+        for idx in stripes.pop(s):
+            k = 4 * idx
+            tx0, tx1, ty0, ty1 = ranges[k], ranges[k + 1], ranges[k + 2], ranges[k + 3]
+            for tx in range(tx0, tx1 + 1):
+                for ty in range(max(ty0, lo), min(ty1, hi) + 1):
+                    buckets.setdefault((tx, ty), []).append(idx)
+        yield buckets
+
+
+def _render_jobs(conn, feats, z: int, jobs, pool, progress_cb=None) -> int:
+    """Tiles [(tx, ty, idxs), ...] rendern (seriell oder im Pool) und in
+    Auftragsreihenfolge schreiben. Leere Tiles werden gelöscht (relevant
+    beim inkrementellen Update). Gibt die Anzahl geschriebener Tiles zurück."""
+    n = 1 << z
+    total = len(jobs)
+    if pool is None or total <= TILE_BATCH:
+        # Niedrige Zooms: ein Batch lohnt den Weg über den Pool nicht.
+        # Feature-Cache und Encoder leben nur für diesen Aufruf (wie im Worker)
+        cache = _FeatureCache(feats)
+        encoder = mvt.TileEncoder()
+        results = (_render_tile(cache, z, tx, ty, idxs, encoder) for tx, ty, idxs in jobs)
+    else:
+        batches = [jobs[i:i + TILE_BATCH] for i in range(0, total, TILE_BATCH)]
+        # map() liefert in Auftragsreihenfolge → gleiche Insert-Reihenfolge wie seriell
+        results = (blob for res in pool.map(_render_batch, [z] * len(batches), batches)
+                   for blob in res)
+
+    count = 0
+    for done, ((tx, ty, _), blob) in enumerate(zip(jobs, results), 1):
+        if blob is not None:
+            conn.execute("INSERT OR REPLACE INTO tiles VALUES (?,?,?,?)",
+                         (z, tx, n - 1 - ty, sqlite3.Binary(blob)))
+            count += 1
+        else:
+            conn.execute("DELETE FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                         (z, tx, n - 1 - ty))
+        if progress_cb and done % (TILE_BATCH * 8) == 0:
+            progress_cb(f"Zoom {z}: {done}/{total} Tiles")
+    conn.commit()
+    return count
+
+
+def _render_stripes(conn, feats, z: int, stripes, pool, progress_cb=None) -> int:
+    """Job-Listen der Streifen sammeln und je TILE_FLUSH Tiles rendern und
+    schreiben (committet) — so wächst nie die ganze Zoomstufe im Speicher an.
+    Gibt die Anzahl geschriebener Tiles zurück."""
+    count = done = 0
+    jobs = []
+    for stripe_jobs in stripes:
+        jobs.extend(stripe_jobs)
+        if len(jobs) < TILE_FLUSH:
+            continue
+        count += _render_jobs(conn, feats, z, jobs, pool)
+        done += len(jobs)
+        jobs = []
+        if progress_cb:
+            progress_cb(f"Zoom {z}: {done} Tiles")
+    if jobs:
+        count += _render_jobs(conn, feats, z, jobs, pool)
+    return count
+
+
+# ==================== INKREMENTELLER REBUILD ====================
+# Neben ienc.mbtiles liegt ienc.state.json: je Gewässer ein Inhalts-Hash der
+# GeoJSON-Dateien, Bounds und vorhandene Gruppen. Den Tile-Fußabdruck (alle
+# Tiles, in deren Bucket eines seiner Features fällt) hält die Tabelle
+# tile_owner in ienc.mbtiles selbst — eine Zeile je (Gewässer, Zoom, Tile),
+# mit den Tiles zusammen geschrieben und ersetzt. Ändert sich ein Gewässer,
+# wird nur die Vereinigung aus altem und neuem Fußabdruck neu gerendert —
+# mit den Features aller Gewässer, die diese Tiles berühren.
+
+# Ändert sich etwas an der Tile-Aufteilung, passt kein alter Fußabdruck mehr
+# → Vollbuild. Version bei Änderungen an _bucket_stripes/_render_tile erhöhen.
+_TILE_STATE_VERSION = 2
+
+# tile = ty · 2^z + tx (zeilenweise: ein Streifen ist ein Schlüsselbereich)
+_OWNER_TABLE = ("CREATE TABLE IF NOT EXISTS tile_owner (chart TEXT NOT NULL, "
+                "zoom_level INTEGER NOT NULL, tile INTEGER NOT NULL, "
+                "PRIMARY KEY (chart, zoom_level, tile)) WITHOUT ROWID")
+
+
+def _tile_params() -> list:
+    return [_TILE_STATE_VERSION, TILE_MINZOOM, TILE_MAXZOOM, mvt.EXTENT, mvt.BUFFER,
+            SIMPLIFY_PX, MIN_AREA_PX]
+
+
+def _state_path(out_path) -> Path:
+    return Path(out_path).with_suffix(".state.json")
+
+
+def _load_tile_state(out_path):
+    try:
+        with open(_state_path(out_path), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except Exception:
+        return None
+    if state.get("params") != _tile_params():
+        return None
+    return state
+
+
+def _save_tile_state(out_path, chart_state: dict):
+    path = _state_path(out_path)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"params": _tile_params(), "charts": chart_state}, f)
+    os.replace(tmp, path)
+
+
+def _chart_hash(chart_dir) -> str:
+    """Inhalts-Hash der für Tiles relevanten GeoJSON-Dateien eines Gewässers."""
+    h = hashlib.blake2b(digest_size=16)
+    for gj in sorted((Path(chart_dir) / "geojson").glob("*.geojson")):
+        if gj.stem not in _CLASS_GROUP:
+            continue
+        h.update(gj.name.encode("utf-8"))
+        with open(gj, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def _chart_summary(chart_dir) -> dict:
+    """Bounds + Gruppen eines Gewässers (für die Metadaten) — aus den
+    bbox-Spalten des Feature-Stores, ohne Geometrie zu dekodieren."""
+    layers = _feature_layers(chart_dir)
+    if not layers:
+        return {"bounds": None, "groups": []}
+    boxes = [layer.bboxes for _, _, layer in layers]
+    return {
+        "bounds": [min(min(b[0::4]) for b in boxes), min(min(b[1::4]) for b in boxes),
+                   max(max(b[2::4]) for b in boxes), max(max(b[3::4]) for b in boxes)],
+        "groups": sorted({grp for grp, _, _ in layers}, key=_GROUP_ORDER.index),
+    }
+
+
+def _footprints(buckets: dict, starts: list, z: int) -> list:
+    """Je Gewässer (Index wie starts) die Menge gepackter Tiles (ty·2^z + tx)."""
+    n = 1 << z
+    out = [set() for _ in starts]
+    for (tx, ty), idxs in buckets.items():
+        key = ty * n + tx
+        ci = -1
+        for i in idxs:
+            # idxs aufsteigend → Gewässer-Index nur weiterschieben
+            while ci + 1 < len(starts) and starts[ci + 1] <= i:
+                ci += 1
+            out[ci].add(key)
+    return out
+
+
+def _owned_tiles(conn, name: str, z: int) -> set:
+    """Fußabdruck eines Gewässers auf Zoomstufe z aus tile_owner."""
+    return {key for (key,) in conn.execute(
+        "SELECT tile FROM tile_owner WHERE chart=? AND zoom_level=?", (name, z))}
+
+
+def _tiles_metadata(charts, chart_state: dict) -> dict:
+    summaries = [chart_state[name] for name, _ in charts
+                 if chart_state.get(name, {}).get("bounds")]
+    bounds = [
+        min(s["bounds"][0] for s in summaries), min(s["bounds"][1] for s in summaries),
+        max(s["bounds"][2] for s in summaries), max(s["bounds"][3] for s in summaries),
+    ]
+    present = {g for s in summaries for g in s["groups"]}
+    groups_present = [g for g in _GROUP_ORDER if g in present]
+    return {
+        "name": "BoatOS IENC",
+        "format": "pbf",
+        "minzoom": str(TILE_MINZOOM),
+        "maxzoom": str(TILE_MAXZOOM),
+        "bounds": ",".join(f"{v:.6f}" for v in bounds),
+        "type": "overlay",
+        "generated": datetime.now().isoformat(),
+        "waterways": json.dumps([name for name, _ in charts], ensure_ascii=False),
+        "json": json.dumps({"vector_layers": [
+            {"id": grp, "minzoom": TILE_MINZOOM, "maxzoom": TILE_MAXZOOM, "fields": {}}
+            for grp in groups_present
+        ]}),
+    }
 
 
-def build_mbtiles(charts, out_path, progress_cb=None) -> dict:
+def build_mbtiles(charts, out_path, progress_cb=None, workers=None) -> dict:
     """
     Kombinierte Vektor-MBTiles aus den GeoJSON-Daten aller übergebenen
     Gewässer bauen (Source-Layer = Gruppen aus IENC_CLASSES). BLOCKING.
@@ -466,16 +976,37 @@ def build_mbtiles(charts, out_path, progress_cb=None) -> dict:
     SCAMIN aus den Zellen steuert, ab welchem Zoom ein Feature auftaucht;
     auf TILE_MAXZOOM landet alles (Overzoom zeigt es weiter an).
 
-    charts: Liste (name, chart_dir). Rückgabe: Statistik-Dict.
+    Clip + Encode + gzip laufen ab workers > 1 in einem ProcessPoolExecutor
+    (Tile-Batches je Zoom); geschrieben wird nur hier im Aufruferprozess, in
+    derselben Reihenfolge wie seriell — die Ausgabe ist byte-identisch.
+    Je Zoomstufe wird in Streifen gebucketet und blockweise geschrieben
+    (_bucket_stripes/_render_stripes), der Speicher wächst nicht mit der
+    Tile-Anzahl der Zoomstufe. Der Fußabdruck je Gewässer (tile_owner)
+    wird streifenweise mit den Tiles geschrieben. Features werden nie
+    komplett geladen: das Bucketing liest bbox/SCAMIN aus den Store-Spalten,
+    Geometrie und props dekodiert erst der Render-Schritt je Block
+    (_StoreFeatures) — seriell wie im Worker.
+    Schreibt zusätzlich den Zustand für update_mbtiles().
+
+    charts: Liste (name, chart_dir). workers: None = Kerne - 1, 1 = seriell.
+    Rückgabe: Statistik-Dict.
     """
     out_path = Path(out_path)
-    feats = _load_tile_features(charts, progress_cb)
+    hashes = {name: _chart_hash(chart_dir) for name, chart_dir in charts}
+    if progress_cb:
+        progress_cb("Öffne Feature-Stores…")
+    feats = _StoreFeatures([chart_dir for _, chart_dir in charts])
+    starts = feats.chart_starts
 
-    if not feats:
+    if not len(feats):
         if out_path.exists():
             out_path.unlink()
+        _state_path(out_path).unlink(missing_ok=True)
         return {"tiles": 0, "features": 0, "waterways": 0}
 
+    chart_state = {name: {"hash": hashes[name], **_chart_summary(chart_dir)}
+                   for name, chart_dir in charts}
+
     tmp = out_path.with_suffix(".building")
     if tmp.exists():
         tmp.unlink()
@@ -487,77 +1018,327 @@ def build_mbtiles(charts, out_path, progress_cb=None) -> dict:
                  "tile_row INTEGER, tile_data BLOB)")
     conn.execute("CREATE UNIQUE INDEX tile_index ON tiles "
                  "(zoom_level, tile_column, tile_row)")
-
-    bounds = [
-        min(f[4][0] for f in feats), min(f[4][1] for f in feats),
-        max(f[4][2] for f in feats), max(f[4][3] for f in feats),
-    ]
+    conn.execute(_OWNER_TABLE)
 
     tile_count = 0
-    pad = mvt.BUFFER / mvt.EXTENT
+    pool = _tile_pool([chart_dir for _, chart_dir in charts], len(feats),
+                      _tile_workers(workers))
+    try:
+        for z in range(TILE_MINZOOM, TILE_MAXZOOM + 1):
+            if progress_cb:
+                progress_cb(f"Zoom {z}…")
+
+            def stripe_jobs(z=z):
+                for buckets in _bucket_stripes(feats, z):
+                    # Fußabdruck des Streifens — committet mit seinen Tiles
+                    for (name, _), fp in zip(charts, _footprints(buckets, starts, z)):
+                        conn.executemany("INSERT INTO tile_owner VALUES (?, ?, ?)",
+                                         ((name, z, key) for key in sorted(fp)))
+                    yield [(tx, ty, idxs) for (tx, ty), idxs in buckets.items()]
+
+            tile_count += _render_stripes(conn, feats, z, stripe_jobs(), pool, progress_cb)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    metadata = _tiles_metadata(charts, chart_state)
+    conn.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+    conn.commit()
+    conn.close()
 
-    for z in range(TILE_MINZOOM, TILE_MAXZOOM + 1):
-        scale_den = _SCALE_Z0 / (1 << z)
-        n = 1 << z
+    os.replace(tmp, out_path)
+    _save_tile_state(out_path, chart_state)
+    return {"tiles": tile_count, "features": len(feats), "waterways": len(charts),
+            "size_mb": round(out_path.stat().st_size / 1048576, 2)}
 
-        # Features per Bounding-Box auf Tiles verteilen
-        buckets = {}
-        for idx, (grp, geom, props, scamin, bbox) in enumerate(feats):
-            if z < TILE_MAXZOOM and isinstance(scamin, (int, float)) and scale_den > scamin:
-                continue
-            x0, y0 = mvt.project(bbox[0], bbox[3], z)  # links oben
-            x1, y1 = mvt.project(bbox[2], bbox[1], z)  # rechts unten
-            tx0 = max(0, int(x0 - pad)); tx1 = min(n - 1, int(x1 + pad))
-            ty0 = max(0, int(y0 - pad)); ty1 = min(n - 1, int(y1 + pad))
-            for tx in range(tx0, tx1 + 1):
-                for ty in range(ty0, ty1 + 1):
-                    buckets.setdefault((tx, ty), []).append(idx)
 
-        if progress_cb:
-            progress_cb(f"Zoom {z}: {len(buckets)} Tiles")
-
-        for (tx, ty), idxs in buckets.items():
-            layers = {grp: [] for grp in _GROUP_ORDER}
-            for i in idxs:
-                grp, geom, props, scamin, bbox = feats[i]
-                clipped = mvt.clip_geometry(geom, z, tx, ty)
-                if clipped is None:
-                    continue
-                layers[grp].append((clipped[0], clipped[1], props))
-            data = mvt.encode_tile(layers)
-            if not data:
-                continue
-            blob = gzip.compress(data, compresslevel=6)
-            tms_y = n - 1 - ty
-            conn.execute("INSERT OR REPLACE INTO tiles VALUES (?,?,?,?)",
-                         (z, tx, tms_y, sqlite3.Binary(blob)))
-            tile_count += 1
-        conn.commit()
+def update_mbtiles(charts, out_path, progress_cb=None, workers=None) -> dict:
+    """
+    Wie build_mbtiles, aber inkrementell: nur Tiles im alten oder neuen
+    Fußabdruck geänderter/entfernter Gewässer werden neu gerendert, die
+    übrigen bleiben unangetastet. Ohne (passenden) Zustand, bei fehlender
+    Datei oder wenn sich alles geändert hat → Vollbuild. BLOCKING.
+
+    Gerendert wird mit den Features aller Gewässer, die eines der betroffenen
+    Tiles berühren, in Chart-Reihenfolge — das Ergebnis ist dasselbe wie
+    beim Vollbuild. Geschrieben wird in eine Kopie (.building), die atomar
+    ersetzt wird: laufende Tile-Reader öffnen die Datei immutable.
+    """
+    out_path = Path(out_path)
+    state = _load_tile_state(out_path)
+    if state is None or not out_path.exists() or not charts:
+        return build_mbtiles(charts, out_path, progress_cb, workers)
+
+    old = state["charts"]
+    if progress_cb:
+        progress_cb("Prüfe Änderungen…")
+    hashes = {name: _chart_hash(chart_dir) for name, chart_dir in charts}
+    changed = [name for name, _ in charts if old.get(name, {}).get("hash") != hashes[name]]
+    removed = [name for name in old if name not in hashes]
+    if not changed and not removed:
+        return {"tiles": 0, "features": 0, "waterways": len(charts), "unchanged": True,
+                "size_mb": round(out_path.stat().st_size / 1048576, 2)}
+    if len(changed) == len(charts):
+        return build_mbtiles(charts, out_path, progress_cb, workers)
+
+    # 1. Geänderte Gewässer öffnen (Store-Spalten, nichts dekodiert)
+    changed_feats = {}
+    chart_state = {name: old[name] for name, _ in charts if name not in changed}
+    for name, chart_dir in charts:
+        if name in changed:
+            if progress_cb:
+                progress_cb(f"Lade {name}…")
+            changed_feats[name] = _StoreFeatures([chart_dir])
+            chart_state[name] = {"hash": hashes[name], **_chart_summary(chart_dir)}
+    if not any(chart_state[name].get("bounds") for name, _ in charts):
+        return build_mbtiles(charts, out_path, progress_cb, workers)
+
+    # Geschrieben wird in eine Kopie samt tile_owner
+    tmp = out_path.with_suffix(".building")
+    shutil.copyfile(out_path, tmp)
+    conn = sqlite3.connect(str(tmp))
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
 
-    groups_present = sorted({f[0] for f in feats}, key=_GROUP_ORDER.index)
-    metadata = {
-        "name": "BoatOS IENC",
-        "format": "pbf",
-        "minzoom": str(TILE_MINZOOM),
-        "maxzoom": str(TILE_MAXZOOM),
-        "bounds": ",".join(f"{v:.6f}" for v in bounds),
-        "type": "overlay",
-        "generated": datetime.now().isoformat(),
-        "waterways": json.dumps([name for name, _ in charts], ensure_ascii=False),
-        "json": json.dumps({"vector_layers": [
-            {"id": grp, "minzoom": TILE_MINZOOM, "maxzoom": TILE_MAXZOOM, "fields": {}}
-            for grp in groups_present
-        ]}),
-    }
-    conn.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+    # 2. Alte Fußabdrücke geänderter/entfernter Gewässer + neue → dirty
+    #    (Temp-Tabelle statt Mengen je Zoomstufe: wächst nicht im RAM)
+    conn.execute("CREATE TEMP TABLE dirty (zoom_level INTEGER, tile INTEGER, "
+                 "PRIMARY KEY (zoom_level, tile)) WITHOUT ROWID")
+    gone = changed + removed
+    marks = ",".join("?" * len(gone))
+    conn.execute("INSERT OR IGNORE INTO dirty SELECT zoom_level, tile FROM tile_owner "
+                 f"WHERE chart IN ({marks})", gone)
+    conn.execute(f"DELETE FROM tile_owner WHERE chart IN ({marks})", gone)
+    for name in changed:
+        feats = changed_feats[name]
+        for z in range(TILE_MINZOOM, TILE_MAXZOOM + 1):
+            for buckets in _bucket_stripes(feats, z):
+                keys = sorted(_footprints(buckets, [0], z)[0])
+                conn.executemany("INSERT INTO tile_owner VALUES (?, ?, ?)",
+                                 ((name, z, key) for key in keys))
+                conn.executemany("INSERT OR IGNORE INTO dirty VALUES (?, ?)",
+                                 ((z, key) for key in keys))
+
+    # 3. Unveränderte Gewässer, die ein betroffenes Tile berühren, mitnehmen
+    use = []
+    for name, chart_dir in charts:
+        if name in changed or conn.execute(
+                "SELECT 1 FROM tile_owner o JOIN dirty d ON d.zoom_level = o.zoom_level "
+                "AND d.tile = o.tile WHERE o.chart=? LIMIT 1", (name,)).fetchone():
+            use.append(chart_dir)
+    feats = _StoreFeatures(use)
+
+    # 4. Nur die betroffenen Tiles neu rendern (bzw. löschen) — je Streifen
+    #    den passenden Schlüsselbereich aus dirty holen und abhaken
+    tile_count = 0
+    dirty_total = conn.execute("SELECT COUNT(*) FROM dirty").fetchone()[0]
+    pool = _tile_pool(use, len(feats), _tile_workers(workers)) if len(feats) else None
+    try:
+        for z in range(TILE_MINZOOM, TILE_MAXZOOM + 1):
+            if progress_cb:
+                n_dirty = conn.execute("SELECT COUNT(*) FROM dirty WHERE zoom_level=?",
+                                       (z,)).fetchone()[0]
+                progress_cb(f"Zoom {z}: {n_dirty} Tiles neu")
+
+            def stripe_jobs(z=z):
+                n = 1 << z
+                for buckets in _bucket_stripes(feats, z):
+                    lo = next(iter(buckets))[1] // TILE_STRIPE_ROWS * TILE_STRIPE_ROWS
+                    rng = (z, lo * n, (lo + TILE_STRIPE_ROWS) * n)
+                    todo = {key for (key,) in conn.execute(
+                        "SELECT tile FROM dirty WHERE zoom_level=? AND tile>=? AND tile<?", rng)}
+                    if not todo:
+                        continue
+                    conn.execute("DELETE FROM dirty WHERE zoom_level=? AND tile>=? AND tile<?", rng)
+                    jobs = [(tx, ty, idxs) for (tx, ty), idxs in buckets.items()
+                            if ty * n + tx in todo]
+                    todo.difference_update(ty * n + tx for tx, ty, _ in jobs)
+                    # Tiles, zu denen gar kein Feature mehr gehört: leer rendern = löschen
+                    jobs.extend((key % n, key // n, []) for key in sorted(todo))
+                    yield jobs
+                # ebenso in Streifen ganz ohne Features
+                while True:
+                    rest = conn.execute("SELECT tile FROM dirty WHERE zoom_level=? "
+                                        "ORDER BY tile LIMIT ?", (z, TILE_FLUSH)).fetchall()
+                    if not rest:
+                        break
+                    conn.execute("DELETE FROM dirty WHERE zoom_level=? AND tile<=?",
+                                 (z, rest[-1][0]))
+                    yield [(key % n, key // n, []) for (key,) in rest]
+
+            tile_count += _render_stripes(conn, feats, z, stripe_jobs(), pool, progress_cb)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    conn.execute("DELETE FROM metadata")
+    conn.executemany("INSERT INTO metadata VALUES (?, ?)",
+                     _tiles_metadata(charts, chart_state).items())
     conn.commit()
     conn.close()
 
     os.replace(tmp, out_path)
+    _save_tile_state(out_path, chart_state)
     return {"tiles": tile_count, "features": len(feats), "waterways": len(charts),
+            "incremental": True, "changed": changed, "removed": removed,
+            "dirty_tiles": dirty_total,
             "size_mb": round(out_path.stat().st_size / 1048576, 2)}
 
 
+# ==================== DATEN-CACHE ====================
+# Feature-Stores und die daraus gebauten Indizes (Tiefen, Bauwerke) je
+# Gewässer in EINEM LRU-Cache mit Speicherbudget: auf 1–2-GB-Boards mit
+# OSRM daneben darf das Durchblättern vieler Gewässer nicht jeden Index
+# für immer im Heap lassen. Budget per settings enc.cacheMB.
+
+CHART_CACHE_MB = 64
+
+# Speicher-Schätzwerte (Bytes, CPython 64 bit)
+_STORE_COST = 32 * 1024        # Store ist gemappt: Heap ≈ Inhaltsverzeichnis
+_DEPTH_ENTRY_COST = 240        # Eintrag [bbox…, depth, layer, i, geom]
+_STRUCTURE_ENTRY_COST = 320    # Tupel (cls, i, cx, cy, verclr, name)
+_COORD_COST = 128              # [lon, lat] als Liste zweier floats
+
+
+class ChartCache:
+    """
+    LRU-Cache für Gewässer-Daten. Key: (art, chart_dir) — art ist "store",
+    "depth" oder "structures". Jeder Eintrag trägt die Signatur des Feature-
+    Stores (mtime_ns, größe), aus dem er gebaut wurde; passt sie nicht mehr
+    (neue Extraktion), zählt der Zugriff als Fehlgriff und der Eintrag fliegt.
+
+    Speicher wird über Schätzwerte je Eintrag abgerechnet; nachträglich
+    gebaute Teile (Polygone des Tiefen-Index) bucht charge() dazu. Oberhalb
+    des Budgets fliegen die am längsten nicht benutzten Einträge raus —
+    wer noch eine Referenz hält, arbeitet damit einfach weiter.
+    """
+
+    def __init__(self, budget_mb: float = CHART_CACHE_MB):
+        self._lock = threading.Lock()
+        self._data = OrderedDict()   # key → [sig, value, cost]
+        self._bytes = 0
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(kind: str, chart_dir):
+        return kind, str(Path(chart_dir))
+
+    def configure(self, budget_mb: float):
+        """Budget (MB) setzen; 0 schaltet den Cache ab."""
+        with self._lock:
+            self.budget = max(0, int(float(budget_mb) * 1024 * 1024))
+            self._evict_locked()
+
+    def get(self, kind: str, chart_dir, sig):
+        """Gecachter Wert oder None (fehlt / andere Signatur)."""
+        key = self._key(kind, chart_dir)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] != sig:
+                if entry is not None:
+                    self._bytes -= self._data.pop(key)[2]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, kind: str, chart_dir, sig, value, cost: int):
+        key = self._key(kind, chart_dir)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            if cost > self.budget:
+                return
+            self._data[key] = [sig, value, cost]
+            self._bytes += cost
+            self._evict_locked()
+
+    def charge(self, kind: str, chart_dir, nbytes: int):
+        """Nachträglich gewachsenen Speicher eines Eintrags verbuchen."""
+        key = self._key(kind, chart_dir)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return
+            entry[2] += nbytes
+            self._bytes += nbytes
+            self._data.move_to_end(key)
+            self._evict_locked()
+
+    def _evict_locked(self):
+        while self._bytes > self.budget and self._data:
+            _, entry = self._data.popitem(last=False)
+            self._bytes -= entry[2]
+            self.evictions += 1
+
+    def invalidate(self, chart_dir=None):
+        """Alle Einträge (oder nur die eines Gewässers) verwerfen."""
+        with self._lock:
+            if chart_dir is None:
+                self._data.clear()
+                self._bytes = 0
+                return
+            path = str(Path(chart_dir))
+            for key in [k for k in self._data if k[1] == path]:
+                self._bytes -= self._data.pop(key)[2]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            kinds = {}
+            for (kind, _), entry in self._data.items():
+                k = kinds.setdefault(kind, {"entries": 0, "bytes": 0})
+                k["entries"] += 1
+                k["bytes"] += entry[2]
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "budget_mb": round(self.budget / 1048576, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+                "evictions": self.evictions,
+                "kinds": kinds,
+            }
+
+
+chart_cache = ChartCache()
+
+
+def _store_entry(chart_dir):
+    """(FeatureStore, signatur) eines Gewässers oder (None, None) ohne
+    Daten. Vor Einführung des Stores konvertierte Karten werden einmalig aus
+    ihren GeoJSON-Dateien nachgezogen. BLOCKING."""
+    gdir = Path(chart_dir) / "geojson"
+    p = gdir / feature_store.STORE_NAME
+    try:
+        if not p.exists():
+            if not any(gdir.glob("*.geojson")):
+                return None, None
+            feature_store.convert_geojson_dir(gdir, classes=_CLASS_GROUP)
+        st = p.stat()
+        sig = (st.st_mtime_ns, st.st_size)
+        store = chart_cache.get("store", chart_dir, sig)
+        if store is not None:
+            return store, sig
+        store = feature_store.FeatureStore(p)
+    except Exception as e:
+        print(f"⚠️ Feature-Store {p} nicht lesbar: {e}")
+        return None, None
+    chart_cache.put("store", chart_dir, sig, store, _STORE_COST)
+    return store, sig
+
+
+def _chart_store(chart_dir):
+    """Feature-Store eines Gewässers (oder None ohne Daten). BLOCKING."""
+    return _store_entry(chart_dir)[0]
+
+
 # ==================== ROUTE-CHECK (Brücken/Tiefen/Wehre) ====================
 # Prüft eine berechnete Route gegen die extrahierten IENC-Daten und liefert
 # Warnungen: zu niedrige Brücken/Freileitungen (VERCLR vs. Bootshöhe),
@@ -569,28 +1350,13 @@ HEIGHT_MARGIN = 0.3        # Brücken: Wellenschlag, Beladung, Messungenauigkeit
 CABLE_MARGIN = 1.0         # Freileitungen: elektrischer Sicherheitsabstand
 DEPTH_MARGIN = 0.3         # Tiefen: Squat, Wasserstandsschwankung
 CORRIDOR_M = 40            # Korridor um die Route für Bauwerke
-DEPTH_SAMPLE_M = 50        # Abtastabstand der Route für Tiefen-Checks
-
-# GeoJSON-Cache: Pfad → (mtime, features) — Elbe-depare ist ein paar MB,
-# das wollen wir nicht bei jeder Routenberechnung neu parsen
-_geojson_cache = {}
+DEPTH_SAMPLE_M = 50        # Abtastabstand der Route (Bauwerks-Korridor)
 
 
-def _load_class_features(chart_dir: Path, cls: str) -> list:
-    p = Path(chart_dir) / "geojson" / f"{cls}.geojson"
-    if not p.exists():
-        return []
-    try:
-        mtime = p.stat().st_mtime
-        cached = _geojson_cache.get(str(p))
-        if cached and cached[0] == mtime:
-            return cached[1]
-        with open(p, "r", encoding="utf-8") as f:
-            feats = json.load(f).get("features", [])
-        _geojson_cache[str(p)] = (mtime, feats)
-        return feats
-    except Exception:
-        return []
+def _class_layer(chart_dir, cls: str):
+    """Spalten einer Objektklasse (feature_store.ClassLayer) oder None."""
+    store = _chart_store(chart_dir)
+    return store.layer(cls) if store is not None else None
 
 
 def _m_per_deg(lat: float):
@@ -667,15 +1433,6 @@ def _sample_route(coords, step_m):
     return samples
 
 
-def _route_bbox(coords, pad_deg=0.01):
-    return (min(c[0] for c in coords) - pad_deg, min(c[1] for c in coords) - pad_deg,
-            max(c[0] for c in coords) + pad_deg, max(c[1] for c in coords) + pad_deg)
-
-
-def _bbox_overlaps(a, b) -> bool:
-    return not (a[2] < b[0] or b[2] < a[0] or a[3] < b[1] or b[3] < a[1])
-
-
 def _num_or_none(v):
     try:
         f = float(v)
@@ -684,6 +1441,197 @@ def _num_or_none(v):
         return None
 
 
+def _segment_crossings(a, b, ring) -> list:
+    """Parameter t ∈ [0, 1] entlang a→b, an denen die Strecke eine Kante des
+    Rings schneidet (parallele/kollineare Kanten liefern keinen Schnitt)."""
+    rx, ry = b[0] - a[0], b[1] - a[1]
+    ts = []
+    for i in range(1, len(ring)):
+        qx, qy = ring[i - 1][0], ring[i - 1][1]
+        sx, sy = ring[i][0] - qx, ring[i][1] - qy
+        den = rx * sy - ry * sx
+        if den == 0:
+            continue
+        wx, wy = qx - a[0], qy - a[1]
+        t = (wx * sy - wy * sx) / den
+        u = (wx * ry - wy * rx) / den
+        if 0.0 <= t <= 1.0 and 0.0 <= u <= 1.0:
+            ts.append(t)
+    return ts
+
+
+def _shallow_sections(route_coords, chart_dirs, needed) -> list:
+    """
+    Flachstellen entlang der Route mit exaktem Ein-/Austritts-km: jedes
+    Routen-Segment wird mit den Kanten der flachen Tiefenflächen (Tiefe <
+    needed, Kandidaten aus dem R-Baum je Chart) geschnitten. Zwischen zwei
+    Schnittpunkten ist die Menge der enthaltenden Flächen konstant, ein
+    Punkt-in-Polygon-Test in der Intervallmitte entscheidet das ganze Stück.
+
+    Rückgabe: Liste (start_km, end_km, min_depth, lon, lat, gewässer) —
+    lon/lat = Eintrittspunkt, gewässer = Chart der minimalen Tiefe.
+    """
+    sections = []
+    cur = None   # [start_km, end_km, depth, lon, lat, gewässer]
+    km = 0.0
+    indexes = [(name, chart_dir, _depth_index(chart_dir)) for name, chart_dir in chart_dirs]
+    for a, b in zip(route_coords, route_coords[1:]):
+        mx, my = _m_per_deg(a[1])
+        seg_km = (((b[0] - a[0]) * mx) ** 2 + ((b[1] - a[1]) * my) ** 2) ** 0.5 / 1000
+        sbox = (min(a[0], b[0]), min(a[1], b[1]), max(a[0], b[0]), max(a[1], b[1]))
+
+        cands = []   # (depth, gewässer, geom) in Chart-Reihenfolge
+        ts = [0.0, 1.0]
+        for name, chart_dir, (idx, tree, _grid) in indexes:
+            for k in sorted(tree.search(*sbox)):
+                entry = idx[k]
+                if entry[4] >= needed:
+                    continue
+                geom = _depth_geom(entry, chart_dir)
+                cands.append((entry[4], name, geom))
+                polys = [geom["coordinates"]] if geom["type"] == "Polygon" else geom["coordinates"]
+                for rings in polys:
+                    for ring in rings:
+                        ts.extend(_segment_crossings(a, b, ring))
+        if not cands:
+            if cur is not None:
+                sections.append(tuple(cur))
+                cur = None
+            km += seg_km
+            continue
+
+        ts.sort()
+        for t0, t1 in zip(ts, ts[1:]):
+            if t1 - t0 < 1e-12:
+                continue
+            tm = (t0 + t1) / 2
+            pm = (a[0] + (b[0] - a[0]) * tm, a[1] + (b[1] - a[1]) * tm)
+            hit = None
+            for d, name, geom in cands:
+                if (hit is None or d < hit[0]) and _point_in_polygon(pm, geom):
+                    hit = (d, name)
+            if hit is None:
+                if cur is not None:
+                    sections.append(tuple(cur))
+                    cur = None
+                continue
+            if cur is None:
+                cur = [km + seg_km * t0, 0.0, hit[0],
+                       a[0] + (b[0] - a[0]) * t0, a[1] + (b[1] - a[1]) * t0, hit[1]]
+            elif hit[0] < cur[2]:
+                cur[2], cur[5] = hit
+            cur[1] = km + seg_km * t1
+        km += seg_km
+    if cur is not None:
+        sections.append(tuple(cur))
+    return sections
+
+
+# Bauwerke für den Korridor-Check, in Prüfreihenfolge
+STRUCTURE_CLASSES = ("bridge", "cblohd", "pipohd", "damcon", "gatcon")
+
+# R-Baum + Eintragsliste der Bauwerke, neben den GeoJSON-Dateien abgelegt
+STRUCTURE_TREE_NAME = "structures.rtree"
+STRUCTURE_INDEX_NAME = "structures.json"
+
+def _structure_index(chart_dir):
+    """
+    Gecachter Bauwerks-Index eines Charts → (einträge, R-Baum).
+    Einträge: (cls, i, cx, cy, verclr, name) je BRIDGE/CBLOHD/PIPOHD/DAMCON/
+    GATCON in STRUCTURE_CLASSES-Reihenfolge — Schwerpunkt der Geometrie-
+    Punkte, VERCLR (oder None) und Name sind vorberechnet. Eintrags-Nr. im
+    Baum = Position in der Liste. Beides liegt mit der mtime des Stores als
+    tag auf der Platte (wie depth.rtree) und wird nur nach neuer Extraktion
+    neu gebaut; im Speicher hält es chart_cache.
+    """
+    store, sig = _store_entry(chart_dir)
+    if store is None:
+        return [], spatial_index.build([])
+    cached = chart_cache.get("structures", chart_dir, sig)
+    if cached is not None:
+        return cached
+    entries, tree = _load_structure_index(chart_dir, store)
+    chart_cache.put("structures", chart_dir, sig, (entries, tree),
+                    len(entries) * _STRUCTURE_ENTRY_COST)
+    return entries, tree
+
+
+def _load_structure_index(chart_dir, store):
+    gdir = Path(chart_dir) / "geojson"
+    tag = store.path.stat().st_mtime_ns
+    try:
+        with open(gdir / STRUCTURE_INDEX_NAME, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        tree = spatial_index.load(gdir / STRUCTURE_TREE_NAME)
+        entries = [tuple(e) for e in data["entries"]]
+        if data.get("tag") == tag and tree.tag == tag and len(tree) == len(entries):
+            return entries, tree
+    except Exception:
+        pass   # fehlt/defekt/veraltet → neu bauen
+
+    entries, boxes = [], []
+    for cls in STRUCTURE_CLASSES:
+        layer = store.layer(cls)
+        if layer is None:
+            continue
+        for fi in range(len(layer)):
+            pts = layer.points(fi)
+            if not pts:
+                continue
+            props = layer.props(fi)
+            entries.append((cls, fi,
+                            sum(p[0] for p in pts) / len(pts),
+                            sum(p[1] for p in pts) / len(pts),
+                            layer.number(fi, "VERCLR"),
+                            props.get("NOBJNM") or props.get("OBJNAM") or ""))
+            boxes.append(layer.bbox(fi))
+    tree = spatial_index.build(boxes, tag=tag)
+    try:
+        tree.save(gdir / STRUCTURE_TREE_NAME)
+        tmp = gdir / (STRUCTURE_INDEX_NAME + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"tag": tag, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp, gdir / STRUCTURE_INDEX_NAME)
+    except OSError as e:
+        print(f"⚠️ Bauwerks-Index in {gdir} nicht gespeichert: {e}")
+    return entries, tree
+
+
+# Max. Kantenlänge (Grad) eines Routen-Abschnitts je Baum-Abfrage: dichte
+# Routen (Segmente von wenigen Metern) sonst mit einer Abfrage je Segment
+CORRIDOR_CHUNK_DEG = 0.02
+
+
+def _corridor_candidates(tree, route_coords, pad_m) -> list:
+    """Eintrags-Nr. (aufsteigend) aller Bboxen, die den Korridor ±pad_m um
+    die Route schneiden. Aufeinanderfolgende Segmente werden zu Abschnitten
+    bis CORRIDOR_CHUNK_DEG zusammengefasst — eine Baum-Abfrage je Abschnitt."""
+    found = set()
+
+    def query(minx, miny, maxx, maxy):
+        # Grad-Puffer mit der polnäheren Kante → nie zu knapp
+        mx, my = _m_per_deg(max(abs(miny), abs(maxy)))
+        px, py = pad_m / mx, pad_m / my
+        found.update(tree.search(minx - px, miny - py, maxx + px, maxy + py))
+
+    px, py = route_coords[0][0], route_coords[0][1]
+    minx = maxx = px
+    miny = maxy = py
+    for c in route_coords[1:]:
+        x, y = c[0], c[1]
+        if (max(maxx, x) - min(minx, x) > CORRIDOR_CHUNK_DEG
+                or max(maxy, y) - min(miny, y) > CORRIDOR_CHUNK_DEG):
+            query(minx, miny, maxx, maxy)
+            # Neuer Abschnitt beginnt mit dem Segment (px, py) → (x, y)
+            minx = maxx = px
+            miny = maxy = py
+        minx, miny = min(minx, x), min(miny, y)
+        maxx, maxy = max(maxx, x), max(maxy, y)
+        px, py = x, y
+    query(minx, miny, maxx, maxy)
+    return sorted(found)
+
+
 def check_route(route_coords, chart_dirs, draft_m=None, height_m=None) -> list:
     """
     Route gegen IENC-Daten prüfen. BLOCKING (via to_thread aufrufen).
@@ -699,7 +1647,6 @@ def check_route(route_coords, chart_dirs, draft_m=None, height_m=None) -> list:
     if not route_coords or len(route_coords) < 2:
         return []
 
-    rbox = _route_bbox(route_coords)
     samples = _sample_route(route_coords, DEPTH_SAMPLE_M)
     warnings = []
     seen = set()
@@ -739,103 +1686,75 @@ def check_route(route_coords, chart_dirs, draft_m=None, height_m=None) -> list:
         return any(_nearest_sample(p, tol) for p in pts)
 
     # --- Bauwerke: Brücken, Freileitungen, Wehre/Sperrtore ---
-    structure_checks = [
-        ("bridge", "bridge", height_m, HEIGHT_MARGIN),
-        ("cblohd", "cable", height_m, CABLE_MARGIN),
-        ("pipohd", "cable", height_m, CABLE_MARGIN),
-        ("damcon", "weir", None, 0),
-        ("gatcon", "weir", None, 0),
-    ]
+    structure_checks = {
+        "bridge": ("bridge", height_m, HEIGHT_MARGIN),
+        "cblohd": ("cable", height_m, CABLE_MARGIN),
+        "pipohd": ("cable", height_m, CABLE_MARGIN),
+        "damcon": ("weir", None, 0),
+        "gatcon": ("weir", None, 0),
+    }
+    # Kandidaten aus dem Bauwerks-Index: nur Bboxen, die den Korridor
+    # schneiden (Puffer großzügig über der near_route-Toleranz); Reihenfolge
+    # wie STRUCTURE_CLASSES × Feature-Nr. → gleiche Dedupe-Ergebnisse
+    pad_m = 2 * (CORRIDOR_M + DEPTH_SAMPLE_M)
     for name, chart_dir in chart_dirs:
-        for cls, wtype, ref_height, margin in structure_checks:
-            for feat in _load_class_features(chart_dir, cls):
-                geom = feat.get("geometry")
-                props = feat.get("properties") or {}
-                if not geom:
-                    continue
-                pts = _geom_points(geom)
-                if not pts:
-                    continue
-                fbox = (min(p[0] for p in pts), min(p[1] for p in pts),
-                        max(p[0] for p in pts), max(p[1] for p in pts))
-                if not _bbox_overlaps(fbox, rbox):
-                    continue
-                if not near_route(pts, CORRIDOR_M):
-                    continue
-
-                cx = sum(p[0] for p in pts) / len(pts)
-                cy = sum(p[1] for p in pts) / len(pts)
-                obj_name = props.get("NOBJNM") or props.get("OBJNAM") or ""
-                km_pos = route_pos((cx, cy))
-                # Dedupe über Name + Routen-km (250-m-Cluster): fasst
-                # Doppel-Spans (zwei Fahrbahnen, gleicher Name) zusammen
-                key = (cls, obj_name, round(km_pos * 4) / 4)
-                if key in seen:
-                    continue
-
-                if wtype == "weir":
-                    # Wehr/Sperrtor im Korridor ist immer meldenswert
-                    seen.add(key)
-                    warnings.append({
-                        "type": "weir", "severity": "warning", "cls": cls,
-                        "name": obj_name, "km": round(km_pos, 1),
-                        "lat": cy, "lon": cx,
-                    })
-                    continue
-
+        entries, tree = _structure_index(chart_dir)
+        if not entries:
+            continue
+        layers = {}
+        for k in _corridor_candidates(tree, route_coords, pad_m):
+            cls, fi, cx, cy, clearance, obj_name = entries[k]
+            wtype, ref_height, margin = structure_checks[cls]
+            if wtype != "weir":
                 if ref_height is None:
                     continue  # keine Bootshöhe gesetzt → Check übersprungen
-                clearance = _num_or_none(props.get("VERCLR"))
                 if clearance is None:
                     continue  # Höhe unbekannt — kein Rauschen erzeugen
-                required = round(ref_height + margin, 2)  # round: Float-Artefakte
-                if clearance >= required:
-                    continue
+            if cls not in layers:
+                layers[cls] = _class_layer(chart_dir, cls)
+            if not near_route(layers[cls].points(fi), CORRIDOR_M):
+                continue
+
+            km_pos = route_pos((cx, cy))
+            # Dedupe über Name + Routen-km (250-m-Cluster): fasst
+            # Doppel-Spans (zwei Fahrbahnen, gleicher Name) zusammen
+            key = (cls, obj_name, round(km_pos * 4) / 4)
+            if key in seen:
+                continue
+
+            if wtype == "weir":
+                # Wehr/Sperrtor im Korridor ist immer meldenswert
                 seen.add(key)
                 warnings.append({
-                    "type": wtype,
-                    "severity": "danger" if clearance < ref_height else "warning",
-                    "cls": cls, "name": obj_name,
-                    "clearance": clearance, "required": required,
-                    "km": round(km_pos, 1), "lat": cy, "lon": cx,
+                    "type": "weir", "severity": "warning", "cls": cls,
+                    "name": obj_name, "km": round(km_pos, 1),
+                    "lat": cy, "lon": cx,
                 })
+                continue
+
+            required = round(ref_height + margin, 2)  # round: Float-Artefakte
+            if clearance >= required:
+                continue
+            seen.add(key)
+            warnings.append({
+                "type": wtype,
+                "severity": "danger" if clearance < ref_height else "warning",
+                "cls": cls, "name": obj_name,
+                "clearance": clearance, "required": required,
+                "km": round(km_pos, 1), "lat": cy, "lon": cx,
+            })
 
     # --- Tiefen: Route-Samples gegen flache DEPARE/DRGARE-Polygone ---
     # IENC-Kanäle kodieren Ufer-zu-Ufer-Flächen mit DRVAL1=0 (Uferzone) und
     # DRVAL2=Fahrrinnentiefe — gegen DRVAL1 zu prüfen wäre Dauer-Fehlalarm.
     # Gewarnt wird deshalb nur, wenn selbst die MAXIMALE Tiefe des Bereichs
     # (DRVAL2, Fallback DRVAL1) für den Tiefgang nicht reicht.
+    # Abschnitte mit exakten Ein-/Austritts-km aus dem Schnitt der Route mit
+    # den Flächenkanten (_shallow_sections), nicht mehr aus 50-m-Samples.
     if draft_m is not None:
         needed = round(draft_m + DEPTH_MARGIN, 2)  # round: 1.1+0.3 wäre sonst 1.4000000000000001
-        shallow = []
-        for name, chart_dir in chart_dirs:
-            for cls in ("depare", "drgare"):
-                for feat in _load_class_features(chart_dir, cls):
-                    geom = feat.get("geometry")
-                    props = feat.get("properties") or {}
-                    if not geom or geom.get("type") not in ("Polygon", "MultiPolygon"):
-                        continue
-                    d2 = _num_or_none(props.get("DRVAL2"))
-                    if d2 is None:
-                        d2 = _num_or_none(props.get("DRVAL1"))
-                    if d2 is None or d2 >= needed:
-                        continue
-                    pts = _geom_points(geom)
-                    if not pts:
-                        continue
-                    fbox = (min(p[0] for p in pts), min(p[1] for p in pts),
-                            max(p[0] for p in pts), max(p[1] for p in pts))
-                    if _bbox_overlaps(fbox, rbox):
-                        shallow.append((fbox, geom, d2, name))
-
-        # Aufeinanderfolgende Treffer zu Abschnitten zusammenfassen
-        in_shallow = None  # (start_km, min_depth, lon, lat, gewässer)
-        last_km = 0.0
-
-        def flush(end_km):
-            if in_shallow is None:
-                return
-            start_km, d1, lon, lat, waterway = in_shallow
+        for start_km, end_km, d1, lon, lat, waterway in _shallow_sections(
+                route_coords, chart_dirs, needed):
             warnings.append({
                 "type": "depth",
                 "severity": "danger" if d1 < draft_m else "warning",
@@ -846,29 +1765,104 @@ def check_route(route_coords, chart_dirs, draft_m=None, height_m=None) -> list:
                 "lat": lat, "lon": lon,
             })
 
-        for lon, lat, km in samples:
-            hit = None
-            for fbox, geom, d1, wname in shallow:
-                if (fbox[0] <= lon <= fbox[2] and fbox[1] <= lat <= fbox[3]
-                        and _point_in_polygon((lon, lat), geom)):
-                    if hit is None or d1 < hit[0]:
-                        hit = (d1, wname)
-            if hit is not None:
-                if in_shallow is None:
-                    in_shallow = (km, hit[0], lon, lat, hit[1])
-                elif hit[0] < in_shallow[1]:
-                    in_shallow = (in_shallow[0], hit[0], in_shallow[2], in_shallow[3], hit[1])
-            else:
-                flush(km)
-                in_shallow = None
-            last_km = km
-        flush(last_km)
-        in_shallow = None
-
     warnings.sort(key=lambda w: w["km"])
     return warnings
 
 
+# ==================== ROUTE-CHECK-CACHE ====================
+
+# Persistente Ergebnisse von check_route: das Frontend prüft dieselbe Route
+# bei jedem Neuzeichnen/Öffnen erneut. Schlüssel = Geometrie + Gewässer mit
+# Zellen-Editionen + Bootsmaße; die Pegel-Korrektur (apply_level_offsets)
+# hängt vom aktuellen Wasserstand ab und bleibt deshalb AUSSERHALB.
+ROUTE_CHECK_DB = Path(__file__).resolve().parents[2] / "data" / "route_check_cache.db"
+ROUTE_CHECK_MAX = 500          # Einträge, älteste (zuletzt benutzt) fliegen
+ROUTE_CHECK_TOUCH_S = 60       # "used" bei Treffern höchstens so oft schreiben
+_ROUTE_CHECK_VERSION = 1       # erhöhen, wenn sich check_route-Ergebnisse ändern
+
+
+def _route_check_key(route_coords, chart_dirs, draft_m, height_m) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    h.update(json.dumps([_ROUTE_CHECK_VERSION, draft_m, height_m]).encode())
+    for name, chart_dir in chart_dirs:
+        man = read_manifest(chart_dir) or {}
+        h.update(json.dumps([name, man.get("generated"),
+                             [(c.get("file"), c.get("edition"), c.get("update"))
+                              for c in man.get("cells") or []]],
+                            ensure_ascii=False, default=str).encode("utf-8"))
+    for lon, lat in ((c[0], c[1]) for c in route_coords):
+        h.update(b"%r,%r;" % (float(lon), float(lat)))
+    return h.hexdigest()
+
+
+def _route_check_db():
+    ROUTE_CHECK_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(ROUTE_CHECK_DB), timeout=5)
+    conn.execute("CREATE TABLE IF NOT EXISTS route_checks ("
+                 "key TEXT PRIMARY KEY, warnings TEXT NOT NULL, used REAL NOT NULL)")
+    return conn
+
+
+def check_route_cached(route_coords, chart_dirs, draft_m=None, height_m=None) -> list:
+    """check_route mit persistentem Ergebnis-Cache (SQLite). Gleiche
+    Signatur/Rückgabe; der Cache ist nur eine Abkürzung — Fehler darin
+    fallen auf die normale Prüfung zurück. BLOCKING."""
+    if not route_coords or len(route_coords) < 2:
+        return []
+    key = _route_check_key(route_coords, chart_dirs, draft_m, height_m)
+    now = datetime.now().timestamp()
+    try:
+        conn = _route_check_db()
+        try:
+            row = conn.execute("SELECT warnings, used FROM route_checks WHERE key=?",
+                               (key,)).fetchone()
+            if row is not None:
+                # LRU-Zeitstempel grob genug für die Verdrängung — kein
+                # Schreib-Commit bei jedem Neuzeichnen derselben Route
+                if now - row[1] > ROUTE_CHECK_TOUCH_S:
+                    conn.execute("UPDATE route_checks SET used=? WHERE key=?", (now, key))
+                    conn.commit()
+                return json.loads(row[0])
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"⚠️ Route-Check-Cache nicht lesbar: {e}")
+
+    warnings = check_route(route_coords, chart_dirs, draft_m, height_m)
+    try:
+        conn = _route_check_db()
+        try:
+            conn.execute("INSERT OR REPLACE INTO route_checks VALUES (?, ?, ?)",
+                         (key, json.dumps(warnings, ensure_ascii=False), now))
+            conn.execute("DELETE FROM route_checks WHERE key NOT IN ("
+                         "SELECT key FROM route_checks ORDER BY used DESC LIMIT ?)",
+                         (ROUTE_CHECK_MAX,))
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"⚠️ Route-Check-Cache nicht schreibbar: {e}")
+    return warnings
+
+
+def clear_route_check_cache():
+    """Alle gespeicherten Route-Check-Ergebnisse verwerfen (nach dem Löschen
+    eines Gewässers — dessen Einträge wären sonst bis zur Verdrängung tot).
+    Leert die Tabelle statt die Datei zu löschen: parallele Prüfungen halten
+    evtl. eine Verbindung offen. BLOCKING."""
+    if not ROUTE_CHECK_DB.exists():
+        return
+    try:
+        conn = _route_check_db()
+        try:
+            conn.execute("DELETE FROM route_checks")
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"⚠️ Route-Check-Cache nicht leerbar: {e}")
+
+
 def _norm_water_name(s: str) -> str:
     """Gewässernamen normalisieren für den Pegel-Abgleich ('Elbe-Havel-Kanal'
     ↔ 'ELBE-HAVEL-KANAL'). Exakte Gleichheit, KEIN Substring — sonst würde
@@ -939,33 +1933,10 @@ def depth_at_point(lat, lon, chart_dirs) -> dict:
     check_route). Rückgabe {depth, waterway, lat, lon} oder None (Punkt in
     keiner erfassten Tiefenfläche).
     """
-    pt = (lon, lat)
-    best = None  # (depth, waterway)
-    for name, chart_dir in chart_dirs:
-        for cls in ("depare", "drgare"):
-            for feat in _load_class_features(chart_dir, cls):
-                geom = feat.get("geometry")
-                props = feat.get("properties") or {}
-                if not geom or geom.get("type") not in ("Polygon", "MultiPolygon"):
-                    continue
-                d = _num_or_none(props.get("DRVAL2"))
-                if d is None:
-                    d = _num_or_none(props.get("DRVAL1"))
-                if d is None:
-                    continue
-                pts = _geom_points(geom)
-                if not pts:
-                    continue
-                if not (min(p[0] for p in pts) <= lon <= max(p[0] for p in pts)
-                        and min(p[1] for p in pts) <= lat <= max(p[1] for p in pts)):
-                    continue
-                if not _point_in_polygon(pt, geom):
-                    continue
-                if best is None or d < best[0]:
-                    best = (d, name)
-    if best is None:
+    info = depth_scan([(lat, lon)], chart_dirs)[0]
+    if info is None:
         return None
-    return {"depth": best[0], "waterway": best[1], "lat": lat, "lon": lon}
+    return {**info, "lat": lat, "lon": lon}
 
 
 def offset_point(lat, lon, bearing_deg, dist_m):
@@ -976,35 +1947,103 @@ def offset_point(lat, lon, bearing_deg, dist_m):
             lon + (dist_m * math.sin(brad)) / mx)
 
 
-_depth_index_cache = {}
+# R-Baum und Raster über die Tiefenflächen, neben den GeoJSON-Dateien abgelegt
+DEPTH_TREE_NAME = "depth.rtree"
+DEPTH_GRID_NAME = "depth.grid"
 
 
 def _depth_index(chart_dir):
-    """Gecachter Tiefen-Flächen-Index eines Charts: Liste (minx,miny,maxx,maxy,
-    depth, geom) für DEPARE/DRGARE. Bbox EINMAL berechnet (nicht pro Abfrage)."""
-    key = str(chart_dir)
-    idx = _depth_index_cache.get(key)
-    if idx is not None:
-        return idx
+    """Gecachter Tiefen-Flächen-Index eines Charts → (einträge, R-Baum,
+    raster).
+    Einträge: [minx, miny, maxx, maxy, depth, layer, i, geom] für DEPARE/
+    DRGARE. Bbox und Tiefe kommen direkt aus den Store-Spalten; die Polygon-
+    Geometrie wird erst beim ersten Punkt-in-Polygon-Test gebaut (_depth_geom)
+    und dann behalten. Der Baum (spatial_index) liefert die Eintrags-Nr.
+    aller Flächen, deren Bbox eine Abfrage schneidet; das Raster
+    (depth_grid) die Tiefe direkt, außer in Zellen mit Flächenkanten.
+    Gehalten in chart_cache (Art "depth"); gebaute Polygone bucht
+    _depth_geom dort nach."""
+    store, sig = _store_entry(chart_dir)
+    cached = chart_cache.get("depth", chart_dir, sig) if store is not None else None
+    if cached is not None:
+        return cached
     idx = []
     for cls in ("depare", "drgare"):
-        for feat in _load_class_features(chart_dir, cls):
-            geom = feat.get("geometry")
-            props = feat.get("properties") or {}
-            if not geom or geom.get("type") not in ("Polygon", "MultiPolygon"):
+        layer = store.layer(cls) if store is not None else None
+        if layer is None:
+            continue
+        for fi in range(len(layer)):
+            if layer.gtype(fi) not in ("Polygon", "MultiPolygon"):
                 continue
-            d = _num_or_none(props.get("DRVAL2"))
+            d = layer.number(fi, "DRVAL2")
             if d is None:
-                d = _num_or_none(props.get("DRVAL1"))
+                d = layer.number(fi, "DRVAL1")
             if d is None:
                 continue
-            pts = _geom_points(geom)
-            if not pts:
-                continue
-            idx.append((min(p[0] for p in pts), min(p[1] for p in pts),
-                        max(p[0] for p in pts), max(p[1] for p in pts), d, geom))
-    _depth_index_cache[key] = idx
-    return idx
+            idx.append([*layer.bbox(fi), d, layer, fi, None])
+    tree = _depth_tree(chart_dir, store, idx)
+    grid = _depth_grid(chart_dir, store, idx)
+    if store is not None:
+        # Baum und Raster sind gemappt — Heap kosten nur die Einträge
+        chart_cache.put("depth", chart_dir, sig, (idx, tree, grid),
+                        len(idx) * _DEPTH_ENTRY_COST)
+    return idx, tree, grid
+
+
+def _depth_tree(chart_dir, store, idx):
+    """R-Baum zum Tiefen-Index laden oder (neu) bauen und speichern. Der
+    Baum trägt die mtime des Stores als tag — nach neuer Extraktion passt
+    der nicht mehr und er wird neu gebaut."""
+    if store is None:
+        return spatial_index.build([])
+    p = Path(chart_dir) / "geojson" / DEPTH_TREE_NAME
+    tag = store.path.stat().st_mtime_ns
+    try:
+        tree = spatial_index.load(p)
+        if tree.tag == tag and len(tree) == len(idx):
+            return tree
+    except Exception:
+        pass   # fehlt/defekt → neu bauen
+    tree = spatial_index.build([e[:4] for e in idx], tag=tag)
+    try:
+        tree.save(p)
+    except OSError as e:
+        print(f"⚠️ Tiefen-Index {p} nicht gespeichert: {e}")
+    return tree
+
+
+def _depth_grid(chart_dir, store, idx):
+    """Tiefenraster laden oder (neu) rastern und speichern — gleiche tag-
+    Regel wie _depth_tree. None = kein Raster (dann nur Polygon-Pfad)."""
+    if store is None or not idx:
+        return None
+    p = Path(chart_dir) / "geojson" / DEPTH_GRID_NAME
+    tag = store.path.stat().st_mtime_ns
+    try:
+        grid = depth_grid.load(p)
+        if grid.tag == tag:
+            return grid
+    except Exception:
+        pass   # fehlt/defekt → neu rastern
+    # Geometrien direkt aus dem Store, nicht über _depth_geom — sonst
+    # blieben nach dem Rastern alle Polygone im Index-Cache liegen
+    grid = depth_grid.build([e[:5] for e in idx], lambda i: idx[i][5].geometry(idx[i][6]),
+                            tag=tag)
+    if grid is not None:
+        try:
+            grid.save(p)
+        except OSError as e:
+            print(f"⚠️ Tiefenraster {p} nicht gespeichert: {e}")
+    return grid
+
+
+def _depth_geom(entry, chart_dir) -> dict:
+    if entry[7] is None:
+        geom = entry[7] = entry[5].geometry(entry[6])
+        polys = [geom["coordinates"]] if geom["type"] == "Polygon" else geom["coordinates"]
+        chart_cache.charge("depth", chart_dir,
+                           _COORD_COST * sum(len(ring) for rings in polys for ring in rings))
+    return entry[7]
 
 
 def depth_scan(points, chart_dirs) -> list:
@@ -1015,18 +2054,30 @@ def depth_scan(points, chart_dirs) -> list:
 
     points: [(lat, lon), ...]. Rückgabe: gleiche Länge, je {depth, waterway}
     (minimale/​konservativste enthaltende Fläche) oder None.
+
+    Je Punkt zuerst das Tiefenraster des Charts (O(1)); nur in Zellen, durch
+    die eine Flächenkante läuft, kommen die Kandidaten aus dem R-Baum und
+    entscheidet der Polygon-Test.
     """
     res = [None] * len(points)   # je Punkt: (depth, waterway)
     for name, chart_dir in chart_dirs:
-        for (minx, miny, maxx, maxy, d, geom) in _depth_index(chart_dir):
-            for i, (plat, plon) in enumerate(points):
-                if not (minx <= plon <= maxx and miny <= plat <= maxy):
-                    continue
-                if res[i] is not None and res[i][0] <= d:
+        idx, tree, grid = _depth_index(chart_dir)
+        for i, (plat, plon) in enumerate(points):
+            if grid is not None:
+                d = grid.lookup(plon, plat)
+                if d is None:
                     continue
-                if _point_in_polygon((plon, plat), geom):
+                if d is not depth_grid.EDGE:
                     if res[i] is None or d < res[i][0]:
                         res[i] = (d, name)
+                    continue
+            for k in tree.search_point(plon, plat):
+                entry = idx[k]
+                d = entry[4]
+                if res[i] is not None and res[i][0] <= d:
+                    continue
+                if _point_in_polygon((plon, plat), _depth_geom(entry, chart_dir)):
+                    res[i] = (d, name)
     return [{"depth": r[0], "waterway": r[1]} if r else None for r in res]
 
 
@@ -1077,14 +2128,20 @@ def lookahead_shallowest(lat, lon, bearing_deg, chart_dirs,
 
 
 def read_tiles_meta(mbtiles_path) -> dict:
-    """Metadaten der kombinierten IENC-MBTiles lesen (oder None)."""
+    """Metadaten der kombinierten IENC-Tiles lesen — MBTiles oder PMTiles-
+    Export (oder None)."""
     p = Path(mbtiles_path)
     if not p.exists():
         return None
     try:
-        conn = sqlite3.connect(f"file:{p}?mode=ro", uri=True)
-        rows = dict(conn.execute("SELECT name, value FROM metadata").fetchall())
-        conn.close()
+        if p.suffix == ".pmtiles":
+            reader = pmtiles.PMTilesReader(p)
+            rows = reader.metadata()
+            reader.close()
+        else:
+            conn = sqlite3.connect(f"file:{p}?mode=ro", uri=True)
+            rows = dict(conn.execute("SELECT name, value FROM metadata").fetchall())
+            conn.close()
         return {
             "generated": rows.get("generated"),
             "bounds": rows.get("bounds"),
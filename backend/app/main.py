@@ -28,6 +28,9 @@ import locks_storage
 import harbor_storage
 import dashboard_dsl
 import ienc
+import mvt
+import pmtiles
+import tile_store
 
 # Load environment variables from .env file (one level up from backend/)
 dotenv_path = Path(__file__).resolve().parent.parent.parent / ".env"
@@ -48,6 +51,11 @@ ROUTING_DIR.mkdir(parents=True, exist_ok=True)
 # Bewusst NICHT direkt in data/ — dort würde der *.mbtiles-Glob sie als
 # Basemap-Region auflisten.
 IENC_MBTILES = CHARTS_DIR / "ienc.mbtiles"
+# Optionaler PMTiles-Export davon (settings enc.tileFormat = "pmtiles")
+IENC_PMTILES = CHARTS_DIR / "ienc.pmtiles"
+# Vorab gemergte Tiles der aktiven Region-Auswahl (tile_store.build_composite),
+# aus demselben Grund in einem Unterordner.
+COMPOSITE_DIR = MBTILES_DIR / "composite"
 
 # Mount charts directory for static serving
 app.mount("/charts", StaticFiles(directory=str(CHARTS_DIR)), name="charts")
@@ -642,6 +650,7 @@ async def set_nav_route(data: dict):
     coords = data.get("coords") or []
     gps_service.set_route(coords)
     await gps_service.broadcast_route()
+    _schedule_route_prefetch([(float(c[0]), float(c[1])) for c in coords])
     return {"status": "ok", "count": len(coords)}
 
 
@@ -697,6 +706,23 @@ async def save_settings(settings: Dict[str, Any]):
         if 'waterCurrent' in settings:
             water_current_service.configure(settings['waterCurrent'])
 
+        # Apply Tile-Cache budget + merge mode
+        if 'tileCacheMB' in settings.get('map', {}):
+            tile_store.tile_cache.configure(settings['map']['tileCacheMB'])
+        if settings.get('map', {}).get('tileMerge') in ("layers", "concat"):
+            global _tile_merge_mode
+            if settings['map']['tileMerge'] != _tile_merge_mode:
+                _tile_merge_mode = settings['map']['tileMerge']
+                _invalidate_map_tiles()
+                _schedule_composite_build(force=True)
+        if settings.get('enc', {}).get('tileFormat') in ("mbtiles", "pmtiles"):
+            global _ienc_tile_format
+            if settings['enc']['tileFormat'] != _ienc_tile_format:
+                _ienc_tile_format = settings['enc']['tileFormat']
+                asyncio.create_task(_sync_ienc_pmtiles())
+        if 'cacheMB' in settings.get('enc', {}):
+            ienc.chart_cache.configure(settings['enc']['cacheMB'])
+
         # Apply Track Sensors config
         if 'trackSensors' in settings:
             global track_sensors_config
@@ -1234,19 +1260,12 @@ async def get_locks_by_waterway(waterway: str):
     return {"locks": locks, "count": len(locks), "waterway": waterway}
 
 def _mbtiles_bounds(mbtiles_path: Path):
-    """Bounds (lon_min, lat_min, lon_max, lat_max) aus MBTiles-Metadaten lesen."""
-    import sqlite3
+    """Bounds (lon_min, lat_min, lon_max, lat_max) aus MBTiles-Metadaten lesen
+    (über den Abdeckungs-Index des Tile-Proxys, der sie ohnehin hält)."""
     try:
-        conn = sqlite3.connect(f"file:{mbtiles_path}?mode=ro", uri=True)
-        row = conn.execute("SELECT value FROM metadata WHERE name='bounds'").fetchone()
-        conn.close()
-        if row:
-            parts = [float(x) for x in row[0].split(",")]
-            if len(parts) == 4:
-                return parts
+        return tile_store.coverage.get(mbtiles_path).bounds
     except Exception:
-        pass
-    return None
+        return None
 
 
 # ==================== LOCKS BACKGROUND JOBS ====================
@@ -1303,8 +1322,8 @@ async def _run_lock_import_inner():
     regions = _get_active_regions()
     bboxes = []
     for r in regions:
-        p = MBTILES_DIR / f"{r}.mbtiles"
-        if p.exists():
+        p = _region_file(r)
+        if p:
             b = _mbtiles_bounds(p)
             if b:
                 bboxes.append((r, b))
@@ -1639,8 +1658,8 @@ async def _run_harbor_import():
         regions = _get_active_regions()
         bboxes = []
         for r in regions:
-            p = MBTILES_DIR / f"{r}.mbtiles"
-            if p.exists():
+            p = _region_file(r)
+            if p:
                 b = _mbtiles_bounds(p)
                 if b:
                     bboxes.append((r, b))
@@ -2015,7 +2034,8 @@ async def upload_chart(files: List[UploadFile] = File(...), name: str = "", laye
         if enc_files and layer_type == 'enc':
             print(f"📊 Extracting {len(enc_files)} Inland ENC file(s) to GeoJSON...")
             try:
-                enc_manifest = await asyncio.to_thread(ienc.extract_geojson, chart_path)
+                enc_manifest = await asyncio.to_thread(ienc.extract_geojson, chart_path, None,
+                                                       _enc_workers("extractWorkers"))
                 print(f"✅ ENC extracted: {enc_manifest['features_total']} features "
                       f"in {len(enc_manifest['classes'])} classes")
             except Exception as e:
@@ -2069,8 +2089,11 @@ async def delete_chart(chart_id: str):
     if chart:
         # Delete files
         chart_path = Path(chart["path"])
+        ienc.chart_cache.invalidate(chart_path)
         if chart_path.exists():
             shutil.rmtree(chart_path)
+        if chart.get("type") == "enc":
+            await asyncio.to_thread(ienc.clear_route_check_cache)
 
         # Remove from list
         chart_layers = [c for c in chart_layers if c["id"] != chart_id]
@@ -2183,6 +2206,44 @@ async def enc_job_status():
     return _enc_job_state
 
 
+# Auslieferungsformat der IENC-Tiles (settings enc.tileFormat). Gebaut wird
+# immer ienc.mbtiles; bei "pmtiles" wird danach exportiert und die PMTiles-
+# Datei ausgeliefert, solange sie nicht älter als die MBTiles ist.
+_ienc_tile_format = "mbtiles"
+
+
+def _ienc_tiles_path() -> Path:
+    if _ienc_tile_format == "pmtiles":
+        try:
+            if IENC_PMTILES.stat().st_mtime_ns >= IENC_MBTILES.stat().st_mtime_ns:
+                return IENC_PMTILES
+        except OSError:
+            pass
+    return IENC_MBTILES
+
+
+async def _sync_ienc_pmtiles():
+    """PMTiles-Export an Format-Einstellung und aktuelle ienc.mbtiles anpassen."""
+    if _ienc_tile_format == "pmtiles" and IENC_MBTILES.exists():
+        stats = await asyncio.to_thread(pmtiles.convert_mbtiles, IENC_MBTILES, IENC_PMTILES)
+        print(f"🧱 IENC-Tiles als PMTiles exportiert: {stats}")
+    else:
+        IENC_PMTILES.unlink(missing_ok=True)
+    tile_store.invalidate_file(IENC_PMTILES)
+    tile_store.tile_cache.invalidate("enc")
+    _invalidate_tile_versions()
+
+
+def _enc_workers(key: str):
+    """Prozess-Anzahl für ENC-Jobs aus den Settings (enc.tileWorkers /
+    enc.extractWorkers); None = Default in ienc (Kerne - 1)."""
+    try:
+        with open("data/settings.json") as f:
+            return json.load(f).get("enc", {}).get(key)
+    except Exception:
+        return None
+
+
 async def _rebuild_ienc_tiles() -> dict:
     """Kombinierte IENC-Vektor-Tiles aus allen aktivierten, konvertierten
     ENC-Charts (neu) bauen. Läuft innerhalb eines ENC-Jobs."""
@@ -2192,7 +2253,19 @@ async def _rebuild_ienc_tiles() -> dict:
     def _cb(msg):
         _enc_job_state["progress"] = f"Vektor-Tiles: {msg}"
 
-    stats = await asyncio.to_thread(ienc.build_mbtiles, charts, IENC_MBTILES, _cb)
+    # Render-Prozesse (settings enc.tileWorkers, Default: Kerne - 1)
+    workers = _enc_workers("tileWorkers")
+
+    # Inkrementell: nur Tiles geänderter/entfernter Gewässer neu rendern
+    stats = await asyncio.to_thread(ienc.update_mbtiles, charts, IENC_MBTILES, _cb, workers)
+    if stats.get("unchanged"):
+        return stats
+    tile_store.invalidate_file(IENC_MBTILES)
+    tile_store.tile_cache.invalidate("enc")
+    _invalidate_tile_versions()
+    if _ienc_tile_format == "pmtiles":
+        _cb("PMTiles-Export…")
+    await _sync_ienc_pmtiles()
     print(f"🧱 IENC-Tiles gebaut: {stats}")
     return stats
 
@@ -2240,7 +2313,9 @@ async def enc_route_check(request: Request):
     if not charts:
         return {"warnings": [], "checked": False, "reason": "Keine IENC-Gewässer installiert"}
 
-    warnings = await asyncio.to_thread(ienc.check_route, coords, charts,
+    # Persistenter Cache (Geometrie + Gewässer-Editionen + Bootsmaße) — die
+    # Pegel-Korrektur unten läuft immer live
+    warnings = await asyncio.to_thread(ienc.check_route_cached, coords, charts,
                                        draft, height)
 
     # Tiefen-Warnungen um den aktuellen Wasserstand korrigieren. Der Pegel-
@@ -2311,9 +2386,31 @@ async def nav_point(lat: float, lon: float, cog: float = None):
     Kombinierte Navi-Instrument-Daten für einen Punkt (aktuelle Position) in
     EINEM Aufruf: Fahrrinnentiefe (pegel-korrigiert), nächster Pegelstand,
     Strömung — und (mit cog) die flachste Fahrrinnentiefe 300–1000 m VORAUS
-    als Früh-Warnung. Vom Navi-Instrument throttled gefetcht.
-    Query: ?lat=&lon=&cog=
+    als Früh-Warnung. Einzelabfrage; das Navi-Instrument bekommt dieselben
+    Daten gepusht über /ws/nav. Query: ?lat=&lon=&cog=
     """
+    return await _compute_nav_point(lat, lon, cog)
+
+
+# Tiefgang aus data/settings.json: (mtime_ns, draft) — neu gelesen nur,
+# wenn sich die Datei geändert hat
+_boat_draft_cache = (None, None)
+
+
+def _boat_draft():
+    global _boat_draft_cache
+    try:
+        mtime = os.stat("data/settings.json").st_mtime_ns
+        if _boat_draft_cache[0] != mtime:
+            with open("data/settings.json", "r") as f:
+                _boat_draft_cache = (mtime, json.load(f).get("boat", {}).get("draft"))
+        return _boat_draft_cache[1]
+    except Exception:
+        return None
+
+
+async def _compute_nav_point(lat: float, lon: float, cog: float = None) -> dict:
+    """Navi-Punktdaten berechnen (für /api/nav/point und den Nav-Stream)."""
     out = {"lat": lat, "lon": lon}
 
     # 1) Fahrrinnentiefe: aktuelle Position + (mit cog) Vorausschau 300/600/1000 m
@@ -2368,12 +2465,11 @@ async def nav_point(lat: float, lon: float, cog: float = None):
             entry = {"depth": s["depth"], "current_depth": a_cur,
                      "distance_m": dm, "waterway": s["waterway"]}
             try:
-                with open("data/settings.json", "r") as f:
-                    draft = json.load(f).get("boat", {}).get("draft")
+                draft = _boat_draft()
                 if draft:
                     entry["draft"] = float(draft)
                     entry["shallow"] = a_cur < float(draft) + 0.3
-            except Exception:
+            except (TypeError, ValueError):
                 pass
             out["ahead"] = entry
 
@@ -2389,29 +2485,156 @@ async def nav_point(lat: float, lon: float, cog: float = None):
     return out
 
 
+# ==================== NAV-STREAM ====================
+# /ws/nav: Navi-Instrument-Daten werden EINMAL je relevanter Bewegung oder
+# Kursänderung berechnet und an alle Abonnenten gepusht — Steuerstand und
+# Deck-Display teilen sich die Arbeit, statt je /api/nav/point zu pollen.
+# Position: Backend-GPS (nav_stream_loop); ohne Fix dürfen Clients ihre
+# eigene schicken ({"lat", "lon", "cog", "sog"}, z.B. Simulation). Beide
+# Quellen laufen durch dieselbe Schwelle. Die letzte Client-Position bleibt
+# als "pending" liegen — Clients senden nur bei Änderung, nav_stream_loop
+# rechnet sie nach Ablauf von NAV_STREAM_MIN_S (und je MAX_AGE) nach.
+NAV_STREAM_MOVE_M = 40        # Neuberechnung ab dieser Bewegung …
+NAV_STREAM_COG_DEG = 15       # … oder Kursänderung (Vorausschau zeigt woanders hin)
+NAV_STREAM_COG_MIN_KN = 1.0   # Kurs zählt erst ab dieser Fahrt (COG springt bei Stillstand)
+NAV_STREAM_MIN_S = 5          # frühestens dann neu rechnen (schnelle Fahrt, GPS-Rauschen)
+NAV_STREAM_MAX_AGE_S = 60     # spätestens dann (Pegel/Strömung)
+NAV_STREAM_POLL_S = 1.0       # Abtastung des Backend-GPS
+NAV_STREAM_SEND_S = 2.0       # hängender Abonnent wird danach abgehängt
+
+nav_subscribers = set()
+_nav_stream = {"lat": None, "lon": None, "cog": None, "t": 0.0, "data": None,
+               "pending": None, "pending_ws": None}
+_nav_stream_lock = asyncio.Lock()
+
+
+def _nav_stream_due(lat: float, lon: float, cog, sog=None) -> bool:
+    """Weicht die Position/der Kurs genug vom letzten Ergebnis ab? Nie
+    öfter als alle NAV_STREAM_MIN_S; Kursänderungen nur mit Kurs und (falls
+    bekannt) Fahrt ab NAV_STREAM_COG_MIN_KN."""
+    st = _nav_stream
+    if st["data"] is None:
+        return True
+    age = asyncio.get_running_loop().time() - st["t"]
+    if age < NAV_STREAM_MIN_S:
+        return False
+    if age >= NAV_STREAM_MAX_AGE_S:
+        return True
+    dx = (lon - st["lon"]) * 111320.0 * cos(radians(lat))
+    dy = (lat - st["lat"]) * 110540.0
+    if sqrt(dx * dx + dy * dy) >= NAV_STREAM_MOVE_M:
+        return True
+    if cog is None or (sog is not None and sog < NAV_STREAM_COG_MIN_KN):
+        return False
+    return st["cog"] is None or abs((cog - st["cog"] + 180) % 360 - 180) >= NAV_STREAM_COG_DEG
+
+
+async def _nav_stream_send(ws, data):
+    """An einen Abonnenten senden — mit Timeout, damit ein hängender Client
+    (schlafendes Tablet, schwaches WLAN) die anderen nicht aufhält."""
+    try:
+        await asyncio.wait_for(ws.send_json(data), NAV_STREAM_SEND_S)
+    except Exception:
+        nav_subscribers.discard(ws)
+        try:
+            await asyncio.wait_for(ws.close(), 1.0)
+        except Exception:
+            pass
+
+
+async def _nav_stream_update(lat: float, lon: float, cog=None, sog=None):
+    """Bei Bedarf neu berechnen und an alle Abonnenten pushen (parallel)."""
+    if not nav_subscribers or not _nav_stream_due(lat, lon, cog, sog):
+        return
+    async with _nav_stream_lock:
+        # Während des Wartens kann die andere Quelle schon gerechnet haben
+        if not _nav_stream_due(lat, lon, cog, sog):
+            return
+        data = await _compute_nav_point(lat, lon, cog)
+        _nav_stream.update(lat=lat, lon=lon, cog=cog, data=data,
+                           t=asyncio.get_running_loop().time())
+    await asyncio.gather(*(_nav_stream_send(ws, data) for ws in list(nav_subscribers)))
+
+
+async def nav_stream_loop():
+    """Background task: Backend-GPS abtasten, solange jemand abonniert hat."""
+    while True:
+        await asyncio.sleep(NAV_STREAM_POLL_S)
+        if not nav_subscribers:
+            continue
+        gps = gps_service.gps_data
+        if gps["fix"] and gps["lat"] is not None and gps["lon"] is not None:
+            pos = (gps["lat"], gps["lon"], gps["heading"], gps["speed"])
+        elif _nav_stream["pending"] is not None:
+            pos = _nav_stream["pending"]   # letzte Client-Position (ohne Backend-Fix)
+        else:
+            continue
+        try:
+            await _nav_stream_update(*pos)
+        except Exception as e:
+            print(f"⚠️ Nav-Stream: {e}")
+
+
+@app.websocket("/ws/nav")
+async def nav_stream_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    nav_subscribers.add(websocket)
+    try:
+        # Neuer Abonnent: letztes Ergebnis sofort, nicht erst bei Bewegung
+        if _nav_stream["data"] is not None:
+            await websocket.send_json(_nav_stream["data"])
+        while True:
+            msg = await websocket.receive_text()
+            if gps_service.gps_data["fix"]:
+                continue  # Backend-GPS hat Vorrang (wie im Frontend)
+            try:
+                pos = json.loads(msg)
+                lat, lon = float(pos["lat"]), float(pos["lon"])
+                cog = float(pos["cog"]) if pos.get("cog") is not None else None
+                sog = float(pos["sog"]) if pos.get("sog") is not None else None
+            except (ValueError, TypeError, KeyError, AttributeError):
+                continue
+            # Merken, auch wenn jetzt noch nicht gerechnet wird (MIN_S)
+            _nav_stream.update(pending=(lat, lon, cog, sog), pending_ws=websocket)
+            try:
+                await _nav_stream_update(lat, lon, cog, sog)
+            except Exception as e:
+                print(f"⚠️ Nav-Stream: {e}")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        nav_subscribers.discard(websocket)
+        if _nav_stream["pending_ws"] is websocket:
+            # Positionsquelle weg — nicht für andere Abonnenten weiterrechnen
+            _nav_stream.update(pending=None, pending_ws=None)
+
+
 @app.get("/api/enc/tiles/status")
 async def enc_tiles_status():
     """Sind kombinierte IENC-Vektor-Tiles vorhanden? (Frontend-Check, Phase 3)"""
-    meta = ienc.read_tiles_meta(IENC_MBTILES)
+    path = _ienc_tiles_path()
+    meta = ienc.read_tiles_meta(path)
     if meta is None:
         return {"available": False}
-    return {"available": True, **meta}
+    return {"available": True, "version": _tile_version([path]),
+            "format": path.suffix[1:], **meta}
+
+
+@app.get("/api/enc/cache/stats")
+async def enc_cache_stats():
+    """Belegung und Trefferquote des Gewässer-Daten-Caches (Diagnose)."""
+    return ienc.chart_cache.stats()
 
 
 @app.get("/api/enc/tiles/{z}/{x}/{y}.pbf")
-async def get_enc_tile(z: int, x: int, y: int):
+async def get_enc_tile(request: Request, z: int, x: int, y: int, v: str = None):
     """IENC-Vektor-Tiles ausliefern (Muster wie /api/map/seamarks)."""
-    if not IENC_MBTILES.exists():
-        return Response(status_code=204)
-    loop = asyncio.get_event_loop()
-    tile = await loop.run_in_executor(None, _read_mbtiles_tile, IENC_MBTILES, z, x, y)
-    if not tile:
+    path = _ienc_tiles_path()
+    if not path.exists():
         return Response(status_code=204)
-    return Response(
-        content=tile,
-        media_type="application/x-protobuf",
-        headers={"Cache-Control": "public, max-age=3600", "Content-Encoding": "gzip"},
-    )
+    # Einzelne Datei, schon gzip — _merge_tiles reicht sie unverändert durch
+    entry = await _merged_tile("enc", [path], z, x, y)
+    return _tile_response(request, entry, [path], v)
 
 
 @app.get("/api/enc/catalog")
@@ -2467,7 +2690,9 @@ async def _run_enc_download(waterways):
                 _enc_job_state["progress"] = f"{_n} ({_i + 1}/{total}): {msg}"
 
             _enc_job_state["progress"] = f"{name} ({i + 1}/{total}): Konvertiere…"
-            manifest = await asyncio.to_thread(ienc.extract_geojson, chart_path, _cb)
+            # Zellen parallel dekodieren (settings enc.extractWorkers)
+            manifest = await asyncio.to_thread(ienc.extract_geojson, chart_path, _cb,
+                                               _enc_workers("extractWorkers"))
 
             # Chart-Eintrag anlegen/ersetzen — stabile ID, Re-Download = Update
             chart_layers = [c for c in chart_layers if c.get("id") != chart_id]
@@ -2517,7 +2742,8 @@ async def _run_enc_convert(chart: dict):
     def _cb(msg):
         _enc_job_state["progress"] = f"{name}: {msg}"
 
-    manifest = await asyncio.to_thread(ienc.extract_geojson, Path(chart["path"]), _cb)
+    manifest = await asyncio.to_thread(ienc.extract_geojson, Path(chart["path"]), _cb,
+                                       _enc_workers("extractWorkers"))
 
     converted = manifest["features_total"] > 0
     for i, c in enumerate(chart_layers):
@@ -3795,6 +4021,16 @@ async def calculate_route(request: dict):
     - GeoJSON Feature with route geometry
     - Properties: distance_m, distance_nm, routing_type, locks, bridges
     """
+    route = await _calculate_route(request)
+    # Korridor-Tiles für die Helm-Zooms vorladen (GeoJSON: lon, lat)
+    coords = route.get("geometry", {}).get("coordinates") if isinstance(route, dict) else None
+    if coords:
+        _schedule_route_prefetch([(float(c[1]), float(c[0])) for c in coords])
+    return route
+
+
+async def _calculate_route(request: dict):
+    """Routing-Strategien für calculate_route (s.o.)."""
     try:
         waypoints_raw = request.get("waypoints", [])
 
@@ -4219,7 +4455,8 @@ def _sanitize_routing_name(filename: str) -> str:
 
 @app.post("/api/routing/upload-raw")
 async def upload_routing_raw(request: Request, overwrite: bool = False):
-    """Streaming upload of a .routing SQLite file built by the MBTiles Creator."""
+    """Streaming upload of a .routing file (v2 or SQLite) built by the MBTiles Creator."""
+    from osrm_routing import ROUTING_V2_MAGIC
     raw_name = request.headers.get("X-Filename", "upload.routing")
     display_name = _sanitize_routing_name(raw_name)
     dest = ROUTING_DIR / display_name
@@ -4232,7 +4469,7 @@ async def upload_routing_raw(request: Request, overwrite: bool = False):
         with open(tmp, "wb") as out:
             async for chunk in request.stream():
                 if not validated:
-                    if len(chunk) < 16 or chunk[:16] != SQLITE_MAGIC:
+                    if chunk[:16] != SQLITE_MAGIC and chunk[:8] != ROUTING_V2_MAGIC:
                         tmp.unlink(missing_ok=True)
                         raise HTTPException(status_code=400, detail="Not a valid .routing file")
                     validated = True
@@ -4246,25 +4483,25 @@ async def upload_routing_raw(request: Request, overwrite: bool = False):
 
     size_mb = round(dest.stat().st_size / 1_048_576, 2)
     if waterway_graph_router:
-        waterway_graph_router.load_all()
+        await asyncio.to_thread(waterway_graph_router.load_all)
         print(f"✅ Routing graph reloaded: {waterway_graph_router._loaded}")
     return {"ok": True, "name": display_name, "size_mb": size_mb}
 
 @app.get("/api/routing/installed")
 async def get_installed_routing_graphs():
     """List installed .routing files (inkl. Lade-/RAM-Skip-Status)."""
+    from osrm_routing import read_routing_metadata
     loaded_set = set(waterway_graph_router._loaded) if waterway_graph_router else set()
     skipped = {s["name"]: s for s in (waterway_graph_router.skipped
                                       if waterway_graph_router else [])}
+    failed = waterway_graph_router.failed if waterway_graph_router else {}
     graphs = []
     for rf in sorted(ROUTING_DIR.glob("*.routing")):
         err = None
         try:
-            con = _sqlite3.connect(f"file:{rf}?mode=ro", uri=True)
-            meta = dict(con.execute("SELECT key, value FROM metadata").fetchall())
-            con.execute("SELECT id, lat, lon FROM nodes LIMIT 1").fetchone()
-            con.close()
-            valid = True
+            meta = read_routing_metadata(rf)
+            valid = rf.stem not in failed
+            err = failed.get(rf.stem)
         except Exception as _e:
             meta = {}
             valid = False
@@ -4277,6 +4514,7 @@ async def get_installed_routing_graphs():
             "node_count": int(meta.get("node_count", 0)),
             "edge_count": int(meta.get("edge_count", 0)),
             "created_at": meta.get("created_at", ""),
+            "format": meta.get("format"),
             "valid": valid,
             "error": err,
             "loaded": rf.stem in loaded_set,
@@ -4296,7 +4534,7 @@ async def delete_routing_graph(name: str):
         raise HTTPException(status_code=404, detail="Routing file not found")
     target.unlink()
     if waterway_graph_router:
-        waterway_graph_router.load_all()
+        await asyncio.to_thread(waterway_graph_router.load_all)
     return {"ok": True, "deleted": target.name}
 
 # ==================== CREW MANAGEMENT ====================
@@ -5062,12 +5300,15 @@ async def startup_event():
     asyncio.create_task(fetch_weather_alerts_periodic())  # Start periodic weather alerts
     asyncio.create_task(harbor_import_scheduler())  # Häfen/Ankerplätze vorab importieren + auffrischen
     asyncio.create_task(gps_service.read_gps_from_signalk())  # Start GPS service from SignalK
+    asyncio.create_task(nav_stream_loop())  # Navi-Instrument-Daten an /ws/nav pushen
     load_known_topics()  # Load persistent topic history
     mqtt_client_init()
     # mqtt_publisher_init()  # DISABLED: Home Assistant removed, no longer needed
     # asyncio.create_task(publish_sensor_data())  # DISABLED: Home Assistant removed, no longer needed
     load_chart_layers()
     init_waterway_router()
+    _load_composite_state()
+    _schedule_composite_build()  # no-op, wenn die Composite-Dateien aktuell sind
     asyncio.create_task(_osrm_health_check_on_startup())
 
     # Load settings and configure services
@@ -5090,6 +5331,21 @@ async def startup_event():
             if 'waterCurrent' in settings:
                 water_current_service.configure(settings['waterCurrent'])
 
+            # Tile-Cache-Budget (MB) + Merge-Modus für den Karten-Proxy
+            if 'tileCacheMB' in settings.get('map', {}):
+                tile_store.tile_cache.configure(settings['map']['tileCacheMB'])
+            if settings.get('map', {}).get('tileMerge') in ("layers", "concat"):
+                global _tile_merge_mode
+                _tile_merge_mode = settings['map']['tileMerge']
+            if settings.get('enc', {}).get('tileFormat') in ("mbtiles", "pmtiles"):
+                global _ienc_tile_format
+                _ienc_tile_format = settings['enc']['tileFormat']
+                if _ienc_tile_format == "pmtiles" and _ienc_tiles_path() != IENC_PMTILES:
+                    asyncio.create_task(_sync_ienc_pmtiles())
+            # Speicherbudget (MB) für Feature-Stores + Tiefen-/Bauwerks-Indizes
+            if 'cacheMB' in settings.get('enc', {}):
+                ienc.chart_cache.configure(settings['enc']['cacheMB'])
+
             # Load Track Sensors config
             if 'trackSensors' in settings:
                 track_sensors_config = list(settings['trackSensors'])
@@ -5322,17 +5578,27 @@ async def _run_update(channel: str = "stable"):
 # ==================== MAP TILE PROXY (multi-region) ====================
 
 def _read_mbtiles_tile(path, z, x, y):
-    # MBTiles y-coordinate is TMS (origin bottom-left) — flip from XYZ
-    tms_y = (1 << z) - 1 - y
-    try:
-        with _sqlite3.connect(str(path)) as conn:
-            row = conn.execute(
-                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
-                (z, x, tms_y)
-            ).fetchone()
-        return bytes(row[0]) if row else None
-    except Exception:
-        return None
+    # Gepoolte read-only Verbindungen bzw. gemappte PMTiles (tile_store)
+    return tile_store.read_tile(path, z, x, y)
+
+# Regionen und Seezeichen dürfen als MBTiles oder PMTiles vorliegen
+TILE_EXTENSIONS = (".mbtiles", ".pmtiles")
+
+def _region_file(stem: str):
+    """Tile-Datei zu einem Region-Stem (MBTiles bevorzugt), sonst None."""
+    for ext in TILE_EXTENSIONS:
+        p = MBTILES_DIR / f"{stem}{ext}"
+        if p.exists():
+            return p
+    return None
+
+def _region_files(suffix: str = "") -> list:
+    """Tile-Dateien der aktiven Regionen ("-seamarks" für die Seezeichen)."""
+    return [p for p in (_region_file(f"{r}{suffix}") for r in _get_active_regions()) if p]
+
+def _installed_tile_files() -> list:
+    return sorted((p for ext in TILE_EXTENSIONS for p in MBTILES_DIR.glob(f"*{ext}")),
+                  key=lambda p: p.name)
 
 _active_regions_cache: list | None = None
 _active_regions_cache_ts: float = 0.0
@@ -5353,7 +5619,7 @@ def _get_active_regions() -> list:
             return regions
     except Exception:
         pass
-    installed = sorted(p.stem for p in MBTILES_DIR.glob("*.mbtiles"))
+    installed = sorted({p.stem for p in _installed_tile_files()})
     result = ["germany"] if "germany" in installed else (installed[:1] if installed else [])
     _active_regions_cache = result
     _active_regions_cache_ts = now
@@ -5362,12 +5628,28 @@ def _get_active_regions() -> list:
 @app.get("/api/map/tiles")
 async def map_tiles_health():
     active = _get_active_regions()
-    available = [r for r in active if (MBTILES_DIR / f"{r}.mbtiles").exists()]
-    return {"ok": len(available) > 0, "active": available}
+    available = [r for r in active if _region_file(r)]
+    version = _tile_version(_region_files(), merged=True)
+    return {"ok": len(available) > 0, "active": available, "version": version}
+
+@app.get("/api/map/tiles/stats")
+async def map_tiles_stats():
+    """Trefferquoten von Verbindungs-Pool und Tile-Cache (Diagnose)."""
+    return {"pool": tile_store.mbtiles_pool.stats(),
+            "pmtiles": tile_store.pmtiles_readers.stats(),
+            "cache": tile_store.tile_cache.stats(),
+            "coverage": tile_store.coverage.stats()}
+
+# Merge-Modus für Tiles mehrerer Regionen (settings map.tileMerge):
+#   "layers" — Layer-Hüllen parsen, ein Layer pro Name (mvt.merge_tiles)
+#   "concat" — Protobuf-Bytes aneinanderhängen (alt, doppelte Layer an Grenzen)
+_tile_merge_mode = "layers"
 
 def _merge_tiles(tiles: list) -> bytes:
-    """Merge multiple MVT tiles into one by concatenating protobuf bytes.
-    Valid because MVT Tile.layers is a repeated field — MapLibre handles duplicates correctly."""
+    """Merge multiple MVT tiles into one. Default is a layer-aware merge (one
+    layer per name, duplicate features dropped); "concat" mode just joins the
+    protobuf bytes, valid because MVT Tile.layers is a repeated field.
+    Result is cached by _merged_tile, so the parse cost is paid once per tile."""
     if len(tiles) == 1:
         t = tiles[0]
         return t if t[:2] == b'\x1f\x8b' else _gzip.compress(t, compresslevel=1)
@@ -5377,55 +5659,327 @@ def _merge_tiles(tiles: list) -> bytes:
             decompressed.append(_gzip.decompress(t) if t[:2] == b'\x1f\x8b' else t)
         except Exception:
             pass
+    if _tile_merge_mode == "layers":
+        try:
+            return _gzip.compress(mvt.merge_tiles(decompressed), compresslevel=1)
+        except Exception as e:
+            print(f"⚠️ Layer-Merge fehlgeschlagen, hänge Tiles an: {e}")
     return _gzip.compress(b"".join(decompressed), compresslevel=1)
 
-@app.get("/api/map/tiles/{z}/{x}/{y}.pbf")
-async def get_map_tile(z: int, x: int, y: int):
+async def _merged_tile(layer: str, paths: list, z: int, x: int, y: int) -> tuple:
+    """Fertiges (gemergtes, gzip) Tile über den LRU-Cache holen → (bytes, etag).
+    b"" = keine Region liefert das Tile (wird ebenfalls gecacht)."""
+    key = (layer, tuple(p.stem for p in paths), z, x, y)
+    cached = tile_store.tile_cache.get(key)
+    if cached is not None:
+        return cached
+    # Passende Composite-Datei vorhanden → ein Lookup, Tile schon fertig gemergt
+    comp = _composite_for(layer, paths)
+    if comp is not None:
+        paths = [comp]
+    # Nur Dateien abfragen, die das Tile überhaupt enthalten können
+    # (Abdeckungs-Index wird je Datei einmal geladen)
+    if not tile_store.coverage.loaded(paths):
+        await asyncio.to_thread(tile_store.coverage.load, paths)
+    paths = tile_store.coverage.filter(paths, z, x, y)
     loop = asyncio.get_event_loop()
-    paths = [MBTILES_DIR / f"{r}.mbtiles" for r in _get_active_regions()
-             if (MBTILES_DIR / f"{r}.mbtiles").exists()]
     reads = await asyncio.gather(*[
         loop.run_in_executor(None, _read_mbtiles_tile, p, z, x, y) for p in paths
     ])
     tiles = [t for t in reads if t]
-    if not tiles:
+    merged = _merge_tiles(tiles) if tiles else b""
+    return tile_store.tile_cache.put(key, merged)
+
+# Tile-URLs ohne ?v= (z.B. Basemap-Clients von /api/map/tiles) dürfen so
+# lange ungeprüft aus dem Browser-Cache kommen; mit alter Version: no-cache
+TILE_MAX_AGE_S = 3600
+
+# Datensatz-Version je Quell-Set — einmal je Invalidierung berechnet statt
+# je Tile (dataset_version stat()et jede Datei). Geleert von
+# _invalidate_map_tiles und nach IENC-Builds (_invalidate_tile_versions).
+_tile_versions: dict = {}
+
+def _tile_version(paths: list, merged: bool = False) -> str:
+    """Version für ?v= und Status-Endpunkte. merged: Basemap/Seamarks —
+    inkl. Merge-Modus (_merged_version)."""
+    key = (tuple(paths), merged)
+    version = _tile_versions.get(key)
+    if version is None:
+        version = _merged_version(paths) if merged else tile_store.dataset_version(paths)
+        _tile_versions[key] = version
+    return version
+
+def _invalidate_tile_versions():
+    _tile_versions.clear()
+
+def _tile_response(request: Request, entry: tuple, paths: list, v: str = None,
+                   merged: bool = False):
+    """Tile-Antwort mit ETag/304. Trägt die URL die aktuelle Datensatz-Version
+    (?v=, siehe Status-Endpunkte), ist das Tile unter dieser URL unveränderlich;
+    mit alter Version muss der Client per If-None-Match revalidieren, ohne
+    Version gilt TILE_MAX_AGE_S."""
+    data, etag = entry
+    if not data:
         return Response(status_code=204)
-    merged = _merge_tiles(tiles)
-    return Response(
-        content=merged,
-        media_type="application/x-protobuf",
-        headers={"Cache-Control": "public, max-age=86400", "Content-Encoding": "gzip"},
-    )
+    if not v:
+        cache_control = f"public, max-age={TILE_MAX_AGE_S}"
+    elif v == _tile_version(paths, merged):
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = "public, no-cache"
+    headers = {"Cache-Control": cache_control, "ETag": etag}
+    if tile_store.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    headers["Content-Encoding"] = "gzip"
+    return Response(content=data, media_type="application/x-protobuf", headers=headers)
+
+def _invalidate_map_tiles():
+    """Nach Upload/Löschen/Aktivieren von Regionen: Verbindungen + Basemap-/
+    Seamark-Tiles verwerfen (IENC bleibt unberührt)."""
+    tile_store.invalidate_file()
+    tile_store.tile_cache.invalidate("map")
+    tile_store.tile_cache.invalidate("seamarks")
+    _invalidate_tile_versions()
+
+# ==================== COMPOSITE-TILES (vorab gemergt) ====================
+# Bei mehreren aktiven Regionen wird die Auswahl im Hintergrund in je eine
+# Composite-Datei für Basemap und Seamarks geschrieben (atomar ersetzt).
+# Bis sie zur aktuellen Auswahl passt, merged der Proxy wie gehabt live.
+# Fortschritt wie bei den ENC-Jobs über einen Status-Dict.
+_composite_job_state = {"running": False, "job": None, "progress": "", "percent": 0, "result": None}
+_composite_versions: dict = {}     # layer → Quell-Version der Datei auf Platte
+_composite_pending = False         # Auswahl hat sich während des Builds geändert
+
+def _composite_path(layer: str) -> Path:
+    return COMPOSITE_DIR / f"{layer}.mbtiles"
+
+def _composite_sources(layer: str) -> list:
+    return _region_files("-seamarks" if layer == "seamarks" else "")
+
+def _merged_version(paths: list) -> str:
+    """Version gemergter Basemap-/Seamark-Tiles: Quell-Version plus
+    Merge-Modus — ein im "concat"-Modus gebautes Composite (oder ein so
+    gecachtes Client-Tile) passt nicht zu "layers" und umgekehrt."""
+    return f"{tile_store.dataset_version(paths)}-{_tile_merge_mode}"
+
+def _composite_for(layer: str, paths: list):
+    """Composite-Datei, wenn sie exakt diese Quellen (inkl. Dateistand) im
+    aktuellen Merge-Modus abbildet."""
+    if layer not in ("map", "seamarks") or len(paths) < 2:
+        return None
+    version = _composite_versions.get(layer)
+    if version and version == _merged_version(paths):
+        return _composite_path(layer)
+    return None
+
+def _drop_composite(layer: str):
+    path = _composite_path(layer)
+    _composite_versions.pop(layer, None)
+    tile_store.mbtiles_pool.invalidate(path)
+    tile_store.coverage.invalidate(path)
+    path.unlink(missing_ok=True)
+
+def _schedule_composite_build(force: bool = False):
+    """Composite-Build anstoßen; läuft schon einer, danach erneut bauen."""
+    global _composite_pending
+    if force:
+        _composite_versions.clear()
+    if _composite_job_state["running"]:
+        _composite_pending = True
+        return
+    _composite_job_state.update({"running": True, "job": "composite", "progress": "Starte…",
+                                 "percent": 0, "result": None})
+    asyncio.create_task(_run_composite_build())
+
+async def _run_composite_build():
+    global _composite_pending
+    try:
+        while True:
+            _composite_pending = False
+            results = {}
+            for i, layer in enumerate(("map", "seamarks")):
+                sizes = {}
+                for p in _composite_sources(layer):
+                    try:
+                        sizes[p] = p.stat().st_size
+                    except OSError:
+                        pass   # zwischen Auflisten und stat gelöscht
+                sources = list(sizes)
+                if len(sources) < 2:
+                    # Eine Region wird direkt ausgeliefert — nichts zu mergen
+                    _drop_composite(layer)
+                    results[layer] = {"skipped": "Weniger als zwei Regionen aktiv"}
+                    continue
+                if any(tile_store.is_pmtiles_path(p) for p in sources):
+                    # Composite wird per SQLite gemergt — PMTiles-Regionen live
+                    _drop_composite(layer)
+                    results[layer] = {"skipped": "PMTiles-Regionen werden live gemergt"}
+                    continue
+                version = _merged_version(sources)
+                if _composite_versions.get(layer) == version:
+                    results[layer] = {"up_to_date": True, "version": version}
+                    continue
+                need = sum(sizes.values())
+                old = _composite_path(layer)
+                free = shutil.disk_usage(MBTILES_DIR).free + (old.stat().st_size if old.exists() else 0)
+                if need * 1.1 > free:
+                    _drop_composite(layer)
+                    results[layer] = {"skipped": "Zu wenig Speicherplatz"}
+                    continue
+
+                def _cb(pct, msg, _i=i, _layer=layer):
+                    _composite_job_state["percent"] = (_i * 100 + pct) // 2
+                    _composite_job_state["progress"] = f"{_layer}: {msg}"
+
+                stats = await asyncio.to_thread(tile_store.build_composite, sources,
+                                                _composite_path(layer), _merge_tiles, _cb,
+                                                version)
+                tile_store.mbtiles_pool.invalidate(_composite_path(layer))
+                tile_store.coverage.invalidate(_composite_path(layer))
+                _composite_versions[layer] = stats["version"]
+                results[layer] = stats
+                print(f"🧱 Composite-Tiles '{layer}' gebaut: {stats}")
+            if not _composite_pending:
+                break
+        _composite_job_state.update({
+            "running": False, "percent": 100, "progress": "Fertig",
+            "result": {"success": True, **results},
+        })
+    except Exception as e:
+        print(f"❌ Composite-Build fehlgeschlagen: {e}")
+        _composite_job_state.update({
+            "running": False, "progress": "Fehler", "percent": 100,
+            "result": {"success": False, "error": str(e)},
+        })
+
+def _load_composite_state():
+    """Beim Start: Quell-Versionen vorhandener Composite-Dateien einlesen."""
+    for layer in ("map", "seamarks"):
+        version = tile_store.composite_version(_composite_path(layer))
+        if version:
+            _composite_versions[layer] = version
+
+@app.get("/api/map/composite/status")
+async def composite_status():
+    return {**_composite_job_state, "versions": dict(_composite_versions)}
+
+# ==================== ROUTEN-PREFETCH ====================
+# Wird eine Route gesetzt/berechnet, liest ein Hintergrund-Task alle Tiles im
+# Korridor um die Route (Basemap, Seamarks, IENC) über _merged_tile in den
+# Tile-Cache — unterwegs gibt es dann keine kalten SD-Karten-Lesezugriffe,
+# wenn die Karte dem Boot folgt. Einstellungen: settings map.prefetch.
+_PREFETCH_DEFAULTS = {"enabled": True, "bufferM": 500, "minZoom": 11, "maxZoom": 14}
+# Anteil des Cache-Budgets, den ein Prefetch höchstens füllen darf — sonst
+# verdrängt das Routenende per LRU wieder den Anfang
+_PREFETCH_BUDGET_SHARE = 0.8
+_prefetch_state = {"running": False, "progress": "", "percent": 0, "tiles": 0,
+                   "total": 0, "bytes": 0, "result": None}
+_prefetch_task = None
+
+def _prefetch_settings() -> dict:
+    cfg = dict(_PREFETCH_DEFAULTS)
+    try:
+        with open("data/settings.json") as f:
+            cfg.update(json.load(f).get("map", {}).get("prefetch", {}))
+    except Exception:
+        pass
+    return cfg
+
+def _schedule_route_prefetch(points: list):
+    """Prefetch für eine Route [(lat, lon), ...] starten; ein laufender
+    Prefetch (alte Route) wird abgebrochen."""
+    global _prefetch_task
+    cfg = _prefetch_settings()
+    if not cfg.get("enabled") or not points:
+        return
+    if _prefetch_task is not None and not _prefetch_task.done():
+        _prefetch_task.cancel()
+    _prefetch_state.update({"running": True, "progress": "Starte…", "percent": 0,
+                            "tiles": 0, "total": 0, "bytes": 0, "result": None})
+    _prefetch_task = asyncio.create_task(_run_route_prefetch(points, cfg))
+
+async def _run_route_prefetch(points: list, cfg: dict):
+    try:
+        buffer_m = max(0.0, float(cfg["bufferM"]))
+        zooms = range(int(cfg["minZoom"]), int(cfg["maxZoom"]) + 1)
+        layers = [("map", _region_files()), ("seamarks", _region_files("-seamarks"))]
+        enc_path = _ienc_tiles_path()
+        if enc_path.exists():
+            layers.append(("enc", [enc_path]))
+        layers = [(name, paths) for name, paths in layers if paths]
+
+        # Tile-Liste routenweise: an jeder Position entlang der Route alle
+        # Zooms — reicht das Budget nicht, fehlt das Routenende, nicht z14
+        tiles = await asyncio.to_thread(tile_store.route_corridor_tiles, points, buffer_m, zooms)
+        route_m = tile_store.route_length_m(points)
+        total = len(tiles) * len(layers)
+        _prefetch_state["total"] = total
+        limit = tile_store.tile_cache.budget * _PREFETCH_BUDGET_SHARE
+
+        done = fetched = 0
+        truncated = False
+        cached_m = 0.0
+        for dist_m, z, x, y in tiles:
+            if fetched > limit:
+                # alles vor dieser Position ist in allen Zooms im Cache
+                truncated = True
+                cached_m = dist_m
+                break
+            for name, paths in layers:
+                data, _ = await _merged_tile(name, paths, z, x, y)
+                fetched += len(data)
+                done += 1
+            _prefetch_state.update({
+                "tiles": done, "bytes": fetched,
+                "percent": done * 100 // total if total else 100,
+                "progress": f"{dist_m / 1000:.1f}/{route_m / 1000:.1f} km: {done}/{total} Tiles",
+            })
+        if not truncated:
+            cached_m = route_m
+        result = {"success": True, "tiles": done, "total": total,
+                  "size_mb": round(fetched / 1048576, 2), "truncated": truncated,
+                  "cached_km": round(cached_m / 1000, 1), "route_km": round(route_m / 1000, 1),
+                  "layers": [name for name, _ in layers], "zooms": [zooms.start, zooms.stop - 1]}
+        print(f"🗺️ Routen-Prefetch: {result}")
+        _prefetch_state.update({"running": False, "percent": 100,
+                                "progress": "Fertig (Cache voll)" if truncated else "Fertig",
+                                "result": result})
+    except asyncio.CancelledError:
+        # Abgebrochen für eine neue Route — der Status gehört schon dem neuen Task
+        raise
+    except Exception as e:
+        print(f"❌ Routen-Prefetch fehlgeschlagen: {e}")
+        _prefetch_state.update({"running": False, "progress": "Fehler", "percent": 100,
+                                "result": {"success": False, "error": str(e)}})
+
+@app.get("/api/map/prefetch/status")
+async def prefetch_status():
+    return {**_prefetch_state, "settings": _prefetch_settings()}
+
+@app.get("/api/map/tiles/{z}/{x}/{y}.pbf")
+async def get_map_tile(request: Request, z: int, x: int, y: int, v: str = None):
+    paths = _region_files()
+    entry = await _merged_tile("map", paths, z, x, y)
+    return _tile_response(request, entry, paths, v, merged=True)
 
 @app.get("/api/map/seamarks/status")
 async def seamark_status():
     active = _get_active_regions()
-    available = [r for r in active if (MBTILES_DIR / f"{r}-seamarks.mbtiles").exists()]
-    return {"available": len(available) > 0, "regions": available}
+    available = [r for r in active if _region_file(f"{r}-seamarks")]
+    version = _tile_version(_region_files("-seamarks"), merged=True)
+    return {"available": len(available) > 0, "regions": available, "version": version}
 
 @app.get("/api/map/seamarks/{z}/{x}/{y}.pbf")
-async def get_seamark_tile(z: int, x: int, y: int):
-    loop = asyncio.get_event_loop()
-    paths = [MBTILES_DIR / f"{r}-seamarks.mbtiles" for r in _get_active_regions()
-             if (MBTILES_DIR / f"{r}-seamarks.mbtiles").exists()]
-    reads = await asyncio.gather(*[
-        loop.run_in_executor(None, _read_mbtiles_tile, p, z, x, y) for p in paths
-    ])
-    tiles = [t for t in reads if t]
-    if not tiles:
-        return Response(status_code=204)
-    merged = _merge_tiles(tiles)
-    return Response(
-        content=merged,
-        media_type="application/x-protobuf",
-        headers={"Cache-Control": "public, max-age=86400", "Content-Encoding": "gzip"},
-    )
+async def get_seamark_tile(request: Request, z: int, x: int, y: int, v: str = None):
+    paths = _region_files("-seamarks")
+    entry = await _merged_tile("seamarks", paths, z, x, y)
+    return _tile_response(request, entry, paths, v, merged=True)
 
 @app.get("/api/map/regions")
 async def map_regions():
     active = _get_active_regions()
     installed = []
-    for p in sorted(MBTILES_DIR.glob("*.mbtiles")):
+    for p in _installed_tile_files():
         try:
             size_mb = round(p.stat().st_size / 1_048_576, 1)
         except Exception:
@@ -5447,12 +6001,15 @@ async def delete_map_region(region_id: str):
     stem = re.sub(r"[^\w\-]", "", region_id)
     deleted = []
     for suffix in ["", "-seamarks"]:
-        path = MBTILES_DIR / f"{stem}{suffix}.mbtiles"
-        if path.exists():
-            path.unlink()
-            deleted.append(path.name)
+        for ext in TILE_EXTENSIONS:
+            path = MBTILES_DIR / f"{stem}{suffix}{ext}"
+            if path.exists():
+                path.unlink()
+                deleted.append(path.name)
     if not deleted:
         raise HTTPException(status_code=404, detail="Region not found")
+    _invalidate_map_tiles()
+    _schedule_composite_build()
     active = _get_active_regions()
     if stem in active:
         active = [r for r in active if r != stem]
@@ -5471,7 +6028,7 @@ async def set_active_regions(body: dict):
     regions = body.get("regions", [])
     # Validate — only accept base map regions (no seamark companions)
     valid = [r for r in regions
-             if not r.endswith("-seamarks") and (MBTILES_DIR / f"{r}.mbtiles").exists()]
+             if not r.endswith("-seamarks") and _region_file(r)]
     try:
         with open("data/settings.json") as f:
             s = json.load(f)
@@ -5485,6 +6042,10 @@ async def set_active_regions(body: dict):
     _active_regions_cache = valid
     import time as _time
     _active_regions_cache_ts = _time.monotonic()
+    # Verbindungen deaktivierter Regionen nicht ewig offen halten,
+    # gecachte Tiles des alten Region-Sets freigeben
+    _invalidate_map_tiles()
+    _schedule_composite_build()
     try:
         subprocess.Popen(["sudo", "/bin/systemctl", "restart", "tileserver"],
                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
@@ -5495,27 +6056,39 @@ async def set_active_regions(body: dict):
 def _sanitize_mbtiles_name(raw_name: str) -> tuple:
     safe = re.sub(r"[^\w\-.]", "_", raw_name)
     stem = Path(safe).stem
-    return stem, stem + ".mbtiles"
+    ext = ".pmtiles" if safe.lower().endswith(".pmtiles") else ".mbtiles"
+    return stem, stem + ext
+
+def _valid_tile_header(data: bytes, dest: Path) -> bool:
+    """Magic-Bytes passend zur Endung prüfen (SQLite bzw. PMTiles)."""
+    if dest.suffix == ".pmtiles":
+        return pmtiles.is_pmtiles(data)
+    return len(data) >= 16 and data[:16] == b"SQLite format 3\x00"
 
 async def _write_mbtiles_stream(dest: Path, read_fn, overwrite: bool):
-    SQLITE_MAGIC = b"SQLite format 3\x00"
+    """Upload in eine Temp-Datei daneben schreiben und atomar ersetzen —
+    der Tile-Pool öffnet Regionen immutable, eine in place überschriebene
+    Datei könnte er halb geschrieben lesen."""
     CHUNK_SIZE = 1_048_576
     first_chunk = await read_fn(CHUNK_SIZE)
-    if len(first_chunk) < 16 or first_chunk[:16] != SQLITE_MAGIC:
+    if not _valid_tile_header(first_chunk, dest):
         raise HTTPException(status_code=400, detail="Not a valid MBTiles file")
     if dest.exists() and not overwrite:
         raise HTTPException(status_code=409, detail=f"{dest.name} already exists")
+    tmp = dest.with_name(f".{dest.name}.uploading")
     try:
-        with open(dest, "wb") as out:
+        with open(tmp, "wb") as out:
             out.write(first_chunk)
             while True:
                 chunk = await read_fn(CHUNK_SIZE)
                 if not chunk:
                     break
                 out.write(chunk)
+        tmp.replace(dest)
     except Exception as e:
-        dest.unlink(missing_ok=True)
+        tmp.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Write error: {e}")
+    _invalidate_map_tiles()
     return round(dest.stat().st_size / 1_048_576, 2)
 
 @app.post("/api/map/regions/upload")
@@ -5523,6 +6096,7 @@ async def upload_mbtiles(file: UploadFile = File(...), overwrite: bool = False):
     stem, display_name = _sanitize_mbtiles_name(file.filename or "upload.mbtiles")
     dest = MBTILES_DIR / display_name
     size_mb = await _write_mbtiles_stream(dest, file.read, overwrite)
+    _schedule_composite_build()
     return {"ok": True, "id": stem, "name": display_name, "size_mb": size_mb}
 
 @app.post("/api/map/regions/upload-chunk")
@@ -5542,8 +6116,7 @@ async def upload_mbtiles_chunk(
     data = await file.read()
 
     if chunk_index == 0:
-        SQLITE_MAGIC = b"SQLite format 3\x00"
-        if len(data) < 16 or data[:16] != SQLITE_MAGIC:
+        if not _valid_tile_header(data, dest):
             raise HTTPException(status_code=400, detail="Not a valid MBTiles file")
         if dest.exists() and not overwrite:
             raise HTTPException(status_code=409, detail=f"{display_name} already exists")
@@ -5567,6 +6140,8 @@ async def upload_mbtiles_chunk(
         except Exception as e:
             tmp.unlink(missing_ok=True)
             raise HTTPException(status_code=500, detail=f"Finalize error: {e}")
+        _invalidate_map_tiles()
+        _schedule_composite_build()
         size_mb = round(dest.stat().st_size / 1_048_576, 2)
         return {"ok": True, "id": stem, "name": display_name, "size_mb": size_mb, "done": True}
 
@@ -5579,22 +6154,26 @@ async def upload_mbtiles_raw(request: Request, overwrite: bool = False):
     dest = MBTILES_DIR / display_name
     if dest.exists() and not overwrite:
         raise HTTPException(status_code=409, detail=f"{dest.name} already exists")
-    SQLITE_MAGIC = b"SQLite format 3\x00"
     validated = False
+    # Temp-Datei + atomares Ersetzen (wie _write_mbtiles_stream)
+    tmp = MBTILES_DIR / f".{display_name}.uploading"
     try:
-        with open(dest, "wb") as out:
+        with open(tmp, "wb") as out:
             async for chunk in request.stream():
                 if not validated:
-                    if len(chunk) < 16 or chunk[:16] != SQLITE_MAGIC:
+                    if not _valid_tile_header(chunk, dest):
                         raise HTTPException(status_code=400, detail="Not a valid MBTiles file")
                     validated = True
                 out.write(chunk)
+        tmp.replace(dest)
     except HTTPException:
-        dest.unlink(missing_ok=True)
+        tmp.unlink(missing_ok=True)
         raise
     except Exception as e:
-        dest.unlink(missing_ok=True)
+        tmp.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Write error: {e}")
+    _invalidate_map_tiles()
+    _schedule_composite_build()
     size_mb = round(dest.stat().st_size / 1_048_576, 2)
     return {"ok": True, "id": stem, "name": display_name, "size_mb": size_mb}
 
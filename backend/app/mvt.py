@@ -189,6 +189,73 @@ def _shoelace(ring) -> float:
     return a / 2.0
 
 
+def _simplify(pts, tol: float):
+    """Douglas-Peucker (iterativ) mit Toleranz in Tile-Einheiten. Erster und
+    letzter Punkt bleiben immer — bei geschlossenen Ringen also der Ring."""
+    n = len(pts)
+    if tol <= 0 or n < 3:
+        return pts
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    tol2 = tol * tol
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        ax, ay = pts[a]
+        dx, dy = pts[b][0] - ax, pts[b][1] - ay
+        seg2 = dx * dx + dy * dy
+        best, best_i = tol2, -1
+        for i in range(a + 1, b):
+            px, py = pts[i][0] - ax, pts[i][1] - ay
+            if seg2 == 0:
+                d2 = px * px + py * py
+            else:
+                t = (px * dx + py * dy) / seg2
+                t = 0.0 if t < 0 else (1.0 if t > 1 else t)
+                ex, ey = px - t * dx, py - t * dy
+                d2 = ex * ex + ey * ey
+            if d2 > best:
+                best, best_i = d2, i
+        if best_i >= 0:
+            keep[best_i] = True
+            stack.append((a, best_i))
+            stack.append((best_i, b))
+    return [p for p, k in zip(pts, keep) if k]
+
+
+def _crossing_rings(rings) -> set:
+    """Indizes der Ringe (geschlossene Punktlisten, ganzzahlig), die sich
+    selbst oder einen anderen Ring echt kreuzen — Schnittpunkt im Inneren
+    beider Strecken; Berührungen an Stützpunkten zählen nicht. Sweep über
+    die nach x sortierten Strecken."""
+    segs = []
+    for k, ring in enumerate(rings):
+        for (ax, ay), (bx, by) in zip(ring, ring[1:]):
+            if ax > bx:
+                ax, ay, bx, by = bx, by, ax, ay
+            segs.append((ax, ay, bx, by, k))
+    segs.sort()
+    bad = set()
+    for i, (ax, ay, bx, by, k) in enumerate(segs):
+        ylo, yhi = (ay, by) if ay < by else (by, ay)
+        for j in range(i + 1, len(segs)):
+            cx, cy, dx, dy, m = segs[j]
+            if cx > bx:
+                break
+            if (cy < ylo and dy < ylo) or (cy > yhi and dy > yhi):
+                continue
+            d1 = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+            d2 = (bx - ax) * (dy - ay) - (by - ay) * (dx - ax)
+            if d1 * d2 >= 0:
+                continue
+            d3 = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx)
+            d4 = (dx - cx) * (by - cy) - (dy - cy) * (bx - cx)
+            if d3 * d4 < 0:
+                bad.add(k)
+                bad.add(m)
+    return bad
+
+
 def _quantize(coords):
     """Float-Koordinaten runden, aufeinanderfolgende Duplikate entfernen."""
     out = []
@@ -199,13 +266,21 @@ def _quantize(coords):
     return out
 
 
-def clip_geometry(geojson_geom: dict, z: int, tx: int, ty: int):
+def clip_geometry(geojson_geom: dict, z: int, tx: int, ty: int,
+                  tolerance: float = 0.0, min_area: float = 0.0):
     """
     GeoJSON-Geometrie für Tile (z,tx,ty) vorbereiten: projizieren, clippen,
     quantisieren. Rückgabe: (mvt_type, parts) oder None wenn nichts übrig.
 
     parts: Point → Liste von (x,y); LineString → Liste von Punktlisten;
     Polygon → Liste von Ringen (Exterior positiv, Löcher negativ orientiert).
+
+    tolerance: Douglas-Peucker-Toleranz (Tile-Einheiten) für Linien und
+    Ringe; ein Ring, der dabei kollabiert oder seine Orientierung umdreht,
+    bleibt unvereinfacht — ebenso Ringe, die danach sich selbst oder einen
+    anderen Ring desselben Polygons (Exterior/Löcher) kreuzen würden.
+    min_area: Polygone (samt Löchern) und Löcher mit kleinerer Fläche
+    (Tile-Einheiten²) fallen weg. 0 = aus (volles Detail).
     """
     gtype = geojson_geom.get("type")
     coords = geojson_geom.get("coordinates")
@@ -230,7 +305,7 @@ def clip_geometry(geojson_geom: dict, z: int, tx: int, ty: int):
         for line in lines:
             local = _to_local([strip_z(p) for p in line], z, tx, ty)
             for piece in _clip_line(local, lo, hi):
-                q = _quantize(piece)
+                q = _simplify(_quantize(piece), tolerance)
                 if len(q) >= 2:
                     parts.append(q)
         return (GEOM_LINESTRING, parts) if parts else None
@@ -239,20 +314,47 @@ def clip_geometry(geojson_geom: dict, z: int, tx: int, ty: int):
         polys = [coords] if gtype == "Polygon" else coords
         parts = []
         for rings in polys:
+            cand = []   # [ri, geschlossener Ring, Fläche, vereinfacht|None, Fläche]
             for ri, ring in enumerate(rings):
                 local = _to_local([strip_z(p) for p in ring], z, tx, ty)
                 clipped = _clip_ring(local, lo, hi)
                 if len(clipped) < 3:
+                    if ri == 0:
+                        break  # Exterior weg → Löcher hätten keinen Bezug
                     continue
                 q = _quantize(clipped)
                 # Ring schließen für Flächenberechnung, aber offen speichern
                 if len(q) >= 2 and q[0] == q[-1]:
                     q = q[:-1]
                 if len(q) < 3:
+                    if ri == 0:
+                        break
                     continue
                 closed = q + [q[0]]
                 area = _shoelace(closed)
-                if area == 0:
+                s, s_area = None, 0.0
+                if tolerance > 0:
+                    s = _simplify(closed, tolerance)
+                    s_area = _shoelace(s) if len(s) >= 4 else 0.0
+                    if s_area == 0 or (s_area > 0) != (area > 0):
+                        s = None
+                cand.append([ri, closed, area, s, s_area])
+            # Vereinfachung darf keine Kreuzungen erzeugen: betroffene Ringe
+            # auf die Originale zurücksetzen, bis das Polygon sauber ist
+            while True:
+                bad = [c for c in (cand[k] for k in _crossing_rings(
+                    [c[3] or c[1] for c in cand])) if c[3] is not None]
+                if not bad:
+                    break
+                for c in bad:
+                    c[3] = None
+            for ri, closed, area, s, s_area in cand:
+                q = closed[:-1]
+                if s is not None:
+                    q, area = s[:-1], s_area
+                if area == 0 or abs(area) < min_area:
+                    if ri == 0:
+                        break
                     continue
                 want_positive = (ri == 0)  # Exterior positiv, Löcher negativ
                 if (area > 0) != want_positive:
@@ -372,3 +474,339 @@ def encode_tile(layers: dict) -> bytes:
 
         out += _len_field(3, bytes(layer))
     return bytes(out)
+
+
+# ==================== SCHNELLER ENCODER ====================
+# Gleiche Ausgabe wie encode_tile (byte-identisch), aber für die innere
+# Schleife des IENC-Builds optimiert:
+#  - Geometrie-Kommandos, Delta, Zigzag und Varint in EINEM Durchlauf direkt
+#    in ein wiederverwendetes bytearray (keine int-Liste, kein b"".join)
+#  - Varints < 2^14 (praktisch alle Deltas/Kommandos) aus einer Tabelle
+#  - Keys/Values werden je Layer-Name über alle Tiles eines Encoders
+#    wiederverwendet (fertig encodierte Felder), ebenso die aufbereiteten
+#    Tags je Properties-Dict — dieselben Features landen in vielen Tiles.
+
+_VARINT_TABLE = [_varint(i) for i in range(1 << 14)]
+
+
+def _put_varint(buf: bytearray, v: int):
+    if v < 16384:
+        buf += _VARINT_TABLE[v]
+    else:
+        buf += _varint(v)
+
+
+def _put_geometry(buf: bytearray, mvt_type: int, parts):
+    vt = _VARINT_TABLE
+    px = py = 0
+    if mvt_type == GEOM_POINT:
+        _put_varint(buf, _cmd(_CMD_MOVETO, len(parts)))
+        runs = ((parts, None),)
+    else:
+        runs = ((p, mvt_type == GEOM_POLYGON) for p in parts)
+    for pts, close in runs:
+        if close is not None:
+            # MoveTo(1) + erster Punkt, danach LineTo(n-1)
+            x, y = pts[0]
+            buf += vt[9]  # _cmd(_CMD_MOVETO, 1)
+            dx, dy = x - px, y - py
+            dx = (dx << 1) ^ (dx >> 63)
+            dy = (dy << 1) ^ (dy >> 63)
+            buf += vt[dx] if dx < 16384 else _varint(dx)
+            buf += vt[dy] if dy < 16384 else _varint(dy)
+            px, py = x, y
+            _put_varint(buf, _cmd(_CMD_LINETO, len(pts) - 1))
+            it = iter(pts)
+            next(it)
+        else:
+            it = iter(pts)
+        for x, y in it:
+            dx, dy = x - px, y - py
+            dx = (dx << 1) ^ (dx >> 63)
+            dy = (dy << 1) ^ (dy >> 63)
+            buf += vt[dx] if dx < 16384 else _varint(dx)
+            buf += vt[dy] if dy < 16384 else _varint(dy)
+            px, py = x, y
+        if close:
+            buf += vt[15]  # _cmd(_CMD_CLOSEPATH, 1)
+
+
+def _norm_value(v):
+    """Property-Wert wie in encode_tile normalisieren (None = weglassen)."""
+    if isinstance(v, (list, tuple)):
+        return ",".join(str(e) for e in v)
+    if isinstance(v, dict):
+        return json.dumps(v, ensure_ascii=False)
+    return v
+
+
+class _LayerCache:
+    __slots__ = ("key_fields", "value_fields")
+
+    def __init__(self):
+        self.key_fields = {}     # key → encodiertes Feld 3
+        self.value_fields = {}   # (typname, wert) → encodiertes Feld 4
+
+
+class TileEncoder:
+    """
+    Wiederverwendbarer Tile-Encoder: encode(layers) liefert dasselbe wie
+    encode_tile(layers). Eine Instanz pro Build (bzw. pro Worker-Prozess)
+    — die Caches wachsen mit der Zahl verschiedener Keys/Values/Features.
+    """
+
+    def __init__(self):
+        self._layers = {}   # layer_name → _LayerCache
+        self._props = {}    # id(props) → (props, [(key, (typ, wert)), ...])
+        self._geom = bytearray()
+        self._feat = bytearray()
+        self._layer = bytearray()
+
+    def _items(self, props: dict) -> list:
+        hit = self._props.get(id(props))
+        if hit is not None and hit[0] is props:
+            return hit[1]
+        items = []
+        for k, v in props.items():
+            if v is None:
+                continue
+            v = _norm_value(v)
+            items.append((k, (type(v).__name__, v)))
+        # props mitspeichern: hält das Dict am Leben, id() bleibt eindeutig
+        self._props[id(props)] = (props, items)
+        return items
+
+    def encode(self, layers: dict) -> bytes:
+        out = bytearray()
+        geom, fb, layer = self._geom, self._feat, self._layer
+        for name, features in layers.items():
+            if not features:
+                continue
+            cache = self._layers.get(name)
+            if cache is None:
+                cache = self._layers[name] = _LayerCache()
+            key_fields, value_fields = cache.key_fields, cache.value_fields
+            key_idx, value_idx = {}, {}
+            keys, values = [], []
+
+            del layer[:]
+            layer += b"\x78\x02"  # _varint_field(15, 2): version
+            name_b = name.encode("utf-8")
+            layer += b"\x0a"
+            _put_varint(layer, len(name_b))
+            layer += name_b
+
+            for mvt_type, parts, props in features:
+                del fb[:]
+                items = self._items(props)
+                if items:
+                    del geom[:]   # als Scratch für die Tags
+                    for k, vk in items:
+                        ki = key_idx.get(k)
+                        if ki is None:
+                            ki = key_idx[k] = len(keys)
+                            f = key_fields.get(k)
+                            if f is None:
+                                f = key_fields[k] = _len_field(3, k.encode("utf-8"))
+                            keys.append(f)
+                        vi = value_idx.get(vk)
+                        if vi is None:
+                            vi = value_idx[vk] = len(values)
+                            f = value_fields.get(vk)
+                            if f is None:
+                                f = value_fields[vk] = _len_field(4, _encode_value(vk[1]))
+                            values.append(f)
+                        _put_varint(geom, ki)
+                        _put_varint(geom, vi)
+                    fb += b"\x12"
+                    _put_varint(fb, len(geom))
+                    fb += geom
+                fb += b"\x18"
+                _put_varint(fb, mvt_type)
+                del geom[:]
+                _put_geometry(geom, mvt_type, parts)
+                fb += b"\x22"
+                _put_varint(fb, len(geom))
+                fb += geom
+
+                layer += b"\x12"
+                _put_varint(layer, len(fb))
+                layer += fb
+
+            for f in keys:
+                layer += f
+            for f in values:
+                layer += f
+            layer += _varint_field(5, EXTENT)
+
+            out += b"\x1a"
+            _put_varint(out, len(layer))
+            out += layer
+        return bytes(out)
+
+
+# ==================== TILE-MERGE (LAYER-WEISE) ====================
+# Überlappende Regionen liefern an den Grenzen je ein eigenes Tile mit den
+# gleichen Layer-Namen (water, waterway, ...). Reines Protobuf-Konkat ergäbe
+# doppelte Layer — doppelte Nutzlast und MapLibre rendert beide Kopien.
+# Hier werden die Layer-Hüllen geparst (gleiches Wire-Format wie der Parser
+# in water_current.py), die Features je Layer-Name vereint und mit neu
+# indizierten keys/values als EIN Layer pro Name neu geschrieben. Identische
+# Features (dasselbe OSM-Objekt in beiden Extrakten) fallen dabei weg.
+
+def _read_varint(data, pos: int):
+    result = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not (b & 0x80):
+            return result, pos
+        shift += 7
+
+
+def _fields(data):
+    """Protobuf-Felder iterieren → (feld, wiretyp, wert, roh_start, ende).
+    wert: int (Varint) oder bytes (Length-delimited/Fixed)."""
+    pos = 0
+    n = len(data)
+    while pos < n:
+        start = pos
+        tag, pos = _read_varint(data, pos)
+        fn, wt = tag >> 3, tag & 7
+        if wt == 0:
+            val, pos = _read_varint(data, pos)
+        elif wt == 2:
+            ln, pos = _read_varint(data, pos)
+            val = data[pos:pos + ln]
+            pos += ln
+        elif wt == 1:
+            val = data[pos:pos + 8]
+            pos += 8
+        elif wt == 5:
+            val = data[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f"Unbekannter Wire-Typ {wt}")
+        yield fn, wt, val, start, pos
+
+
+def _unpack_varints(data) -> list:
+    out = []
+    pos = 0
+    while pos < len(data):
+        v, pos = _read_varint(data, pos)
+        out.append(v)
+    return out
+
+
+class _MergedLayer:
+    __slots__ = ("name", "version", "extent", "keys", "key_idx",
+                 "values", "value_idx", "features", "seen")
+
+    def __init__(self, name: bytes, version: int, extent: int):
+        self.name = name
+        self.version = version
+        self.extent = extent
+        self.keys = []
+        self.key_idx = {}
+        self.values = []
+        self.value_idx = {}
+        self.features = []
+        self.seen = set()
+
+    def _key(self, k: bytes) -> int:
+        i = self.key_idx.get(k)
+        if i is None:
+            i = self.key_idx[k] = len(self.keys)
+            self.keys.append(k)
+        return i
+
+    def _value(self, v: bytes) -> int:
+        i = self.value_idx.get(v)
+        if i is None:
+            i = self.value_idx[v] = len(self.values)
+            self.values.append(v)
+        return i
+
+    def add(self, keys: list, values: list, features: list):
+        """Features eines Quell-Layers übernehmen, Tags auf die vereinten
+        keys/values umschreiben, Duplikate verwerfen."""
+        for fb in features:
+            out = bytearray()
+            for fn, wt, val, start, end in _fields(fb):
+                if fn == 2 and wt == 2:
+                    tags = _unpack_varints(val)
+                    remapped = []
+                    for i in range(0, len(tags) - 1, 2):
+                        ki, vi = tags[i], tags[i + 1]
+                        if ki >= len(keys) or vi >= len(values):
+                            continue  # kaputter Tag-Verweis — weglassen
+                        remapped.append(self._key(keys[ki]))
+                        remapped.append(self._value(values[vi]))
+                    if remapped:
+                        out += _len_field(2, b"".join(_varint(t) for t in remapped))
+                else:
+                    out += fb[start:end]
+            feat = bytes(out)
+            if feat in self.seen:
+                continue
+            self.seen.add(feat)
+            self.features.append(feat)
+
+    def encode(self) -> bytes:
+        layer = bytearray()
+        layer += _varint_field(15, self.version)
+        layer += _len_field(1, self.name)
+        for fb in self.features:
+            layer += _len_field(2, fb)
+        for k in self.keys:
+            layer += _len_field(3, k)
+        for v in self.values:
+            layer += _len_field(4, v)
+        layer += _varint_field(5, self.extent)
+        return bytes(layer)
+
+
+def merge_tiles(tiles: list) -> bytes:
+    """
+    Mehrere (unkomprimierte) MVT-Tiles zu einem vereinen — ein Layer pro
+    Name. Layer gleichen Namens mit abweichendem Extent werden nicht
+    vereint, sondern unverändert angehängt (Koordinaten wären sonst falsch
+    skaliert).
+    """
+    merged = {}      # name → _MergedLayer (Einfügereihenfolge = Ausgabereihenfolge)
+    passthrough = []
+    for tile in tiles:
+        for fn, wt, layer_buf, start, end in _fields(tile):
+            if fn != 3 or wt != 2:
+                continue
+            name, version, extent = b"", 1, EXTENT
+            keys, values, features = [], [], []
+            for lfn, lwt, val, _, _ in _fields(layer_buf):
+                if lfn == 1:
+                    name = bytes(val)
+                elif lfn == 2:
+                    features.append(val)
+                elif lfn == 3:
+                    keys.append(bytes(val))
+                elif lfn == 4:
+                    values.append(bytes(val))
+                elif lfn == 5:
+                    extent = val
+                elif lfn == 15:
+                    version = val
+            ml = merged.get(name)
+            if ml is None:
+                ml = merged[name] = _MergedLayer(name, version, extent)
+            elif ml.extent != extent:
+                passthrough.append(tile[start:end])
+                continue
+            ml.add(keys, values, features)
+
+    out = bytearray()
+    for ml in merged.values():
+        out += _len_field(3, ml.encode())
+    for raw in passthrough:
+        out += raw
+    return bytes(out)
@@ -7,9 +7,17 @@ import aiohttp
 import asyncio
 import math
 import heapq
+import json
+import mmap
 import sqlite3
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from functools import partial
+from itertools import count, repeat
 from pathlib import Path
-from collections import defaultdict
 
 class OSRMRouter:
     def __init__(self, osrm_url: str = "http://127.0.0.1:5000"):
@@ -412,13 +420,16 @@ class BrouterRouter:
             return {"error": str(e)}
 
 
-# Sicherheitsgrenze fuer .routing-Graphen: sie werden KOMPLETT in RAM-Dicts
-# geladen (Python braucht ~2-3x der SQLite-Dateigroesse). Ein zu grosser Graph
-# (z. B. Norwegen mit 2,9 GB) sprengt den Pi-RAM → OOM-Killer → Crash-Schleife.
-# Darum vor dem Laden pruefen, ob genug frei ist; sonst ueberspringen. Karten-/
-# Seamark-Tiles sind davon unberuehrt (die werden pro Tile aus SQLite bedient,
-# nie komplett in den RAM geladen) → offline weiter verfuegbar.
-_ROUTING_RAM_OVERHEAD = 2.5                    # Python-Dicts ~2-3x der Datei
+# Sicherheitsgrenze fuer .routing-Graphen, die im RAM GEBAUT werden muessen
+# (SQLite-Dateien und das Zusammenfuehren mehrerer Dateien; Spitze ~1x der
+# Dateigroesse, siehe routing_benchmark.py). Einzelne v2-Dateien und der
+# v2-Cache werden nur gemappt und belegen keinen Heap.
+# Ein zu grosser Graph (z. B. Norwegen mit 2,9 GB) sprengt sonst den Pi-RAM →
+# OOM-Killer → Crash-Schleife. Darum vor dem Bauen pruefen, ob genug frei ist;
+# sonst ueberspringen. Karten-/Seamark-Tiles sind davon unberuehrt (die werden
+# pro Tile aus SQLite bedient, nie komplett in den RAM geladen) → offline
+# weiter verfuegbar.
+_ROUTING_RAM_OVERHEAD = 1.2                    # CSR-Arrays inkl. Lade-Spitze
 _ROUTING_RAM_MARGIN = 600 * 1024 * 1024        # so viel RAM soll frei bleiben
 
 
@@ -434,29 +445,414 @@ def _mem_available_bytes():
     return None
 
 
+# ==================== ROUTING-GRAPH (CSR) ====================
+
+def _cell_key(cx: int, cy: int) -> int:
+    """Gitterzelle (cx, cy) → sortierbarer int (Zellindizes passen in ±2^15)."""
+    return ((cx + 0x8000) << 16) | (cy + 0x8000)
+
+
+def _sqlite_nodes(path: Path):
+    """Knoten einer SQLite-.routing-Datei, nach ID sortiert (id ist INTEGER
+    PRIMARY KEY → ORDER BY id ist ein einfacher Scan)."""
+    ids, lat, lon = array("q"), array("d"), array("d")
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        for nid, la, lo in con.execute("SELECT id, lat, lon FROM nodes ORDER BY id"):
+            ids.append(nid)
+            lat.append(la)
+            lon.append(lo)
+    finally:
+        con.close()
+    return ids, lat, lon
+
+
+def _sqlite_edges(path: Path):
+    """Kanten einer SQLite-.routing-Datei in Tabellen-Reihenfolge."""
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        yield from con.execute("SELECT from_node, to_node, distance_m FROM edges")
+    finally:
+        con.close()
+
+
+# ==================== ROUTING-FORMAT v2 ====================
+# .routing v2 = RoutingGraph 1:1 als Datei, wird per mmap ohne Parsen benutzt
+# (die Seiten liegen im OS-Cache und werden nur bei Bedarf gelesen).
+# Little-endian; Header 64 Byte, danach die Arrays in fester Reihenfolge, jedes
+# auf 8 Byte ausgerichtet, zuletzt die Metadaten als JSON:
+#
+#   Header  magic "BOATRTG2", version u32 (=2), reserviert u32,
+#           n Knoten u64, m Kanten u64, c Gitterzellen u64,
+#           Zellgroesse f64 (Grad), Offset u64 und Laenge u64 der Metadaten
+#   Arrays  ids q[n], lat d[n], lon d[n], off I[n+1], tgt I[m], dist d[m],
+#           cells q[c], cell_off I[c+1], cell_nodes I[n]   (siehe RoutingGraph)
+#
+# Der MBTiles Creator schreibt das Format selbst (creator.py,
+# _write_routing_v2); alte SQLite-Dateien wandelt routing_convert.py um.
+
+ROUTING_V2_MAGIC = b"BOATRTG2"
+_V2_VERSION = 2
+_V2_HEADER = struct.Struct("<8sIIQQQdQQ")
+_V2_SECTIONS = (("ids", "q"), ("lat", "d"), ("lon", "d"), ("off", "I"), ("tgt", "I"),
+                ("dist", "d"), ("cells", "q"), ("cell_off", "I"), ("cell_nodes", "I"))
+
+
+def _v2_layout(n: int, m: int, c: int):
+    """([(name, typecode, anzahl, offset)], Offset der Metadaten)."""
+    counts = {"ids": n, "lat": n, "lon": n, "off": n + 1, "tgt": m, "dist": m,
+              "cells": c, "cell_off": c + 1, "cell_nodes": n}
+    layout, pos = [], _V2_HEADER.size
+    for name, tc in _V2_SECTIONS:
+        layout.append((name, tc, counts[name], pos))
+        pos += counts[name] * array(tc).itemsize
+        pos = (pos + 7) & ~7
+    return layout, pos
+
+
+def _v2_header(raw: bytes, size: int):
+    """Header pruefen → (n, m, c, cell, meta_off, meta_len)."""
+    if len(raw) < _V2_HEADER.size:
+        raise ValueError("Datei zu kurz fuer .routing v2")
+    magic, version, _, n, m, c, cell, meta_off, meta_len = _V2_HEADER.unpack_from(raw)
+    if magic != ROUTING_V2_MAGIC:
+        raise ValueError("keine .routing-v2-Datei")
+    if version != _V2_VERSION:
+        raise ValueError(f".routing v{version} wird nicht unterstuetzt")
+    if _v2_layout(n, m, c)[1] != meta_off or meta_off + meta_len > size:
+        raise ValueError(".routing-v2-Datei unvollstaendig")
+    if not (0 < cell < 360):
+        raise ValueError(f".routing-v2-Datei: ungueltige Zellgroesse {cell}")
+    return n, m, c, cell, meta_off, meta_len
+
+
+def _v2_check(a: Dict, n: int, m: int, c: int):
+    """CSR-Arrays einer gemappten v2-Datei auf Indexgrenzen pruefen — eine
+    beschaedigte Datei soll beim Laden als ungueltig gemeldet werden statt
+    spaeter im A* mit IndexError abzubrechen. max() laeuft in C, O(n + m)."""
+    off, cell_off = a["off"], a["cell_off"]
+    if off[0] != 0 or off[n] != m or max(off) > m:
+        raise ValueError(".routing-v2-Datei beschaedigt: Kanten-Offsets")
+    if m and max(a["tgt"]) >= n:
+        raise ValueError(".routing-v2-Datei beschaedigt: Kantenziel ausserhalb")
+    if cell_off[0] != 0 or cell_off[c] != n or max(cell_off) > n:
+        raise ValueError(".routing-v2-Datei beschaedigt: Zellen-Offsets")
+    if n and max(a["cell_nodes"]) >= n:
+        raise ValueError(".routing-v2-Datei beschaedigt: Zellknoten ausserhalb")
+
+
+def is_routing_v2(path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(ROUTING_V2_MAGIC)) == ROUTING_V2_MAGIC
+    except OSError:
+        return False
+
+
+def read_routing_metadata(path) -> Dict:
+    """Metadaten einer .routing-Datei (v2 oder SQLite), ohne den Graphen zu
+    laden. Wirft bei kaputten oder fremden Dateien."""
+    path = Path(path)
+    if is_routing_v2(path):
+        with open(path, "rb") as f:
+            n, m, _, _, meta_off, meta_len = _v2_header(f.read(_V2_HEADER.size),
+                                                        path.stat().st_size)
+            f.seek(meta_off)
+            meta = json.loads(f.read(meta_len))
+        meta.update(format=_V2_VERSION, node_count=n, edge_count=m)
+        return meta
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        meta = dict(con.execute("SELECT key, value FROM metadata").fetchall())
+        con.execute("SELECT id, lat, lon FROM nodes LIMIT 1").fetchone()
+    finally:
+        con.close()
+    meta["format"] = 1
+    return meta
+
+
+class RoutingGraph:
+    """
+    Wasserstrassen-Graph aller geladenen .routing-Dateien in CSR-Form
+    (compressed sparse row): Knoten dicht durchnummeriert (= Position in der
+    aufsteigend sortierten OSM-ID-Liste), Kanten und Gitterzellen als flache
+    Offset-/Ziel-Arrays statt Dicts aus Listen aus Tupeln.
+
+      ids         int64   × n     OSM-Knoten-ID, aufsteigend
+      lat, lon    float64 × n
+      off         uint32  × n+1   Kanten von Knoten i: off[i] … off[i+1]-1
+      tgt         uint32  × m     Zielknoten (dichter Index)
+      dist        float64 × m     Kantenlaenge (m)
+      cells       int64   × c     belegte Gitterzellen (_cell_key), aufsteigend
+      cell_off    uint32  × c+1   Zelle j: cell_nodes[cell_off[j] … cell_off[j+1]-1]
+      cell_nodes  uint32  × n
+
+    Grenzknoten mehrerer Dateien (gleiche OSM-ID) werden zu EINEM Knoten —
+    darueber laufen Routen ueber Laendergrenzen. Koordinaten: letzte Datei
+    gewinnt; Kanten: alle, je Knoten in Lese-Reihenfolge (wie die Dicts).
+
+    Die Arrays sind entweder array.array (gebaut) oder memoryviews auf eine
+    gemappte .routing-v2-Datei (open_v2) — fuer den Router gleichwertig.
+    """
+
+    def __init__(self, ids, lat, lon, off, tgt, dist, cells, cell_off, cell_nodes,
+                 cell: float, sources=()):
+        self.ids, self.lat, self.lon = ids, lat, lon
+        self.off, self.tgt, self.dist = off, tgt, dist
+        self.cells, self.cell_off, self.cell_nodes = cells, cell_off, cell_nodes
+        self.cell = cell
+        self.sources = list(sources)   # geladene Graphen (Dateiname ohne Endung)
+        self.metadata: Dict = {}
+        self._mmap = None              # haelt das Mapping von open_v2 offen
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.tgt)
+
+    def index(self, nid: int) -> int:
+        """Dichter Index einer OSM-Knoten-ID oder -1."""
+        i = bisect_left(self.ids, nid)
+        return i if i < len(self.ids) and self.ids[i] == nid else -1
+
+    def cell_members(self, cx: int, cy: int):
+        """Knoten (dichte Indizes) der Gitterzelle (cx, cy)."""
+        key = _cell_key(cx, cy)
+        j = bisect_left(self.cells, key)
+        if j == len(self.cells) or self.cells[j] != key:
+            return ()
+        return self.cell_nodes[self.cell_off[j]:self.cell_off[j + 1]]
+
+    def edges(self):
+        """Alle Kanten als (von-ID, nach-ID, Meter), je Knoten in CSR-Reihenfolge."""
+        ids, off, tgt, dist = self.ids, self.off, self.tgt, self.dist
+        for i in range(len(ids)):
+            fn = ids[i]
+            for k in range(off[i], off[i + 1]):
+                yield fn, ids[tgt[k]], dist[k]
+
+    @classmethod
+    def open_v2(cls, path, sources=None) -> "RoutingGraph":
+        """.routing-v2-Datei per mmap oeffnen — kein Parsen, die Arrays sind
+        Sichten auf die Datei (Seiten im OS-Cache, von Prozessen geteilt)."""
+        path = Path(path)
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        n, m, c, cell, meta_off, meta_len = _v2_header(mm[:_V2_HEADER.size], len(mm))
+        buf = memoryview(mm)
+        arrays = {}
+        for name, tc, cnt, off in _v2_layout(n, m, c)[0]:
+            raw = buf[off:off + cnt * array(tc).itemsize]
+            if sys.byteorder == "little":
+                arrays[name] = raw.cast(tc)
+            else:   # Big-Endian-Host: umdrehen, dann eben als Kopie
+                arrays[name] = array(tc)
+                arrays[name].frombytes(raw)
+                arrays[name].byteswap()
+        _v2_check(arrays, n, m, c)
+        meta = json.loads(bytes(buf[meta_off:meta_off + meta_len]))
+        graph = cls(cell=cell, sources=meta.get("sources", [path.stem]) if sources is None else sources,
+                    **arrays)
+        graph.metadata = meta
+        graph._mmap = mm
+        return graph
+
+    def write_v2(self, path, metadata: Optional[Dict] = None):
+        """Graph als .routing v2 schreiben (ueber eine Temp-Datei, atomar)."""
+        path = Path(path)
+        n, m, c = len(self.ids), len(self.tgt), len(self.cells)
+        layout, meta_off = _v2_layout(n, m, c)
+        meta = dict(metadata or {})
+        meta.update(format=_V2_VERSION, node_count=n, edge_count=m, sources=self.sources)
+        meta_raw = json.dumps(meta).encode()
+        tmp = path.with_name(f".{path.name}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(_V2_HEADER.pack(ROUTING_V2_MAGIC, _V2_VERSION, 0, n, m, c,
+                                        self.cell, meta_off, len(meta_raw)))
+                for name, tc, _, off in layout:
+                    f.write(bytes(off - f.tell()))
+                    data = getattr(self, name)
+                    if sys.byteorder != "little":
+                        data = array(tc, data)
+                        data.byteswap()
+                    f.write(data)
+                f.write(bytes(meta_off - f.tell()))
+                f.write(meta_raw)
+            tmp.replace(path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    @classmethod
+    def from_files(cls, paths, cell: float) -> "RoutingGraph":
+        """Graph aus .routing-Dateien (SQLite oder v2) bauen. Nicht lesbare
+        Dateien werden gemeldet und uebersprungen (fehlen dann in .sources)."""
+        # 1. Knoten je Datei, nach ID sortiert
+        parts = []
+        for path in paths:
+            path = Path(path)
+            try:
+                if is_routing_v2(path):
+                    src = cls.open_v2(path)
+                    parts.append((path, src.ids, src.lat, src.lon, src.edges))
+                else:
+                    parts.append((path, *_sqlite_nodes(path), partial(_sqlite_edges, path)))
+            except Exception as e:
+                print(f"⚠️ Failed to load {path.name}: {e}")
+                continue
+
+        if len(parts) == 1:
+            ids, lat, lon = parts[0][1:4]
+        else:
+            # Zusammenfuehren; gleiche ID in mehreren Dateien → ein Knoten
+            ids, lat, lon = array("q"), array("d"), array("d")
+            merged = heapq.merge(*[zip(p[1], repeat(k), count()) for k, p in enumerate(parts)])
+            for nid, k, i in merged:
+                plat, plon = parts[k][2], parts[k][3]
+                if ids and ids[-1] == nid:
+                    lat[-1], lon[-1] = plat[i], plon[i]
+                else:
+                    ids.append(nid)
+                    lat.append(plat[i])
+                    lon.append(plon[i])
+        n = len(ids)
+
+        # 2. Kanten lesen (Datei- und Zeilenreihenfolge), IDs → dichte Indizes.
+        #    Kanten zu Knoten ohne Koordinaten waeren nie routbar → weg.
+        src, tgt, dist = array("I"), array("I"), array("d")
+        # gebundene Methoden: die Schleife laeuft einmal je Kante
+        add_src, add_tgt, add_dist, find = src.append, tgt.append, dist.append, bisect_left
+        sources = []
+        for path, pids, _, _, edges in parts:
+            last_id, last_i = None, -1   # Kanten eines Knotens folgen meist aufeinander
+            try:
+                for fn, tn, d in edges():
+                    if fn != last_id:
+                        last_id = fn
+                        last_i = find(ids, fn)
+                        if last_i == n or ids[last_i] != fn:
+                            last_i = -1
+                    if last_i < 0:
+                        continue
+                    j = find(ids, tn)
+                    if j == n or ids[j] != tn:
+                        continue
+                    add_src(last_i)
+                    add_tgt(j)
+                    add_dist(d)
+            except Exception as e:
+                print(f"⚠️ Failed to load {path.name}: {e}")
+                continue
+            sources.append(path.stem)
+            print(f"✅ Routing graph '{path.stem}': {len(pids)} nodes")
+        del parts
+
+        # 3. Kanten nach Startknoten ordnen (stabiles Counting-Sort → je Knoten
+        #    bleibt die Lese-Reihenfolge der Adjazenzlisten erhalten)
+        off = array("I", bytes(4 * (n + 1)))
+        for s in src:
+            off[s + 1] += 1
+        for i in range(n):
+            off[i + 1] += off[i]
+        pos = off[:-1]
+        m = len(src)
+        c_tgt, c_dist = array("I", bytes(4 * m)), array("d", bytes(8 * m))
+        for k in range(m):
+            s = src[k]
+            p = pos[s]
+            c_tgt[p] = tgt[k]
+            c_dist[p] = dist[k]
+            pos[s] = p + 1
+        del src, tgt, dist, pos
+
+        # 4. Gitterzellen: Knoten je Zelle, ebenfalls per Counting-Sort
+        keys = array("q", (_cell_key(int(lon[i] / cell), int(lat[i] / cell)) for i in range(n)))
+        counts: Dict[int, int] = {}
+        for key in keys:
+            counts[key] = counts.get(key, 0) + 1
+        cells = array("q", sorted(counts))
+        cell_off = array("I", bytes(4 * (len(cells) + 1)))
+        start: Dict[int, int] = {}
+        for j, key in enumerate(cells):
+            start[key] = cell_off[j]
+            cell_off[j + 1] = cell_off[j] + counts[key]
+        cell_nodes = array("I", bytes(4 * n))
+        for i, key in enumerate(keys):
+            p = start[key]
+            cell_nodes[p] = i
+            start[key] = p + 1
+
+        return cls(ids, lat, lon, off, c_tgt, c_dist, cells, cell_off, cell_nodes,
+                   cell, sources)
+
+
 class WaterwayGraphRouter:
-    """A* routing on .routing SQLite graphs built by the MBTiles Creator."""
+    """A* routing on .routing graphs (v2 or SQLite) built by the MBTiles Creator."""
 
     CELL = 0.1  # degrees per spatial grid cell
+    CACHE_NAME = ".graph-cache.bin"   # zusammengefuehrter Graph als .routing v2
 
     def __init__(self, routing_dir: Path):
         self.routing_dir = Path(routing_dir)
-        self._adj: Dict[int, List[Tuple[int, float]]] = {}
-        self._coords: Dict[int, Tuple[float, float]] = {}
-        self._spatial: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self._graph: Optional[RoutingGraph] = None
         self._loaded: List[str] = []
         self._skipped: List[Dict] = []   # zu grosse Graphen (RAM-Schutz)
+        self._failed: Dict[str, str] = {}   # nicht ladbare Graphen → Fehler
+        self._load_lock = threading.Lock()
 
     def load_all(self):
-        self._adj.clear()
-        self._coords.clear()
-        self._spatial.clear()
-        self._loaded.clear()
-        self._skipped.clear()
-        if not self.routing_dir.exists():
-            return
+        """Alle .routing-Dateien (neu) laden. Eine einzelne v2-Datei wird
+        direkt gemappt; sonst wird der Graph einmal gebaut und als v2-Cache
+        abgelegt, danach mappt jeder Start nur noch den Cache. Laufende
+        Routen rechnen bis zum Tausch auf dem alten Graphen weiter.
+        BLOCKING (Bau: Sekunden) — aus async-Code per asyncio.to_thread;
+        parallele Aufrufe laufen nacheinander (gemeinsame Cache-Datei)."""
+        with self._load_lock:
+            self._load_all()
+
+    def _load_all(self):
+        files = sorted(self.routing_dir.glob("*.routing")) if self.routing_dir.exists() else []
+        direct = len(files) == 1 and is_routing_v2(files[0])
+        skipped: List[Dict] = []
+        failed: Dict[str, str] = {}
+        graph = None
+        if direct:
+            try:
+                graph = RoutingGraph.open_v2(files[0], sources=[files[0].stem])
+                print(f"✅ Routing graph '{files[0].stem}': {len(graph)} nodes (mmap)")
+            except Exception as e:
+                print(f"⚠️ Failed to load {files[0].name}: {e}")
+                failed[files[0].stem] = str(e)
+        elif files:
+            graph = self._open_cache(files)
+            if graph is None:
+                paths, skipped = self._fit_ram(files)
+                if paths:
+                    graph = (self._open_cache(paths) if skipped else None) or self._build(paths)
+                    loaded = set(graph.sources) if graph is not None else set()
+                    failed = {p.stem: "nicht lesbar oder beschaedigt"
+                              for p in paths if p.stem not in loaded}
+        if direct or not files:
+            try:   # Cache wird nicht (mehr) gebraucht
+                (self.routing_dir / self.CACHE_NAME).unlink(missing_ok=True)
+            except OSError:
+                pass
+        if graph is not None and not graph.sources:
+            graph = None
+        self._graph = graph
+        self._loaded = list(graph.sources) if graph is not None else []
+        self._skipped = skipped
+        self._failed = failed
+
+    def _fit_ram(self, files: List[Path]) -> Tuple[List[Path], List[Dict]]:
+        """Dateien, deren Bau in den freien RAM passt, und die uebersprungenen."""
+        paths: List[Path] = []
+        skipped: List[Dict] = []
         avail = _mem_available_bytes()
-        for rf in sorted(self.routing_dir.glob("*.routing")):
+        for rf in files:
             try:
                 size = rf.stat().st_size
             except OSError:
@@ -466,7 +862,7 @@ class WaterwayGraphRouter:
             # Pi per OOM zu killen. Ohne /proc/meminfo (avail=None) wird geladen.
             need = int(size * _ROUTING_RAM_OVERHEAD)
             if avail is not None and need > max(0, avail - _ROUTING_RAM_MARGIN):
-                self._skipped.append({
+                skipped.append({
                     "name": rf.stem,
                     "size_mb": round(size / 1048576),
                     "need_mb": round(need / 1048576),
@@ -476,27 +872,59 @@ class WaterwayGraphRouter:
                       f"~{need/1048576:.0f} MB RAM noetig, nur {avail/1048576:.0f} MB frei — "
                       f"wuerde den Pi sprengen (OOM). Fuer dieses Revier OSRM nutzen.")
                 continue
-            self._load_file(rf)
+            paths.append(rf)
+            if avail is not None:
+                avail -= need   # alle Graphen liegen beim Bauen gemeinsam im RAM
+        return paths, skipped
+
+    @staticmethod
+    def _inputs(paths: List[Path]) -> List[List]:
+        """Kennung der Eingabedateien fuer den Cache: Name, Groesse, mtime."""
+        out = []
+        for p in paths:
+            st = p.stat()
+            out.append([p.name, st.st_size, st.st_mtime_ns])
+        return out
+
+    def _open_cache(self, paths: List[Path]) -> Optional[RoutingGraph]:
+        """Gemappter Cache, falls er genau aus diesen Dateien gebaut wurde."""
+        cache = self.routing_dir / self.CACHE_NAME
+        if not is_routing_v2(cache):
+            return None
+        try:
+            graph = RoutingGraph.open_v2(cache)
+            inputs = self._inputs(paths)
+        except Exception as e:
+            print(f"⚠️ Routing-Cache unbrauchbar: {e}")
+            return None
+        if graph.metadata.get("inputs") != inputs or graph.cell != self.CELL:
+            return None
+        print(f"✅ Routing graph {graph.sources}: {len(graph)} nodes (Cache, mmap)")
+        return graph
+
+    def _build(self, paths: List[Path]) -> Optional[RoutingGraph]:
+        """Graph im RAM bauen, als v2-Cache schreiben und den Cache mappen —
+        die gebauten Arrays sind danach wieder frei."""
+        graph = RoutingGraph.from_files(paths, self.CELL)
+        if not graph.sources:
+            return None
+        cache = self.routing_dir / self.CACHE_NAME
+        try:
+            graph.write_v2(cache, {"inputs": self._inputs(paths)})
+            return RoutingGraph.open_v2(cache)
+        except Exception as e:
+            print(f"⚠️ Routing-Cache nicht geschrieben ({e}) — Graph bleibt im RAM")
+            return graph
 
     @property
     def skipped(self) -> List[Dict]:
         """Wegen RAM-Grenze uebersprungene Graphen (fuer die UI)."""
         return list(self._skipped)
 
-    def _load_file(self, path: Path):
-        try:
-            con = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
-            for nid, lat, lon in con.execute("SELECT id, lat, lon FROM nodes"):
-                self._coords[nid] = (lat, lon)
-                cx, cy = int(lon / self.CELL), int(lat / self.CELL)
-                self._spatial[(cx, cy)].append(nid)
-            for fn, tn, dist in con.execute("SELECT from_node, to_node, distance_m FROM edges"):
-                self._adj.setdefault(fn, []).append((tn, float(dist)))
-            con.close()
-            self._loaded.append(path.stem)
-            print(f"✅ Routing graph '{path.stem}': {len(self._coords)} nodes")
-        except Exception as e:
-            print(f"⚠️ Failed to load {path.name}: {e}")
+    @property
+    def failed(self) -> Dict[str, str]:
+        """Beim letzten load_all() nicht ladbare Graphen (Name → Fehler)."""
+        return dict(self._failed)
 
     @property
     def enabled(self) -> bool:
@@ -509,25 +937,31 @@ class WaterwayGraphRouter:
         a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
         return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
-    def _snap(self, lat: float, lon: float, max_m: float = 15000) -> Optional[int]:
-        cx, cy = int(lon / self.CELL), int(lat / self.CELL)
+    def _snap(self, graph: RoutingGraph, lat: float, lon: float,
+              max_m: float = 15000) -> Optional[int]:
+        """Naechster Knoten (dichter Index) im Umkreis max_m oder None.
+        Gitter des Graphen (graph.cell) — eine direkt gemappte v2-Datei kann
+        mit anderer Zellgroesse gebaut sein als CELL; der Suchradius in
+        Zellen waechst dann mit, damit max_m abgedeckt bleibt."""
+        glat, glon = graph.lat, graph.lon
+        cx, cy = int(lon / graph.cell), int(lat / graph.cell)
+        r = max(3, math.ceil(max_m / 111000 / graph.cell))
         best_id, best_d = None, max_m
-        for dx in range(-3, 4):
-            for dy in range(-3, 4):
-                for nid in self._spatial.get((cx + dx, cy + dy), []):
-                    nlat, nlon = self._coords[nid]
-                    d = self._hav(lat, lon, nlat, nlon)
+        for dx in range(-r, r + 1):
+            for dy in range(-r, r + 1):
+                for i in graph.cell_members(cx + dx, cy + dy):
+                    d = self._hav(lat, lon, glat[i], glon[i])
                     if d < best_d:
                         best_d = d
-                        best_id = nid
+                        best_id = i
         return best_id
 
-    def _astar(self, start: int, goal: int) -> Tuple[Optional[List[int]], float]:
+    def _astar(self, graph: RoutingGraph, start: int, goal: int) -> Tuple[Optional[List[int]], float]:
         if start == goal:
             return [start], 0.0
-        if start not in self._coords or goal not in self._coords:
-            return None, 0.0
-        glat, glon = self._coords[goal]
+        lat, lon = graph.lat, graph.lon
+        off, tgt, dist = graph.off, graph.tgt, graph.dist
+        glat, glon = lat[goal], lon[goal]
         open_set: List[Tuple[float, int]] = [(0.0, start)]
         came_from: Dict[int, int] = {}
         g: Dict[int, float] = {start: 0.0}
@@ -545,31 +979,33 @@ class WaterwayGraphRouter:
                 path.append(start)
                 path.reverse()
                 return path, g[goal]
-            for nb, dist in self._adj.get(cur, []):
-                ng = g.get(cur, math.inf) + dist
+            g_cur = g.get(cur, math.inf)
+            for k in range(off[cur], off[cur + 1]):
+                nb = tgt[k]
+                ng = g_cur + dist[k]
                 if ng < g.get(nb, math.inf):
                     came_from[nb] = cur
                     g[nb] = ng
-                    nlat, nlon = self._coords.get(nb, (glat, glon))
-                    heapq.heappush(open_set, (ng + self._hav(nlat, nlon, glat, glon), nb))
+                    heapq.heappush(open_set, (ng + self._hav(lat[nb], lon[nb], glat, glon), nb))
         return None, 0.0
 
     async def route(self, waypoints: List[Tuple[float, float]]) -> dict:
-        if not self.enabled:
+        graph = self._graph   # fester Stand, auch wenn load_all() parallel tauscht
+        if graph is None:
             return {"error": "no_routing_graphs"}
         snapped = []
         for lon, lat in waypoints:
-            nid = self._snap(lat, lon)
+            nid = self._snap(graph, lat, lon)
             if nid is None:
                 return {"error": f"no_coverage:{lat:.4f},{lon:.4f}"}
             snapped.append(nid)
         coords: List[List[float]] = []
         total_m = 0.0
         for i in range(len(snapped) - 1):
-            path, dist = self._astar(snapped[i], snapped[i + 1])
+            path, dist = self._astar(graph, snapped[i], snapped[i + 1])
             if path is None:
                 return {"error": f"no_path_segment_{i}"}
-            seg = [[self._coords[n][1], self._coords[n][0]] for n in path]
+            seg = [[graph.lon[n], graph.lat[n]] for n in path]
             if coords:
                 seg = seg[1:]
             coords.extend(seg)
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+Minimaler, dependency-freier PMTiles-v3-Reader/-Writer.
+
+PMTiles ist ein Single-File-Tile-Archiv, das per Byte-Offset adressiert wird
+(Header → Directory → Tile-Daten). Ein Tile-Lookup ist damit eine binäre
+Suche im (gecachten) Directory plus ein Slice aus der gemappten Datei —
+kein SQL-Parsing, keine Python-Objekte pro Zeile, und nginx kann dieselbe
+Datei direkt per Range-Request ausliefern.
+
+Umfang wie mvt.py: genau das, was BoatOS braucht — Vektor-Tiles mit gzip-
+oder ohne Tile-Kompression, Directories gzip-komprimiert. Spezifikation:
+https://github.com/protomaps/PMTiles/blob/main/spec/v3/spec.md
+
+Koordinaten: XYZ (Zeile von oben) — anders als MBTiles (TMS) gibt es hier
+nichts zu spiegeln.
+"""
+
+import bisect
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sqlite3
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+MAGIC = b"PMTiles"
+HEADER_SIZE = 127
+# Header + Root-Directory müssen in die ersten 16 KB passen (ein Range-Request)
+ROOT_MAX = 16384 - HEADER_SIZE
+
+# Kompression (Header-Felder internal_compression / tile_compression)
+COMPRESSION_UNKNOWN = 0
+COMPRESSION_NONE = 1
+COMPRESSION_GZIP = 2
+
+# Tile-Typ
+TILETYPE_MVT = 1
+
+_HEADER_FMT = "<7sB11Q6B4iB2i"
+
+# Leaf-Directories, die ein Reader im Speicher hält
+_LEAF_CACHE = 64
+
+
+# ==================== TILE-ID (HILBERT) ====================
+
+def _rotate(n, x, y, rx, ry):
+    if ry == 0:
+        if rx != 0:
+            x = n - 1 - x
+            y = n - 1 - y
+        x, y = y, x
+    return x, y
+
+
+def zxy_to_tileid(z: int, x: int, y: int) -> int:
+    """(z, x, y) → PMTiles-Tile-ID (Hilbert-Kurve je Zoomstufe)."""
+    acc = ((1 << (z * 2)) - 1) // 3
+    a = z - 1
+    while a >= 0:
+        s = 1 << a
+        rx = s & x
+        ry = s & y
+        acc += ((3 * rx) ^ ry) << a
+        x, y = _rotate(s, x, y, rx, ry)
+        a -= 1
+    return acc
+
+
+# ==================== DIRECTORY-CODEC ====================
+
+def _varint(v: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = v & 0x7F
+        v >>= 7
+        if v:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _read_varint(data, pos: int):
+    result = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not (b & 0x80):
+            return result, pos
+        shift += 7
+
+
+def _serialize_directory(entries) -> bytes:
+    """entries: [(tile_id, offset, length, run_length), ...] sortiert → gzip."""
+    out = bytearray(_varint(len(entries)))
+    last = 0
+    for tid, _, _, _ in entries:
+        out += _varint(tid - last)
+        last = tid
+    for _, _, _, run in entries:
+        out += _varint(run)
+    for _, _, length, _ in entries:
+        out += _varint(length)
+    prev_end = None
+    for tid, offset, length, _ in entries:
+        # 0 = direkt hinter dem vorherigen Eintrag (geclusterte Archive)
+        out += _varint(0 if offset == prev_end else offset + 1)
+        prev_end = offset + length
+    return gzip.compress(bytes(out), compresslevel=9, mtime=0)
+
+
+def _deserialize_directory(buf: bytes):
+    """gzip-Directory → (tile_ids, offsets, lengths, run_lengths) als Listen."""
+    data = gzip.decompress(buf)
+    n, pos = _read_varint(data, 0)
+    ids, runs, lengths, offsets = [0] * n, [0] * n, [0] * n, [0] * n
+    last = 0
+    for i in range(n):
+        d, pos = _read_varint(data, pos)
+        last += d
+        ids[i] = last
+    for i in range(n):
+        runs[i], pos = _read_varint(data, pos)
+    for i in range(n):
+        lengths[i], pos = _read_varint(data, pos)
+    for i in range(n):
+        v, pos = _read_varint(data, pos)
+        offsets[i] = offsets[i - 1] + lengths[i - 1] if (v == 0 and i > 0) else v - 1
+    return ids, offsets, lengths, runs
+
+
+# ==================== READER ====================
+
+class PMTilesReader:
+    """
+    mmap-basierter Reader. Header und Root-Directory werden beim Öffnen
+    einmal dekodiert, Leaf-Directories bei Bedarf (LRU). Tile-Bytes sind
+    ein Slice der gemappten Datei — die Seiten teilt sich der Prozess mit
+    dem OS-Page-Cache.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._f = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._f.close()
+            raise
+        h = struct.unpack(_HEADER_FMT, self._mm[:HEADER_SIZE])
+        if h[0] != MAGIC or h[1] != 3:
+            self.close()
+            raise ValueError(f"{self.path.name}: kein PMTiles-v3-Archiv")
+        (self.root_offset, self.root_length, self.metadata_offset, self.metadata_length,
+         self.leaf_offset, self.leaf_length, self.data_offset, self.data_length,
+         self.addressed_tiles, self.tile_entries, self.tile_contents) = h[2:13]
+        (self.clustered, self.internal_compression, self.tile_compression,
+         self.tile_type, self.min_zoom, self.max_zoom) = h[13:19]
+        self.bounds = [h[19] / 1e7, h[20] / 1e7, h[21] / 1e7, h[22] / 1e7]
+        if self.internal_compression != COMPRESSION_GZIP:
+            self.close()
+            raise ValueError(f"{self.path.name}: Directory-Kompression "
+                             f"{self.internal_compression} nicht unterstützt (nur gzip)")
+        if self.tile_compression not in (COMPRESSION_UNKNOWN, COMPRESSION_NONE, COMPRESSION_GZIP):
+            self.close()
+            raise ValueError(f"{self.path.name}: Tile-Kompression "
+                             f"{self.tile_compression} nicht unterstützt")
+        self._root = _deserialize_directory(
+            self._mm[self.root_offset:self.root_offset + self.root_length])
+        self._leaves = OrderedDict()
+        self._lock = threading.Lock()
+
+    def close(self):
+        try:
+            self._mm.close()
+        except Exception:
+            pass
+        self._f.close()
+
+    def metadata(self) -> dict:
+        raw = self._mm[self.metadata_offset:self.metadata_offset + self.metadata_length]
+        if not raw:
+            return {}
+        try:
+            return json.loads(gzip.decompress(raw))
+        except Exception:
+            return {}
+
+    def _leaf(self, offset: int, length: int):
+        with self._lock:
+            d = self._leaves.get(offset)
+            if d is not None:
+                self._leaves.move_to_end(offset)
+                return d
+        start = self.leaf_offset + offset
+        d = _deserialize_directory(self._mm[start:start + length])
+        with self._lock:
+            self._leaves[offset] = d
+            while len(self._leaves) > _LEAF_CACHE:
+                self._leaves.popitem(last=False)
+        return d
+
+    def get_tile(self, z: int, x: int, y: int):
+        """Tile-Bytes (wie gespeichert, ggf. gzip) oder None."""
+        if z < self.min_zoom or z > self.max_zoom:
+            return None
+        tid = zxy_to_tileid(z, x, y)
+        ids, offsets, lengths, runs = self._root
+        for _ in range(4):  # Spec: max. Tiefe Root + 3 Leaf-Ebenen
+            i = bisect.bisect_right(ids, tid) - 1
+            if i < 0:
+                return None
+            if runs[i] == 0:
+                ids, offsets, lengths, runs = self._leaf(offsets[i], lengths[i])
+                continue
+            if tid >= ids[i] + runs[i]:
+                return None
+            start = self.data_offset + offsets[i]
+            return self._mm[start:start + lengths[i]]
+        return None
+
+
+def is_pmtiles(first_bytes: bytes) -> bool:
+    return first_bytes[:7] == MAGIC
+
+
+# ==================== WRITER ====================
+
+def _build_directories(entries):
+    """Root (+ Leafs), sodass Header + Root in ROOT_MAX passen."""
+    root = _serialize_directory(entries)
+    if len(root) <= ROOT_MAX:
+        return root, b""
+    leaf_size = 4096
+    while True:
+        root_entries, leaves = [], bytearray()
+        for i in range(0, len(entries), leaf_size):
+            chunk = entries[i:i + leaf_size]
+            ser = _serialize_directory(chunk)
+            root_entries.append((chunk[0][0], len(leaves), len(ser), 0))
+            leaves += ser
+        root = _serialize_directory(root_entries)
+        if len(root) <= ROOT_MAX:
+            return root, bytes(leaves)
+        leaf_size *= 2
+
+
+def write_pmtiles(tiles, out_path, metadata: dict, tile_compression: int = COMPRESSION_GZIP,
+                  tile_type: int = TILETYPE_MVT, min_zoom: int = 0, max_zoom: int = 14,
+                  bounds=(-180.0, -85.0, 180.0, 85.0)) -> dict:
+    """
+    PMTiles-Archiv schreiben. BLOCKING.
+
+    tiles: Iterable (tile_id, blob) in AUFSTEIGENDER tile_id-Reihenfolge.
+    Identische Blobs werden nur einmal gespeichert, direkt aufeinander-
+    folgende identische Tiles (Wasserflächen!) als ein Run-Length-Eintrag.
+    Tile-Daten gehen erst in eine Temp-Datei (Directories sind erst am Ende
+    bekannt, stehen aber vorne) und werden dann angehängt; geschrieben wird
+    nach out_path.building, am Ende atomar ersetzt.
+    """
+    out_path = Path(out_path)
+    entries = []        # [tile_id, offset, length, run_length]
+    by_hash = {}        # inhalt → (offset, length)
+    addressed = 0
+    data_len = 0
+    with tempfile.TemporaryFile(dir=str(out_path.parent)) as data_f:
+        for tid, blob in tiles:
+            addressed += 1
+            h = hashlib.blake2b(blob, digest_size=16).digest()
+            hit = by_hash.get(h)
+            if hit is None:
+                hit = (data_len, len(blob))
+                by_hash[h] = hit
+                data_f.write(blob)
+                data_len += len(blob)
+            last = entries[-1] if entries else None
+            if (last is not None and last[0] + last[3] == tid
+                    and last[1] == hit[0] and last[2] == hit[1]):
+                last[3] += 1
+                continue
+            entries.append([tid, hit[0], hit[1], 1])
+
+        root, leaves = _build_directories([tuple(e) for e in entries])
+        meta = gzip.compress(json.dumps(metadata, ensure_ascii=False).encode("utf-8"),
+                             mtime=0)
+
+        root_off = HEADER_SIZE
+        meta_off = root_off + len(root)
+        leaf_off = meta_off + len(meta)
+        data_off = leaf_off + len(leaves)
+        header = struct.pack(
+            _HEADER_FMT, MAGIC, 3,
+            root_off, len(root), meta_off, len(meta), leaf_off, len(leaves),
+            data_off, data_len, addressed, len(entries), len(by_hash),
+            1, COMPRESSION_GZIP, tile_compression, tile_type, min_zoom, max_zoom,
+            int(bounds[0] * 1e7), int(bounds[1] * 1e7),
+            int(bounds[2] * 1e7), int(bounds[3] * 1e7),
+            min_zoom, int((bounds[0] + bounds[2]) / 2 * 1e7),
+            int((bounds[1] + bounds[3]) / 2 * 1e7))
+
+        tmp = out_path.with_suffix(".building")
+        with open(tmp, "wb") as f:
+            f.write(header)
+            f.write(root)
+            f.write(meta)
+            f.write(leaves)
+            data_f.seek(0)
+            shutil.copyfileobj(data_f, f, 1 << 20)
+    os.replace(tmp, out_path)
+    return {"tiles": addressed, "entries": len(entries), "contents": len(by_hash)}
+
+
+def convert_mbtiles(mbtiles_path, out_path) -> dict:
+    """
+    Bestehende MBTiles (z.B. ienc.mbtiles oder eine Region) nach PMTiles
+    konvertieren. BLOCKING. Speicher: eine (tile_id, z, x, tms_y)-Zeile
+    pro Tile für die Sortierung, die Blobs werden einzeln nachgeladen.
+    """
+    conn = sqlite3.connect(f"file:{mbtiles_path}?mode=ro", uri=True)
+    try:
+        meta = dict(conn.execute("SELECT name, value FROM metadata").fetchall())
+        keys = []
+        for z, x, tms_y in conn.execute("SELECT zoom_level, tile_column, tile_row FROM tiles"):
+            keys.append((zxy_to_tileid(z, x, (1 << z) - 1 - tms_y), z, x, tms_y))
+        keys.sort()
+        if not keys:
+            raise ValueError(f"{Path(mbtiles_path).name} enthält keine Tiles")
+
+        first = conn.execute("SELECT tile_data FROM tiles LIMIT 1").fetchone()[0]
+        compression = COMPRESSION_GZIP if bytes(first[:2]) == b"\x1f\x8b" else COMPRESSION_NONE
+
+        def _tiles():
+            for tid, z, x, tms_y in keys:
+                row = conn.execute(
+                    "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? "
+                    "AND tile_row=?", (z, x, tms_y)).fetchone()
+                if row:
+                    yield tid, bytes(row[0])
+
+        try:
+            bounds = [float(v) for v in meta.get("bounds", "").split(",")]
+            if len(bounds) != 4:
+                raise ValueError
+        except ValueError:
+            bounds = (-180.0, -85.0, 180.0, 85.0)
+        # MBTiles-"json" (vector_layers) wird in PMTiles Teil der Metadaten
+        pm_meta = {k: v for k, v in meta.items() if k != "json"}
+        try:
+            pm_meta.update(json.loads(meta.get("json", "{}")))
+        except ValueError:
+            pass
+        stats = write_pmtiles(
+            _tiles(), out_path, pm_meta, tile_compression=compression,
+            min_zoom=min(k[1] for k in keys), max_zoom=max(k[1] for k in keys),
+            bounds=bounds)
+    finally:
+        conn.close()
+    stats["size_mb"] = round(Path(out_path).stat().st_size / 1048576, 2)
+    return stats
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Gepackter, statischer R-Baum (Sort-Tile-Recursive) über Bounding-Boxen.
+
+Für Punkt-/Bbox-Abfragen gegen viele tausend Flächen (DEPARE/DRGARE der
+großen Ströme): statt jede Bbox linear zu testen, steigt die Suche nur in
+die Knoten ab, deren Hülle die Abfrage schneidet — eine Punktabfrage sieht
+so nur eine Handvoll Kandidaten.
+
+Aufbau wie flatbush: Blätter = Einträge in STR-Reihenfolge, darüber Ebene
+für Ebene je NODE_SIZE Kinder zu einem Knoten zusammengefasst. Alles liegt
+in zwei flachen Arrays (boxes, indices), deshalb lässt sich der Baum 1:1 in
+eine Datei schreiben und per mmap ohne Deserialisieren wieder benutzen:
+
+  Header    magic, node_size, n, Ebenen, tag (uint64, frei für Aufrufer)
+  levels    uint32 × Ebenen   Knotenanzahl kumuliert bis Ende jeder Ebene
+  boxes     float64 × 4·N     (minx, miny, maxx, maxy) aller Knoten
+  indices   uint32 × N        Blatt: Eintrags-Nr., sonst erster Kindknoten
+
+Reines Python, keine Abhängigkeiten — wie mvt.py / pmtiles.py.
+"""
+
+import math
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+
+MAGIC = b"BOATRT1\x00"
+NODE_SIZE = 16
+
+_HEADER = struct.Struct("<8sIIIQ4x")   # magic, node_size, n, levels, tag
+
+
+class PackedRTree:
+    """Statischer R-Baum; build() erzeugt ihn, load() öffnet eine Datei."""
+
+    def __init__(self, boxes, indices, levels, num_items, node_size=NODE_SIZE, tag=0):
+        self._boxes = boxes
+        self._indices = indices
+        self._levels = list(levels)
+        self.num_items = num_items
+        self.node_size = node_size
+        self.tag = tag
+
+    def __len__(self):
+        return self.num_items
+
+    @property
+    def bounds(self):
+        """Gesamt-Bbox (Wurzel) oder None bei leerem Baum."""
+        if not self.num_items:
+            return None
+        b, r = self._boxes, 4 * (len(self._indices) - 1)
+        return (b[r], b[r + 1], b[r + 2], b[r + 3])
+
+    def search(self, minx, miny, maxx, maxy) -> list:
+        """Nummern aller Einträge, deren Bbox das Rechteck schneidet
+        (Reihenfolge unbestimmt)."""
+        if not self.num_items:
+            return []
+        b, idx, n, ns = self._boxes, self._indices, self.num_items, self.node_size
+        levels = self._levels
+        out = []
+        stack = [len(idx) - 1]
+        while stack:
+            node = stack.pop()
+            # Ende des Knotens: max. node_size Kinder, nie über die Ebene hinaus
+            end = node + ns
+            for lb in levels:
+                if node < lb:
+                    end = min(end, lb)
+                    break
+            for pos in range(node, end):
+                k = 4 * pos
+                if maxx < b[k] or maxy < b[k + 1] or minx > b[k + 2] or miny > b[k + 3]:
+                    continue
+                if pos < n:
+                    out.append(idx[pos])
+                else:
+                    stack.append(idx[pos])
+        return out
+
+    def search_point(self, x, y) -> list:
+        return self.search(x, y, x, y)
+
+    def save(self, path):
+        """In eine Datei schreiben (atomar über .building)."""
+        path = Path(path)
+        tmp = path.with_suffix(".building")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, self.node_size, self.num_items,
+                                 len(self._levels), self.tag))
+            lv = array("I", self._levels)
+            if len(lv) % 2:
+                lv.append(0)   # 8-Byte-Ausrichtung für die boxes
+            f.write(lv.tobytes())
+            f.write(array("d", self._boxes).tobytes())
+            f.write(array("I", self._indices).tobytes())
+        os.replace(tmp, path)
+
+
+def build(boxes, node_size=NODE_SIZE, tag=0) -> PackedRTree:
+    """Baum aus einer Sequenz (minx, miny, maxx, maxy) bauen — die Position
+    in der Sequenz ist die Eintrags-Nr., die search() liefert."""
+    n = len(boxes)
+    if not n:
+        return PackedRTree(array("d"), array("I"), [], 0, node_size, tag)
+    levels = [n]
+    m = total = n
+    while m > 1:
+        m = math.ceil(m / node_size)
+        total += m
+        levels.append(total)
+
+    # STR: nach x-Mitte in senkrechte Streifen, je Streifen nach y-Mitte
+    order = sorted(range(n), key=lambda i: boxes[i][0] + boxes[i][2])
+    leaves = math.ceil(n / node_size)
+    slices = max(1, math.ceil(math.sqrt(leaves)))
+    per_slice = node_size * math.ceil(leaves / slices)
+    for s in range(0, n, per_slice):
+        order[s:s + per_slice] = sorted(order[s:s + per_slice],
+                                        key=lambda i: boxes[i][1] + boxes[i][3])
+
+    bx = array("d")
+    indices = array("I")
+    for i in order:
+        bx.extend(boxes[i])
+        indices.append(i)
+
+    pos = 0
+    for end in levels[:-1]:
+        while pos < end:
+            first = pos
+            stop = min(pos + node_size, end)
+            minx = miny = math.inf
+            maxx = maxy = -math.inf
+            while pos < stop:
+                k = 4 * pos
+                minx = min(minx, bx[k])
+                miny = min(miny, bx[k + 1])
+                maxx = max(maxx, bx[k + 2])
+                maxy = max(maxy, bx[k + 3])
+                pos += 1
+            bx.extend((minx, miny, maxx, maxy))
+            indices.append(first)
+    return PackedRTree(bx, indices, levels, n, node_size, tag)
+
+
+def load(path) -> PackedRTree:
+    """Gespeicherten Baum per mmap öffnen (keine Kopie der Arrays)."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # Erst alle Größen gegen die Datei prüfen, dann die Sichten anlegen: ein
+    # mmap mit lebenden memoryviews lässt sich nicht schließen (BufferError)
+    try:
+        if len(mm) < _HEADER.size:
+            raise ValueError(f"{path}: kein R-Baum")
+        magic, node_size, n, nlev, tag = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: kein R-Baum")
+        off = _HEADER.size
+        if len(mm) < off + 4 * nlev:
+            raise ValueError(f"{path}: R-Baum unvollständig")
+        levels = list(struct.unpack_from(f"<{nlev}I", mm, off))
+        off += 4 * (nlev + nlev % 2)
+        total = levels[-1] if levels else 0
+        if len(mm) < off + 36 * total:
+            raise ValueError(f"{path}: R-Baum unvollständig")
+    except Exception:
+        mm.close()
+        raise
+    boxes = memoryview(mm)[off:off + 32 * total].cast("d")
+    indices = memoryview(mm)[off + 32 * total:off + 36 * total].cast("I")
+    # Die memoryviews halten das mmap offen, solange der Baum lebt
+    return PackedRTree(boxes, indices, levels, n, node_size, tag)
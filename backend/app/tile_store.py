@@ -0,0 +1,842 @@
+# -*- coding: utf-8 -*-
+"""
+Tile-Proxy-Infrastruktur für die MBTiles-Endpunkte in main.py
+(/api/map/tiles, /api/map/seamarks, /api/enc/tiles).
+
+Ein Karten-Pan auf z14 löst 30–60 Tile-Requests aus, jeder gegen jede aktive
+Region. Ein frisches sqlite3.connect() pro Tile kostet auf dem Pi mehr als
+der eigentliche Index-Lookup (Datei öffnen, Header + Schema parsen). Deshalb
+hält MBTilesPool pro Datei einen kleinen Vorrat offener, read-only
+Verbindungen, die über die gesamte Prozesslaufzeit wiederverwendet werden.
+
+Darüber liegt TileCache: ein LRU-Cache der fertig gemergten Tile-Bytes mit
+Speicher-Budget, damit die immer gleichen Tiles rund ums Boot gar nicht erst
+wieder gelesen und gemergt werden. build_composite() schreibt die aktive
+Region-Auswahl vorab in eine einzige MBTiles-Datei. Regionen als .pmtiles
+(pmtiles.py) laufen über PMTilesRegistry statt über den SQLite-Pool.
+
+Die Pool-Funktionen sind BLOCKING (SQLite) und laufen aus der Event-Loop
+heraus im Default-Executor (run_in_executor / asyncio.to_thread).
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pmtiles
+
+# Pro Verbindung gemappte Bytes — die Seiten teilt sich SQLite mit dem
+# OS-Page-Cache, ein Tile-Lookup kopiert dann nichts mehr in den
+# SQLite-eigenen Cache. 64-bit-Pi-OS vorausgesetzt (Adressraum).
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Offene Verbindungen, die pro Datei im Pool liegen bleiben dürfen. Mehr
+# braucht es nicht: der Default-Executor hat ohnehin nur wenige Threads.
+MAX_IDLE_PER_FILE = 4
+
+
+# ==================== VERBINDUNGS-POOL ====================
+
+def _file_signature(path: Path):
+    """(inode, größe, mtime) — ändert sich, sobald die Datei ersetzt oder
+    überschrieben wurde. None, wenn die Datei fehlt."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class MBTilesPool:
+    """
+    Prozessweiter Pool read-only SQLite-Verbindungen, je MBTiles-Datei.
+
+    Verbindungen werden mit mode=ro (+ immutable=1, wo die Datei nur atomar
+    ersetzt wird) und gesetzter mmap_size geöffnet. Jede Verbindung ist zu
+    einem Zeitpunkt genau einem Executor-Thread ausgeliehen
+    (check_same_thread=False, Ausleihe unter Lock).
+
+    Invalidierung: explizit über invalidate() (Region hochgeladen, gelöscht,
+    aktiviert, IENC neu gebaut) und zusätzlich über die Datei-Signatur — ein
+    an der API vorbei ersetztes File wird so trotzdem nicht mit veralteten
+    (immutable!) Verbindungen gelesen.
+    """
+
+    def __init__(self, mmap_size: int = MMAP_SIZE, max_idle: int = MAX_IDLE_PER_FILE):
+        self.mmap_size = mmap_size
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle = {}      # pfad → (signatur, [conn, ...])
+        self.hits = 0        # Ausleihe aus dem Pool
+        self.misses = 0      # neue Verbindung nötig
+        self.invalidations = 0
+
+    def _open(self, path: Path, immutable: bool):
+        uri = f"file:{path}?mode=ro" + ("&immutable=1" if immutable else "")
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        return conn
+
+    def _acquire(self, path: Path, immutable: bool):
+        key = str(path)
+        sig = _file_signature(path)
+        if sig is None:
+            return None, None
+        stale = []
+        with self._lock:
+            entry = self._idle.get(key)
+            if entry is not None and entry[0] != sig:
+                stale = entry[1]
+                del self._idle[key]
+                self.invalidations += 1
+                entry = None
+            if entry is not None and entry[1]:
+                self.hits += 1
+                conn = entry[1].pop()
+            else:
+                self.misses += 1
+                conn = None
+        for c in stale:
+            c.close()
+        if conn is None:
+            conn = self._open(path, immutable)
+        return conn, sig
+
+    def _release(self, path: Path, conn, sig):
+        key = str(path)
+        with self._lock:
+            entry = self._idle.get(key)
+            if entry is None:
+                entry = self._idle[key] = (sig, [])
+            if entry[0] == sig and len(entry[1]) < self.max_idle:
+                entry[1].append(conn)
+                return
+        conn.close()
+
+    def query_one(self, path, sql: str, params=(), immutable: bool = True):
+        """Eine Zeile per gepoolter Verbindung lesen (oder None)."""
+        path = Path(path)
+        conn, sig = self._acquire(path, immutable)
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(sql, params).fetchone()
+        except Exception:
+            # Kaputte/halb geschriebene Datei — Verbindung verwerfen statt
+            # sie an den nächsten Request weiterzureichen
+            conn.close()
+            raise
+        self._release(path, conn, sig)
+        return row
+
+    def query_all(self, path, sql: str, params=(), immutable: bool = True) -> list:
+        """Alle Zeilen per gepoolter Verbindung lesen (nur für kleine Mengen)."""
+        path = Path(path)
+        conn, sig = self._acquire(path, immutable)
+        if conn is None:
+            return []
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        except Exception:
+            conn.close()
+            raise
+        self._release(path, conn, sig)
+        return rows
+
+    def read_tile(self, path, z: int, x: int, y: int, immutable: bool = True):
+        """Tile-Blob (XYZ-Koordinaten) aus einer MBTiles-Datei, sonst None."""
+        # MBTiles y-coordinate is TMS (origin bottom-left) — flip from XYZ
+        tms_y = (1 << z) - 1 - y
+        try:
+            row = self.query_one(
+                path,
+                "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                (z, x, tms_y), immutable)
+        except Exception:
+            return None
+        return bytes(row[0]) if row else None
+
+    def invalidate(self, path=None):
+        """Verbindungen einer Datei (oder aller Dateien) schließen."""
+        with self._lock:
+            if path is None:
+                entries = list(self._idle.values())
+                self._idle.clear()
+            else:
+                e = self._idle.pop(str(path), None)
+                entries = [e] if e else []
+            if entries:
+                self.invalidations += 1
+        for _, conns in entries:
+            for c in conns:
+                c.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "files": len(self._idle),
+                "idle_connections": sum(len(e[1]) for e in self._idle.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+                "invalidations": self.invalidations,
+            }
+
+
+mbtiles_pool = MBTilesPool()
+
+
+# ==================== PMTILES ====================
+# Regionen, Seezeichen und IENC dürfen statt als MBTiles auch als .pmtiles
+# vorliegen (siehe pmtiles.py). Ein Reader hält die Datei gemappt und das
+# Root-Directory dekodiert — pro Tile bleibt eine binäre Suche und ein Slice.
+
+def is_pmtiles_path(path) -> bool:
+    return str(path).endswith(".pmtiles")
+
+
+class PMTilesRegistry:
+    """Ein offener PMTilesReader je Datei, Signatur-geprüft wie MBTilesPool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._readers = {}   # pfad → (signatur, reader)
+        self.opened = 0
+        self.invalidations = 0
+
+    def get(self, path):
+        """Reader für eine Datei (oder None, wenn sie fehlt/kaputt ist)."""
+        key = str(path)
+        sig = _file_signature(path)
+        if sig is None:
+            return None
+        with self._lock:
+            entry = self._readers.get(key)
+            if entry is not None and entry[0] == sig:
+                return entry[1]
+        try:
+            reader = pmtiles.PMTilesReader(path)
+        except Exception as e:
+            print(f"⚠️ PMTiles {Path(path).name} nicht lesbar: {e}")
+            return None
+        with self._lock:
+            old = self._readers.get(key)
+            self._readers[key] = (sig, reader)
+            self.opened += 1
+            if old is not None:
+                self.invalidations += 1
+        # Alter Reader wird nicht geschlossen: ein Executor-Thread könnte noch
+        # darin lesen. Der mmap fällt mit der letzten Referenz.
+        return reader
+
+    def read_tile(self, path, z: int, x: int, y: int):
+        reader = self.get(path)
+        if reader is None:
+            return None
+        try:
+            data = reader.get_tile(z, x, y)
+        except Exception:
+            return None
+        return bytes(data) if data else None
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                n = len(self._readers)
+                self._readers.clear()
+            else:
+                n = 1 if self._readers.pop(str(path), None) else 0
+            if n:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"files": len(self._readers), "opened": self.opened,
+                    "invalidations": self.invalidations}
+
+
+pmtiles_readers = PMTilesRegistry()
+
+
+def read_tile(path, z: int, x: int, y: int):
+    """Tile-Blob (XYZ) aus einer MBTiles- oder PMTiles-Datei, sonst None."""
+    if is_pmtiles_path(path):
+        return pmtiles_readers.read_tile(path, z, x, y)
+    return mbtiles_pool.read_tile(path, z, x, y)
+
+
+def invalidate_file(path=None):
+    """Pool, PMTiles-Reader und Abdeckungs-Index einer Datei (oder aller) verwerfen."""
+    mbtiles_pool.invalidate(path)
+    pmtiles_readers.invalidate(path)
+    coverage.invalidate(path)
+
+
+# ==================== TILE-CACHE (LRU, BYTE-BUDGET) ====================
+
+# Standard-Budget für fertig gemergte Tiles. Um das Boot herum werden immer
+# wieder dieselben ~200 Tiles angefragt (Zoomen, Folgen) — die passen mit
+# typ. 20–200 KB pro Tile locker hinein. Über settings.map.tileCacheMB
+# einstellbar.
+TILE_CACHE_MB = 64
+
+# Geschätzter Python-Overhead je Eintrag (Key-Tupel, OrderedDict-Knoten, bytes-Header)
+_ENTRY_OVERHEAD = 200
+
+
+def etag_for(data: bytes):
+    """Starker ETag aus dem Inhalt (leere Tiles: None)."""
+    if not data:
+        return None
+    return '"' + hashlib.blake2b(data, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match-Header gegen einen ETag prüfen (Liste, W/-Präfix, *)."""
+    if not if_none_match or not etag:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def dataset_version(paths) -> str:
+    """
+    Kurzer Versions-String eines Datensatzes (Region-Set + Stand der
+    Dateien). Ändert sich, sobald eine Region dazu-/abgeschaltet, neu
+    hochgeladen oder IENC neu gebaut wird — Clients hängen ihn als ?v= an die
+    Tile-URL, dann darf die Antwort 'immutable' sein.
+    """
+    h = hashlib.blake2b(digest_size=6)
+    for p in paths:
+        sig = _file_signature(Path(p))
+        h.update(f"{Path(p).name}:{sig[1] if sig else 0}:{sig[2] if sig else 0};".encode())
+    return h.hexdigest()
+
+
+class TileCache:
+    """
+    LRU-Cache für die FINALEN Tile-Bytes (bereits gemergt + gzip), wie sie
+    an den Client gehen. Key: (layer, quellen, z, x, y) — quellen ist das
+    Tupel der beteiligten Regionen/Dateien, ein anderes Region-Set trifft
+    damit nie alte Einträge. Leere Tiles (204) werden als b"" gecacht,
+    denn gerade die Fehl-Lookups gegen alle Regionen sind teuer.
+
+    Jeder Eintrag trägt seinen ETag (Inhalts-Hash), EINMAL beim Einfügen
+    berechnet — 304-Antworten kosten dann nur einen Dict-Lookup.
+
+    Speicher wird über len(bytes) + Pauschale abgerechnet; oberhalb des
+    Budgets fliegen die am längsten nicht benutzten Einträge raus.
+    """
+
+    def __init__(self, budget_mb: float = TILE_CACHE_MB):
+        self._lock = threading.Lock()
+        self._data = OrderedDict()   # key → (bytes, etag)
+        self._bytes = 0
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _cost(entry) -> int:
+        return len(entry[0]) + _ENTRY_OVERHEAD
+
+    def configure(self, budget_mb: float):
+        """Budget (MB) setzen; 0 schaltet den Cache ab."""
+        with self._lock:
+            self.budget = max(0, int(float(budget_mb) * 1024 * 1024))
+            self._evict_locked()
+
+    def get(self, key):
+        """(bytes, etag) oder None."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, data: bytes):
+        """Tile ablegen; gibt (bytes, etag) zurück (auch wenn zu groß fürs Budget)."""
+        entry = (data, etag_for(data))
+        cost = self._cost(entry)
+        with self._lock:
+            if cost > self.budget:
+                return entry
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= self._cost(old)
+            self._data[key] = entry
+            self._bytes += cost
+            self._evict_locked()
+        return entry
+
+    def _evict_locked(self):
+        while self._bytes > self.budget and self._data:
+            _, entry = self._data.popitem(last=False)
+            self._bytes -= self._cost(entry)
+            self.evictions += 1
+
+    def invalidate(self, layer=None):
+        """Alle Einträge (oder nur die eines Layers, z.B. 'enc') verwerfen."""
+        with self._lock:
+            if layer is None:
+                self._data.clear()
+                self._bytes = 0
+                return
+            for key in [k for k in self._data if k[0] == layer]:
+                self._bytes -= self._cost(self._data.pop(key))
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "budget_mb": round(self.budget / 1048576, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+                "evictions": self.evictions,
+            }
+
+
+tile_cache = TileCache()
+
+
+# ==================== ABDECKUNGS-INDEX ====================
+
+# Bis zu diesem Zoom wird eine exakte Bitmap der vorhandenen Tiles geführt
+# (z8: 256×256 Bit = 8 KB), darüber reichen Spalten-/Zeilenbereiche.
+BITMAP_MAXZOOM = 8
+MAX_ZOOM = 22
+
+
+def _lonlat_to_tile(lon: float, lat: float, z: int):
+    """WGS84 → XYZ-Tile (Zeile von oben gezählt), auf das Gitter geklemmt."""
+    n = 1 << z
+    lat = max(-85.0511, min(85.0511, lat))
+    lat_r = math.radians(lat)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.log(math.tan(lat_r) + 1.0 / math.cos(lat_r)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+class Coverage:
+    """
+    Welche Tiles KANN eine MBTiles-Datei enthalten?
+
+    bounds: aus den Metadaten (lon_min, lat_min, lon_max, lat_max) oder None.
+    ranges: z → (x_min, x_max, y_min, y_max) in XYZ, exakt aus dem
+            Tile-Index: je belegter Spalte ein B-Tree-Abstieg für die
+            nächste Spalte und je einer für min/max(tile_row) (_INDEX_RANGE)
+            statt eines Scans über alle Tiles des Zooms. Die Metadaten-
+            Bounds werden dafür nicht benutzt (oft zu knapp oder falsch).
+    bitmaps: z → bytearray, exakte Belegung für z ≤ BITMAP_MAXZOOM (die
+             Bereiche kommen dort aus demselben Scan).
+    """
+
+    __slots__ = ("bounds", "ranges", "bitmaps")
+
+    def __init__(self, bounds=None, ranges=None, bitmaps=None):
+        self.bounds = bounds
+        self.ranges = ranges or {}
+        self.bitmaps = bitmaps or {}
+
+    def may_contain(self, z: int, x: int, y: int) -> bool:
+        r = self.ranges.get(z)
+        if r is None:
+            return False
+        if not (r[0] <= x <= r[1] and r[2] <= y <= r[3]):
+            return False
+        bm = self.bitmaps.get(z)
+        if bm is not None:
+            bit = y * (1 << z) + x
+            return bool(bm[bit >> 3] & (1 << (bit & 7)))
+        return True
+
+
+# Spalten-/Zeilenbereich eines Zooms per "Skip-Scan" über den Tile-Index
+# (zoom_level, tile_column, tile_row): rekursiv von Spalte zu Spalte, je
+# Spalte min/max(tile_row) — jeweils ein Abstieg, kein Scan aller Tiles.
+_INDEX_RANGE = """
+WITH RECURSIVE cols(c) AS (
+    SELECT MIN(tile_column) FROM tiles WHERE zoom_level = ?1
+    UNION ALL
+    SELECT (SELECT MIN(tile_column) FROM tiles WHERE zoom_level = ?1 AND tile_column > c)
+    FROM cols WHERE c IS NOT NULL
+)
+SELECT MIN(c), MAX(c), MIN(r_lo), MAX(r_hi) FROM (
+    SELECT c,
+           (SELECT MIN(tile_row) FROM tiles WHERE zoom_level = ?1 AND tile_column = c) AS r_lo,
+           (SELECT MAX(tile_row) FROM tiles WHERE zoom_level = ?1 AND tile_column = c) AS r_hi
+    FROM cols WHERE c IS NOT NULL
+)
+"""
+
+
+def load_coverage(path, pool: MBTilesPool = None) -> Coverage:
+    """Abdeckungs-Index einer MBTiles-Datei bauen. BLOCKING."""
+    if is_pmtiles_path(path):
+        return _pmtiles_coverage(path)
+    pool = pool or mbtiles_pool
+    bounds = None
+    try:
+        row = pool.query_one(path, "SELECT value FROM metadata WHERE name='bounds'")
+        if row:
+            parts = [float(v) for v in str(row[0]).split(",")]
+            if len(parts) == 4:
+                bounds = parts
+    except Exception:
+        pass
+
+    ranges, bitmaps = {}, {}
+    for z in range(MAX_ZOOM + 1):
+        n = 1 << z
+        try:
+            if z <= BITMAP_MAXZOOM:
+                rows = pool.query_all(path, "SELECT tile_column, tile_row FROM tiles "
+                                            "WHERE zoom_level=?", (z,))
+                if not rows:
+                    continue
+                bm = bytearray((n * n + 7) // 8)
+                for col, tms_row in rows:
+                    bit = (n - 1 - tms_row) * n + col
+                    bm[bit >> 3] |= 1 << (bit & 7)
+                bitmaps[z] = bm
+                cols = [col for col, _ in rows]
+                tms = [row for _, row in rows]
+                r = (min(cols), max(cols), min(tms), max(tms))
+            else:
+                r = pool.query_one(path, _INDEX_RANGE, (z,))
+                if r is None or r[0] is None:
+                    continue
+        except Exception:
+            # Unlesbar → lieber alles abfragen als Tiles verschlucken
+            return Coverage(bounds, {zz: (0, (1 << zz) - 1, 0, (1 << zz) - 1)
+                                     for zz in range(MAX_ZOOM + 1)})
+        # TMS-Zeilen → XYZ (von oben gezählt)
+        ranges[z] = (r[0], r[1], n - 1 - r[3], n - 1 - r[2])
+    return Coverage(bounds, ranges, bitmaps)
+
+
+def _pmtiles_coverage(path) -> Coverage:
+    """PMTiles: Zoom-Bereich und Bounds stehen im Header — Spalten und Zeilen
+    daraus ableiten (±1 Tile), keine Bitmap (ein Lookup ist ohnehin billig)."""
+    reader = pmtiles_readers.get(path)
+    if reader is None:
+        return Coverage()
+    b = reader.bounds
+    ranges = {}
+    for z in range(reader.min_zoom, min(reader.max_zoom, MAX_ZOOM) + 1):
+        n = 1 << z
+        x_min, y_min = _lonlat_to_tile(b[0], b[3], z)
+        x_max, y_max = _lonlat_to_tile(b[2], b[1], z)
+        ranges[z] = (max(0, x_min - 1), min(n - 1, x_max + 1),
+                     max(0, y_min - 1), min(n - 1, y_max + 1))
+    return Coverage(b, ranges)
+
+
+class CoverageIndex:
+    """Abdeckungs-Indizes je Datei, einmal geladen und bis zur Invalidierung
+    (gleiche Anlässe wie beim Verbindungs-Pool) im Speicher gehalten."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_path = {}   # pfad → Coverage
+        self.skipped = 0     # Lookups, die der Index erspart hat
+
+    def loaded(self, paths) -> bool:
+        return all(str(p) in self._by_path for p in paths)
+
+    def get(self, path) -> Coverage:
+        """Index einer Datei (lädt bei Bedarf — BLOCKING)."""
+        key = str(path)
+        cov = self._by_path.get(key)
+        if cov is None:
+            cov = load_coverage(path)
+            with self._lock:
+                self._by_path[key] = cov
+        return cov
+
+    def load(self, paths):
+        for p in paths:
+            self.get(p)
+
+    def filter(self, paths, z: int, x: int, y: int) -> list:
+        """Nur die Dateien, die (z,x,y) enthalten können. Nicht geladene
+        Dateien bleiben drin (kein Blocking in der Event-Loop)."""
+        out = []
+        for p in paths:
+            cov = self._by_path.get(str(p))
+            if cov is None or cov.may_contain(z, x, y):
+                out.append(p)
+            else:
+                self.skipped += 1
+        return out
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._by_path.clear()
+            else:
+                self._by_path.pop(str(path), None)
+
+    def stats(self) -> dict:
+        return {"files": len(self._by_path), "skipped_lookups": self.skipped}
+
+
+coverage = CoverageIndex()
+
+
+# ==================== ROUTEN-KORRIDOR ====================
+
+_EARTH_M = 40075016.7   # Äquatorumfang
+
+
+def _corridor_walk(points, buffer_m: float, z: int):
+    """(Meter ab Start, x, y) jedes Korridor-Tiles eines Zooms beim ersten
+    Auftreten, in Fahrtrichtung. Jedes Segment wird in Schritten von einer
+    halben Tile-Breite abgetastet, um jeden Punkt die Puffer-Box auf Tiles
+    umgerechnet."""
+    seen = set()
+    n = 1 << z
+    dlat = buffer_m / 111320.0
+    # Einzelpunkt (z.B. nur Ziel) → Box um diesen Punkt
+    pairs = list(zip(points, points[1:])) or [(points[0], points[0])]
+    dist = 0.0
+    for (lat0, lon0), (lat1, lon1) in pairs:
+        cos_lat = max(0.01, math.cos(math.radians((lat0 + lat1) / 2)))
+        tile_m = _EARTH_M * cos_lat / n
+        seg_m = math.hypot((lat1 - lat0) * 111320.0, (lon1 - lon0) * 111320.0 * cos_lat)
+        steps = max(1, int(seg_m / (tile_m / 2)) + 1)
+        dlon = buffer_m / (111320.0 * cos_lat)
+        for i in range(steps + 1):
+            t = i / steps
+            lat = lat0 + (lat1 - lat0) * t
+            lon = lon0 + (lon1 - lon0) * t
+            x0, y0 = _lonlat_to_tile(lon - dlon, lat + dlat, z)
+            x1, y1 = _lonlat_to_tile(lon + dlon, lat - dlat, z)
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    if (x, y) not in seen:
+                        seen.add((x, y))
+                        yield dist + seg_m * t, x, y
+        dist += seg_m
+
+
+def corridor_tiles(points, buffer_m: float, z: int) -> list:
+    """
+    Alle Tiles (XYZ) eines Zooms im Korridor ±buffer_m um eine Route.
+
+    points: [(lat, lon), ...]. Reihenfolge = Fahrtrichtung (Start zuerst),
+    ohne Duplikate.
+    """
+    if not points:
+        return []
+    return [(x, y) for _, x, y in _corridor_walk(points, buffer_m, z)]
+
+
+def route_corridor_tiles(points, buffer_m: float, zooms) -> list:
+    """
+    Korridor-Tiles mehrerer Zooms routenweise statt zoomweise geordnet:
+    [(Meter ab Start, z, x, y), ...] nach Position entlang der Route, an
+    jeder Position alle Zooms (kleiner Zoom zuerst). Wer die Liste nach
+    Budget abschneidet, verliert so das Routenende — nicht die hohen Zooms.
+    """
+    if not points:
+        return []
+    def walk(z):
+        for d, x, y in _corridor_walk(points, buffer_m, z):
+            yield d, z, x, y
+    return list(heapq.merge(*[walk(z) for z in zooms]))
+
+
+def route_length_m(points) -> float:
+    """Länge einer Route [(lat, lon), ...] in Metern (wie _corridor_walk)."""
+    total = 0.0
+    for (lat0, lon0), (lat1, lon1) in zip(points, points[1:]):
+        cos_lat = max(0.01, math.cos(math.radians((lat0 + lat1) / 2)))
+        total += math.hypot((lat1 - lat0) * 111320.0, (lon1 - lon0) * 111320.0 * cos_lat)
+    return total
+
+
+# ==================== COMPOSITE-MBTILES ====================
+# Statt bei jedem Tile-Request mehrere Regionen zu lesen und zu mergen, wird
+# die aktive Auswahl im Hintergrund in EINE MBTiles-Datei geschrieben (Muster
+# wie ienc.build_mbtiles: erst .building, dann atomar ersetzen). Der Proxy
+# macht dann genau einen indizierten Lookup, die Tiles liegen schon gzip-
+# komprimiert drin. Welche Auswahl eine Datei abbildet, steht in den
+# Metadaten (boatos_version = dataset_version() der Quelldateien, vom
+# Aufrufer ggf. um den Merge-Modus ergänzt).
+
+def _iter_tiles(path):
+    """Alle Tiles einer MBTiles-Datei, sortiert nach (z, spalte, zeile). BLOCKING.
+    Eigene Verbindung — der Scan läuft lange und soll keinen Pool-Slot halten."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        yield from conn.execute(
+            "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles "
+            "ORDER BY zoom_level, tile_column, tile_row")
+    finally:
+        conn.close()
+
+
+def _read_metadata(path) -> dict:
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return dict(conn.execute("SELECT name, value FROM metadata").fetchall())
+        finally:
+            conn.close()
+    except Exception:
+        return {}
+
+
+def composite_version(path):
+    """Quell-Version einer Composite-Datei (oder None, wenn keine/kaputt)."""
+    if not Path(path).exists():
+        return None
+    return _read_metadata(path).get("boatos_version")
+
+
+def _merge_metadata(sources) -> dict:
+    """Metadaten der Quellen vereinen: Bounds umschließend, Zoom-Spanne
+    maximal, vector_layers nach id vereint. Rest vom ersten Quell-File."""
+    metas = [_read_metadata(p) for p in sources]
+    out = dict(metas[0]) if metas else {}
+    bounds, minz, maxz, layers = None, None, None, {}
+    for m in metas:
+        try:
+            b = [float(v) for v in m.get("bounds", "").split(",")]
+            if len(b) == 4:
+                bounds = b if bounds is None else [min(bounds[0], b[0]), min(bounds[1], b[1]),
+                                                   max(bounds[2], b[2]), max(bounds[3], b[3])]
+        except ValueError:
+            pass
+        for key, fn in (("minzoom", min), ("maxzoom", max)):
+            try:
+                v = int(m[key])
+            except (KeyError, ValueError):
+                continue
+            if key == "minzoom":
+                minz = v if minz is None else fn(minz, v)
+            else:
+                maxz = v if maxz is None else fn(maxz, v)
+        try:
+            for vl in json.loads(m.get("json", "{}")).get("vector_layers", []):
+                layers.setdefault(vl.get("id"), vl)
+        except ValueError:
+            pass
+    if bounds:
+        out["bounds"] = ",".join(f"{v:.6f}" for v in bounds)
+    if minz is not None:
+        out["minzoom"] = str(minz)
+    if maxz is not None:
+        out["maxzoom"] = str(maxz)
+    if layers:
+        out["json"] = json.dumps({"vector_layers": list(layers.values())})
+    return out
+
+
+def build_composite(sources, out_path, merge_fn, progress_cb=None, version=None) -> dict:
+    """
+    Mehrere MBTiles-Dateien zu einer Composite-Datei vereinen. BLOCKING.
+
+    sources:  Quelldateien (Reihenfolge = Region-Reihenfolge)
+    merge_fn: Liste roher Tile-Blobs → fertiger gzip-Blob (main._merge_tiles)
+    progress_cb(percent, msg): optional
+    version:  boatos_version der Datei (Default dataset_version(sources));
+              main hängt den Merge-Modus an
+
+    Die Quellen werden parallel sortiert gelesen und per Merge-Join
+    zusammengeführt — Speicherbedarf ist ein Tile je Quelle, nicht die Region.
+    """
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    version = version or dataset_version(sources)
+
+    total = 0
+    for p in sources:
+        try:
+            row = mbtiles_pool.query_one(p, "SELECT count(*) FROM tiles")
+            total += row[0] if row else 0
+        except Exception:
+            pass
+
+    tmp = out_path.with_suffix(".building")
+    if tmp.exists():
+        tmp.unlink()
+    conn = sqlite3.connect(str(tmp))
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+    conn.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, "
+                 "tile_row INTEGER, tile_data BLOB)")
+    conn.execute("CREATE UNIQUE INDEX tile_index ON tiles "
+                 "(zoom_level, tile_column, tile_row)")
+
+    # je Quelle ein sortierter Strom ((z, x, tms_y), quell_index, blob)
+    streams = [(((z, x, y), i, data) for z, x, y, data in _iter_tiles(p))
+               for i, p in enumerate(sources)]
+
+    read = written = merged = 0
+    batch = []
+    group_key, group = None, []
+
+    def flush():
+        nonlocal written, merged
+        if not group:
+            return
+        blobs = [bytes(d) for _, d in sorted(group, key=lambda g: g[0])]  # Region-Reihenfolge
+        if len(blobs) > 1:
+            merged += 1
+        data = merge_fn(blobs)
+        if data:
+            batch.append((group_key[0], group_key[1], group_key[2], sqlite3.Binary(data)))
+            written += 1
+
+    try:
+        for key, idx, data in heapq.merge(*streams, key=lambda t: t[0]):
+            if key != group_key:
+                flush()
+                group_key, group = key, []
+                if len(batch) >= 1000:
+                    conn.executemany("INSERT INTO tiles VALUES (?,?,?,?)", batch)
+                    batch.clear()
+            group.append((idx, data))
+            read += 1
+            if progress_cb and read % 5000 == 0:
+                progress_cb(int(read / total * 100) if total else 0,
+                            f"{read}/{total} Tiles")
+        flush()
+        if batch:
+            conn.executemany("INSERT INTO tiles VALUES (?,?,?,?)", batch)
+
+        meta = _merge_metadata(sources)
+        meta["name"] = "BoatOS Composite"
+        meta["boatos_version"] = version
+        meta["boatos_sources"] = ",".join(Path(p).stem for p in sources)
+        conn.executemany("INSERT INTO metadata VALUES (?, ?)", meta.items())
+        conn.commit()
+        conn.close()
+    except BaseException:
+        conn.close()
+        tmp.unlink(missing_ok=True)
+        raise
+
+    os.replace(tmp, out_path)
+    return {"tiles": written, "merged": merged, "sources": len(sources),
+            "version": version, "size_mb": round(out_path.stat().st_size / 1048576, 2)}
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Prozess-Pools für CPU-lastige Hintergrund-Jobs (IENC: Zellen dekodieren,
+Tiles rendern) — ohne fork aus dem Backend und ohne das Backend im Worker.
+
+Das Backend läuft mit Event-Loop und Threads, daher kein fork, sondern
+forkserver (sonst spawn). Beide starten ihre Kinder mit den "preparation
+data" des Elternprozesses, und dazu gehört __main__: jedes Kind importiert
+es als __mp_main__. Läuft das Backend als `python app/main.py`, baute so
+jeder Worker die FastAPI-App samt Services und Logbuch nach — RAM und
+Startzeit je Worker, nur um Tiles zu rendern.
+
+Die Kontexte hier blenden __main__ beim Start eines Workers aus. Die Worker
+importieren dann nur die Module ihrer (per Name gepickelten) Funktionen,
+z.B. ienc → mvt, feature_store. Voraussetzung: Worker-Funktionen und
+-Argumente stammen nicht aus __main__.
+
+Reines Python, keine Abhängigkeiten.
+"""
+
+import multiprocessing
+import sys
+import threading
+import types
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import context
+
+_main_lock = threading.Lock()
+
+
+@contextmanager
+def _main_hidden():
+    """__main__ für die Dauer eines Worker-Starts durch ein leeres Modul
+    ersetzen — multiprocessing.spawn.get_preparation_data findet dann weder
+    Pfad noch Modulnamen und das Kind importiert kein __mp_main__."""
+    with _main_lock:
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main
+
+
+# Eigene Process-Klassen auf Modulebene: das Process-Objekt wird ans Kind
+# gepickelt, die Klasse muss dort per Name importierbar sein (→ nur dieses
+# kleine Modul).
+
+class _ForkServerProcess(context.ForkServerProcess):
+    @staticmethod
+    def _Popen(process_obj):
+        with _main_hidden():
+            return context.ForkServerProcess._Popen(process_obj)
+
+
+class _SpawnProcess(context.SpawnProcess):
+    @staticmethod
+    def _Popen(process_obj):
+        with _main_hidden():
+            return context.SpawnProcess._Popen(process_obj)
+
+
+class _ForkServerContext(context.ForkServerContext):
+    Process = _ForkServerProcess
+
+
+class _SpawnContext(context.SpawnContext):
+    Process = _SpawnProcess
+
+
+def process_pool(workers: int, initializer=None, initargs=(), preload=()):
+    """
+    ProcessPoolExecutor mit `workers` Prozessen (None bei workers <= 1 =
+    seriell). preload: Module, die der forkserver einmal importiert und an
+    alle Worker vererbt (wirkt nur, solange er noch nicht läuft).
+    """
+    if workers <= 1:
+        return None
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = _ForkServerContext()
+        if preload:
+            ctx.set_forkserver_preload(list(preload))
+    else:
+        ctx = _SpawnContext()
+    return ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                               initializer=initializer, initargs=initargs)
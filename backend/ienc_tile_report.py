@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Größenvergleich IENC-Vektor-Tiles vorher/nachher (Generalisierung je Zoom).
+
+  python ienc_tile_report.py vorher.mbtiles nachher.mbtiles
+      vergleicht zwei vorhandene MBTiles
+
+  python ienc_tile_report.py --charts data/charts [--only enc_Elbe ...]
+      baut die Tiles der konvertierten ENC-Gewässer zweimal in ein
+      Temp-Verzeichnis — ohne und mit Generalisierung — und vergleicht
+
+Ausgabe je Zoomstufe: Tile-Anzahl, Summe (gzip) und Veränderung in Prozent.
+"""
+
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "app"))
+
+import ienc
+
+
+def zoom_sizes(mbtiles):
+    """{zoom: (anzahl, bytes)} einer MBTiles-Datei."""
+    conn = sqlite3.connect(f"file:{mbtiles}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT zoom_level, COUNT(*), SUM(LENGTH(tile_data)) "
+                            "FROM tiles GROUP BY zoom_level").fetchall()
+    finally:
+        conn.close()
+    return {z: (n, b or 0) for z, n, b in rows}
+
+
+def _kb(b):
+    return f"{b / 1024:,.0f} KB"
+
+
+def print_report(before, after, label_a="vorher", label_b="nachher"):
+    a, b = zoom_sizes(before), zoom_sizes(after)
+    print(f"{'Zoom':>4}  {'Tiles ' + label_a:>14}  {'Tiles ' + label_b:>14}  "
+          f"{label_a:>12}  {label_b:>12}  {'Δ':>7}")
+    tot_a = tot_b = 0
+    for z in sorted(set(a) | set(b)):
+        na, ba = a.get(z, (0, 0))
+        nb, bb = b.get(z, (0, 0))
+        tot_a += ba
+        tot_b += bb
+        delta = f"{(bb - ba) / ba * 100:+.1f}%" if ba else "—"
+        print(f"{z:>4}  {na:>14,}  {nb:>14,}  {_kb(ba):>12}  {_kb(bb):>12}  {delta:>7}")
+    delta = f"{(tot_b - tot_a) / tot_a * 100:+.1f}%" if tot_a else "—"
+    print(f"{'Σ':>4}  {'':>14}  {'':>14}  {_kb(tot_a):>12}  {_kb(tot_b):>12}  {delta:>7}")
+
+
+def build_both(charts_dir, only=None, workers=None):
+    charts = []
+    for d in sorted(Path(charts_dir).glob("enc_*")):
+        if only and d.name not in only:
+            continue
+        if (d / "geojson" / "manifest.json").exists():
+            charts.append((d.name[4:], d))
+    if not charts:
+        sys.exit(f"Keine konvertierten ENC-Gewässer in {charts_dir}")
+    print(f"Gewässer: {', '.join(n for n, _ in charts)}")
+
+    tmp = Path(tempfile.mkdtemp(prefix="ienc_report_"))
+    before, after = tmp / "ohne.mbtiles", tmp / "mit.mbtiles"
+
+    # "Vorher" seriell bauen: die Worker-Prozesse würden die Konstanten
+    # beim Import wieder auf die Defaults setzen
+    simplify, min_area = ienc.SIMPLIFY_PX, ienc.MIN_AREA_PX
+    ienc.SIMPLIFY_PX = ienc.MIN_AREA_PX = 0.0
+    t = time.time()
+    ienc.build_mbtiles(charts, before, workers=1)
+    print(f"ohne Generalisierung: {time.time() - t:.1f} s")
+    ienc.SIMPLIFY_PX, ienc.MIN_AREA_PX = simplify, min_area
+    t = time.time()
+    ienc.build_mbtiles(charts, after, workers=workers)
+    print(f"mit Generalisierung:  {time.time() - t:.1f} s "
+          f"(SIMPLIFY_PX={simplify}, MIN_AREA_PX={min_area})\n")
+    print_report(before, after, "ohne", "mit")
+    print(f"\nDateien: {tmp}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("files", nargs="*", help="vorher.mbtiles nachher.mbtiles")
+    ap.add_argument("--charts", help="Chart-Verzeichnis (data/charts) — beide Varianten bauen")
+    ap.add_argument("--only", nargs="*", help="nur diese Chart-IDs (enc_...)")
+    ap.add_argument("--workers", type=int, help="Render-Prozesse für den Build mit Generalisierung")
+    args = ap.parse_args()
+
+    if args.charts:
+        build_both(args.charts, args.only, args.workers)
+    elif len(args.files) == 2:
+        print_report(*args.files)
+    else:
+        ap.error("zwei MBTiles-Dateien oder --charts angeben")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Micro-Benchmark MVT-Encoder: mvt.encode_tile (Referenz) gegen
+mvt.TileEncoder (Build-Pfad in ienc.py).
+
+  python mvt_benchmark.py                     synthetische Features
+  python mvt_benchmark.py --chart data/charts/enc_Elbe --zoom 12
+
+Gemessen wird nur das Encoding: Clipping/Generalisierung laufen einmal
+vorab, danach werden dieselben Layer-Dicts mit beiden Encodern serialisiert
+(und auf byte-identische Ausgabe geprüft).
+"""
+
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "app"))
+
+import mvt
+
+
+def synthetic_features(n=3000, seed=1):
+    """Fluss-ähnliche Testdaten: Tiefenflächen, Uferlinien, Tonnen."""
+    rnd = random.Random(seed)
+    feats = []
+    for i in range(n):
+        x = 10 + rnd.random() * 0.5
+        y = 53 + rnd.random() * 0.3
+        kind = i % 3
+        if kind == 0:
+            r = 0.002 + rnd.random() * 0.01
+            ring = [[x + r * math.cos(a / 40 * 2 * math.pi), y + r * 0.6 * math.sin(a / 40 * 2 * math.pi)]
+                    for a in range(40)]
+            ring.append(ring[0])
+            geom = {"type": "Polygon", "coordinates": [ring]}
+            props = {"_cls": "depare", "DRVAL1": rnd.choice([0, 1.5, 2.0]),
+                     "DRVAL2": round(rnd.random() * 5, 1)}
+        elif kind == 1:
+            geom = {"type": "LineString",
+                    "coordinates": [[x + k * 0.0005, y + rnd.random() * 0.0005] for k in range(30)]}
+            props = {"_cls": "slcons", "CATSLC": rnd.randint(1, 6), "OBJNAM": f"Ufer {i % 50}"}
+        else:
+            geom = {"type": "Point", "coordinates": [x, y]}
+            props = {"_cls": "boylat", "COLOUR": [3, 4], "CATLAM": rnd.randint(1, 2),
+                     "BOYSHP": 2, "OBJNAM": f"Tonne {i % 200}"}
+        grp = {0: "depth", 1: "structures", 2: "marks"}[kind]
+        feats.append((grp, geom, props))
+    return feats
+
+
+def chart_features(chart_dir):
+    import ienc
+    return [(grp, geom, props) for grp, geom, props, _, _ in ienc._load_chart_features(chart_dir)]
+
+
+def prepare_tiles(feats, z):
+    """Features auf die Tiles ihrer Bbox verteilen und clippen → Layer-Dicts."""
+    tiles = {}
+    for grp, geom, props in feats:
+        pts = []
+
+        def walk(c):
+            if isinstance(c[0], (int, float)):
+                pts.append(c)
+            else:
+                for e in c:
+                    walk(e)
+        walk(geom["coordinates"])
+        x0, y0 = mvt.project(min(p[0] for p in pts), max(p[1] for p in pts), z)
+        x1, y1 = mvt.project(max(p[0] for p in pts), min(p[1] for p in pts), z)
+        for tx in range(int(x0), int(x1) + 1):
+            for ty in range(int(y0), int(y1) + 1):
+                clipped = mvt.clip_geometry(geom, z, tx, ty)
+                if clipped is not None:
+                    layers = tiles.setdefault((tx, ty), {})
+                    layers.setdefault(grp, []).append((clipped[0], clipped[1], props))
+    return list(tiles.values())
+
+
+def bench(fn, tiles, rounds):
+    best = None
+    size = 0
+    for _ in range(rounds):
+        t = time.perf_counter()
+        size = sum(len(fn(layers)) for layers in tiles)
+        dt = time.perf_counter() - t
+        best = dt if best is None else min(best, dt)
+    return best, size
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--chart", help="konvertiertes ENC-Gewässer statt synthetischer Daten")
+    ap.add_argument("--zoom", type=int, default=13)
+    ap.add_argument("--rounds", type=int, default=5)
+    args = ap.parse_args()
+
+    feats = chart_features(args.chart) if args.chart else synthetic_features()
+    tiles = prepare_tiles(feats, args.zoom)
+    print(f"{len(feats)} Features → {len(tiles)} Tiles (z{args.zoom})")
+
+    enc = mvt.TileEncoder()
+    for layers in tiles:
+        if enc.encode(layers) != mvt.encode_tile(layers):
+            sys.exit("❌ TileEncoder weicht von encode_tile ab")
+
+    t_ref, size = bench(mvt.encode_tile, tiles, args.rounds)
+    # Frischer Encoder: Cache-Aufbau zählt mit (wie beim ersten Zoom im Build)
+    t_new, _ = bench(lambda layers, e=mvt.TileEncoder(): e.encode(layers), tiles, 1)
+    t_warm, _ = bench(enc.encode, tiles, args.rounds)
+
+    mb = size / 1e6
+    print(f"{'Encoder':<22} {'Zeit':>9} {'Tiles/s':>10} {'MB/s':>8}")
+    for label, t in (("encode_tile", t_ref), ("TileEncoder (kalt)", t_new),
+                     ("TileEncoder (warm)", t_warm)):
+        print(f"{label:<22} {t * 1000:>7.1f}ms {len(tiles) / t:>10,.0f} {mb / t:>8.2f}")
+    print(f"Speedup warm: {t_ref / t_warm:.2f}×  (Ausgabe identisch, {size:,} Bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Lade-Benchmark Wasserstrassen-Graph: bisherige Dict-Adjazenz (Referenz)
+gegen osrm_routing.RoutingGraph (CSR-Arrays, WaterwayGraphRouter) — aus
+SQLite gebaut und als gemappte .routing-v2-Datei.
+
+  python routing_benchmark.py                          synthetischer Graph
+  python routing_benchmark.py --nodes 500000 --files 2
+  python routing_benchmark.py data/routing/*.routing   echte Graphen (SQLite oder v2)
+
+Gemessen werden Ladezeit sowie Spitzen- und Dauer-Speicher (tracemalloc)
+beider Varianten; danach rechnen beide dieselben Zufallsrouten und werden
+auf identische Knotenfolgen und Distanzen geprüft.
+"""
+
+import argparse
+import asyncio
+import gc
+import heapq
+import math
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "app"))
+
+from osrm_routing import RoutingGraph, WaterwayGraphRouter, is_routing_v2
+
+
+class LegacyGraph:
+    """Der bisherige Lader aus WaterwayGraphRouter (Dicts aus Listen aus Tupeln).
+    v2-Dateien kannte er nicht — die werden hier über RoutingGraph gelesen."""
+
+    CELL = WaterwayGraphRouter.CELL
+
+    def __init__(self, paths):
+        self._adj = {}
+        self._coords = {}
+        self._spatial = defaultdict(list)
+        for path in paths:
+            if is_routing_v2(path):
+                g = RoutingGraph.open_v2(path)
+                nodes, edges, con = zip(g.ids, g.lat, g.lon), g.edges(), None
+            else:
+                con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+                nodes = con.execute("SELECT id, lat, lon FROM nodes")
+                edges = con.execute("SELECT from_node, to_node, distance_m FROM edges")
+            for nid, lat, lon in nodes:
+                self._coords[nid] = (lat, lon)
+                cx, cy = int(lon / self.CELL), int(lat / self.CELL)
+                self._spatial[(cx, cy)].append(nid)
+            for fn, tn, dist in edges:
+                self._adj.setdefault(fn, []).append((tn, float(dist)))
+            if con is not None:
+                con.close()
+
+    _hav = WaterwayGraphRouter._hav
+
+    def snap(self, lat, lon, max_m=15000):
+        cx, cy = int(lon / self.CELL), int(lat / self.CELL)
+        best_id, best_d = None, max_m
+        for dx in range(-3, 4):
+            for dy in range(-3, 4):
+                for nid in self._spatial.get((cx + dx, cy + dy), []):
+                    nlat, nlon = self._coords[nid]
+                    d = self._hav(lat, lon, nlat, nlon)
+                    if d < best_d:
+                        best_d = d
+                        best_id = nid
+        return best_id
+
+    def astar(self, start, goal):
+        if start == goal:
+            return [start], 0.0
+        glat, glon = self._coords[goal]
+        open_set = [(0.0, start)]
+        came_from = {}
+        g = {start: 0.0}
+        visited = set()
+        while open_set:
+            _, cur = heapq.heappop(open_set)
+            if cur in visited:
+                continue
+            visited.add(cur)
+            if cur == goal:
+                path = []
+                while cur in came_from:
+                    path.append(cur)
+                    cur = came_from[cur]
+                path.append(start)
+                path.reverse()
+                return path, g[goal]
+            for nb, dist in self._adj.get(cur, []):
+                ng = g.get(cur, math.inf) + dist
+                if ng < g.get(nb, math.inf):
+                    came_from[nb] = cur
+                    g[nb] = ng
+                    nlat, nlon = self._coords.get(nb, (glat, glon))
+                    heapq.heappush(open_set, (ng + self._hav(nlat, nlon, glat, glon), nb))
+        return None, 0.0
+
+
+def synthetic_graphs(out_dir, n_nodes=200000, n_files=1, seed=1):
+    """Fluss-ähnliches Netz (Zufallswege mit Abzweigen) als .routing-Dateien
+    im Creator-Schema; bei mehreren Dateien Aufteilung nach Längengrad mit
+    gemeinsamen Grenzknoten wie bei Länder-Extrakten."""
+    rnd = random.Random(seed)
+    nodes = {}
+    ways = []
+    next_id = 10_000_000_000
+    while len(nodes) < n_nodes:
+        if nodes and rnd.random() < 0.995:
+            nid = rnd.choice(ways[-1] if rnd.random() < 0.7 else rnd.choice(ways))
+            lat, lon = nodes[nid]
+        else:
+            lat, lon = 47 + rnd.random() * 7, 6 + rnd.random() * 9
+            nid = next_id = next_id + rnd.randint(1, 50)
+            nodes[nid] = (lat, lon)
+        way = [nid]
+        heading = rnd.random() * 2 * math.pi
+        for _ in range(rnd.randint(20, 200)):
+            heading += rnd.gauss(0, 0.3)
+            lat += math.sin(heading) * 0.002
+            lon += math.cos(heading) * 0.003
+            next_id += rnd.randint(1, 50)
+            nodes[next_id] = (lat, lon)
+            way.append(next_id)
+        ways.append(way)
+
+    hav = WaterwayGraphRouter._hav
+    lon_min = min(lon for _, lon in nodes.values())
+    lon_max = max(lon for _, lon in nodes.values())
+    width = (lon_max - lon_min) / n_files or 1
+    buckets = [([], set()) for _ in range(n_files)]
+    for way in ways:
+        oneway = rnd.random() < 0.05
+        for a, b in zip(way, way[1:]):
+            (lat1, lon1), (lat2, lon2) = nodes[a], nodes[b]
+            k = min(n_files - 1, int((lon1 - lon_min) / width))
+            edges, used = buckets[k]
+            d = hav(None, lat1, lon1, lat2, lon2)
+            edges.append((a, b, d))
+            if not oneway:
+                edges.append((b, a, d))
+            used.update((a, b))
+
+    paths = []
+    for k, (edges, used) in enumerate(buckets):
+        path = Path(out_dir) / f"synth{k}.routing"
+        con = sqlite3.connect(str(path))
+        con.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)")
+        con.execute("CREATE TABLE nodes (id INTEGER PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL)")
+        con.execute("CREATE TABLE edges (from_node INTEGER NOT NULL, to_node INTEGER NOT NULL, "
+                    "distance_m REAL NOT NULL)")
+        con.executemany("INSERT INTO nodes VALUES (?,?,?)", [(nid, *nodes[nid]) for nid in used])
+        con.executemany("INSERT INTO edges VALUES (?,?,?)", edges)
+        con.execute("CREATE INDEX idx_edges_from ON edges(from_node)")
+        con.commit()
+        con.close()
+        paths.append(path)
+    return paths
+
+
+def measure(load):
+    """(Objekt, Sekunden, Spitze MB, dauerhaft MB) — Zeit und Speicher in
+    getrennten Läufen, tracemalloc bremst die vielen Array-Appends stark."""
+    gc.collect()
+    t = time.perf_counter()
+    load()
+    dt = time.perf_counter() - t
+    gc.collect()
+    tracemalloc.start()
+    obj = load()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, dt, peak / 1e6, current / 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("files", nargs="*", help=".routing-Dateien statt synthetischer Daten")
+    ap.add_argument("--nodes", type=int, default=200000, help="Knoten des synthetischen Graphen")
+    ap.add_argument("--files", dest="n_files", type=int, default=1,
+                    help="synthetischen Graphen auf so viele Dateien aufteilen")
+    ap.add_argument("--routes", type=int, default=20)
+    args = ap.parse_args()
+
+    # Synthetische Graphen und die v2-Datei leben nur für diesen Lauf
+    with tempfile.TemporaryDirectory(prefix="routing_bench_") as tmp:
+        run(args, Path(tmp))
+
+
+def run(args, tmp: Path):
+    if args.files:
+        paths = [Path(p) for p in args.files]
+    else:
+        paths = synthetic_graphs(tmp, args.nodes, args.n_files)
+    size = sum(p.stat().st_size for p in paths)
+    formats = sorted({"v2" if is_routing_v2(p) else "SQLite" for p in paths})
+    print(f"{len(paths)} Datei(en), {size / 1e6:.1f} MB {' + '.join(formats)}")
+
+    legacy, t_old, peak_old, cur_old = measure(lambda: LegacyGraph(paths))
+    built, t_new, peak_new, cur_new = measure(
+        lambda: RoutingGraph.from_files(paths, WaterwayGraphRouter.CELL))
+    v2 = tmp / "graph.routing"
+    built.write_v2(v2)
+    mapped, t_map, peak_map, cur_map = measure(lambda: RoutingGraph.open_v2(v2))
+    print(f"{len(built):,} Knoten, {built.edge_count:,} Kanten, "
+          f"v2-Datei {v2.stat().st_size / 1e6:.1f} MB\n")
+
+    print(f"{'Lader':<12} {'Zeit':>8} {'Spitze':>10} {'dauerhaft':>10} {'× Datei':>8}")
+    for label, t, peak, cur in (("Dicts", t_old, peak_old, cur_old),
+                                ("CSR", t_new, peak_new, cur_new),
+                                ("v2 (mmap)", t_map, peak_map, cur_map)):
+        print(f"{label:<12} {t:>7.3f}s {peak:>8.1f}MB {cur:>8.1f}MB {peak * 1e6 / size:>8.2f}")
+    print(f"Speicher dauerhaft: {cur_old / cur_new:.1f}× weniger, Ladezeit {t_old / t_new:.2f}× "
+          f"(v2: {t_old / t_map:,.0f}×)")
+    for graph in (built, mapped):
+        check_routes(legacy, graph, args.routes)
+
+
+def check_routes(legacy, graph, n_routes):
+    """Gleiche Routen? Start/Ziel = zufällige Knoten, leicht versetzt."""
+    router = WaterwayGraphRouter(Path(tempfile.gettempdir()))
+    router._graph, router._loaded = graph, list(graph.sources)
+    rnd = random.Random(7)
+    ids = list(legacy._coords)
+    t_old = t_new = 0.0
+    found = 0
+    kind = "v2" if graph._mmap is not None else "CSR"
+    for _ in range(n_routes):
+        wps = []
+        for nid in rnd.sample(ids, 2):
+            lat, lon = legacy._coords[nid]
+            wps.append((lon + 0.0004, lat - 0.0003))
+        t = time.perf_counter()
+        a, b = (legacy.snap(lat, lon) for lon, lat in wps)
+        path_old, d_old = legacy.astar(a, b)
+        t_old += time.perf_counter() - t
+        t = time.perf_counter()
+        res = asyncio.run(router.route(wps))
+        t_new += time.perf_counter() - t
+        if path_old is None:
+            if "error" not in res:
+                sys.exit(f"❌ {kind} findet Route, Dict-Variante nicht")
+            continue
+        a2, b2 = (router._snap(graph, lat, lon) for lon, lat in wps)
+        path_new, d_new = router._astar(graph, a2, b2)
+        if [graph.ids[i] for i in path_new] != path_old or d_new != d_old \
+                or res["properties"]["distance_m"] != d_old:
+            sys.exit(f"❌ {kind}-Route weicht von der Dict-Variante ab")
+        found += 1
+    print(f"{n_routes} Routen ({found} gefunden) identisch — "
+          f"A* Dicts {t_old:.2f}s, {kind} {t_new:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Wandelt SQLite-.routing-Dateien (MBTiles Creator bis zum Format v2) in
+.routing v2 um, das der Backend-Router per mmap ohne Parsen lädt.
+
+  python routing_convert.py data/routing/*.routing
+      ersetzt die Dateien an Ort und Stelle (v2-Dateien werden übersprungen)
+  python routing_convert.py germany.routing -o /tmp/germany.routing
+  python routing_convert.py data/routing/*.routing --keep
+      Original bleibt als <name>.routing.sqlite liegen
+
+Danach das Backend neu starten (oder eine Datei hochladen/löschen), damit
+der Router die neuen Dateien mappt.
+"""
+
+import argparse
+import shutil
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "app"))
+
+from osrm_routing import (RoutingGraph, WaterwayGraphRouter, is_routing_v2,
+                          read_routing_metadata)
+
+# aus der SQLite-Metadatentabelle übernehmen (Zähler rechnet write_v2 neu)
+KEEP_META = ("region", "created_at", "bbox_minlat", "bbox_maxlat", "bbox_minlon", "bbox_maxlon")
+
+
+def convert(src: Path, dest: Path, keep: bool = False):
+    if is_routing_v2(src):
+        print(f"{src.name}: bereits v2 — übersprungen")
+        return
+    t = time.time()
+    size = src.stat().st_size
+    meta = read_routing_metadata(src)
+    graph = RoutingGraph.from_files([src], WaterwayGraphRouter.CELL)
+    if not graph.sources:
+        sys.exit(f"❌ {src.name} nicht lesbar")
+    if keep and dest == src:
+        shutil.copy2(src, src.with_name(src.name + ".sqlite"))
+    graph.write_v2(dest, {k: meta[k] for k in KEEP_META if k in meta})
+
+    check = RoutingGraph.open_v2(dest)
+    if len(check) != len(graph) or check.edge_count != graph.edge_count:
+        sys.exit(f"❌ {dest.name}: Prüfung nach dem Schreiben fehlgeschlagen")
+    print(f"{src.name}: {len(graph):,} Knoten, {graph.edge_count:,} Kanten, "
+          f"{size / 1e6:.1f} MB → "
+          f"{dest.stat().st_size / 1e6:.1f} MB v2 ({time.time() - t:.1f} s)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("files", nargs="+", help="SQLite-.routing-Dateien")
+    ap.add_argument("-o", "--output", help="Zieldatei (nur bei genau einer Eingabe)")
+    ap.add_argument("--keep", action="store_true",
+                    help="beim Ersetzen das Original als <name>.routing.sqlite behalten")
+    args = ap.parse_args()
+    if args.output and len(args.files) != 1:
+        ap.error("-o geht nur mit genau einer Eingabedatei")
+
+    for f in args.files:
+        src = Path(f)
+        convert(src, Path(args.output) if args.output else src, args.keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -532,7 +532,11 @@ async function pollENCJob(onProgress, intervalMs = 2000, timeoutMs = 30 * 60 * 1
             if (!resp.ok) continue;
             const status = await resp.json();
             if (onProgress) onProgress(status);
-            if (!status.running) return status.result;
+            if (!status.running) {
+                // IENC-Tiles evtl. neu gebaut → Karte auf neue Tile-Version umstellen
+                window.refreshIENCTiles?.();
+                return status.result;
+            }
         } catch (e) {
             // Netzwerk-Hänger überbrücken, weiter pollen
         }
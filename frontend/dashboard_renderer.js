@@ -1762,7 +1762,7 @@ class DashboardRenderer {
         const sogKn = (typeof c.sog === 'number') ? c.sog : null;
         const cog   = (typeof c.cog === 'number') ? ((c.cog % 360) + 360) % 360 : null;
 
-        // Navi-Punktdaten (aus /api/nav/point, throttled): Fahrrinnentiefe
+        // Navi-Punktdaten (Push über /ws/nav, Fallback /api/nav/point): Fahrrinnentiefe
         // (pegel-korrigiert), nächster Pegel, Strömung.
         const np = c.navPoint || {};
         const dp = np.depth;
@@ -1796,12 +1796,62 @@ class DashboardRenderer {
                  aheadDepth, aheadDist, aheadShallow, remainingM, wpBearing };
     }
 
-    /** Navi-Punktdaten (Tiefe/Pegel/Strömung) holen (throttled, 8s / >~40m). */
+    /** Push-Kanal /ws/nav (Navi-Punktdaten) öffnen — das Backend rechnet nur
+     *  bei Bewegung/Kursänderung neu und verteilt an alle Displays. */
+    _navStream() {
+        const ns = this._navStreamState ||
+            (this._navStreamState = { ws: null, retryAt: 0, sent: null });
+        if (ns.ws && ns.ws.readyState <= WebSocket.OPEN) return ns.ws;
+        if (Date.now() < ns.retryAt) return null;
+        ns.retryAt = Date.now() + 10000;   // nach Abbruch max. alle 10 s neu
+        const url = window.location.hostname === 'localhost'
+            ? 'ws://localhost:8000/ws/nav'
+            : `${window.location.protocol === 'https:' ? 'wss' : 'ws'}://${window.location.hostname}/ws/nav`;
+        try {
+            ns.ws = new WebSocket(url);
+        } catch (e) {
+            ns.ws = null;
+            return null;
+        }
+        ns.sent = null;
+        ns.ws.onmessage = (ev) => {
+            try {
+                const d = JSON.parse(ev.data);
+                if (window.BoatOS && window.BoatOS.context) window.BoatOS.context.navPoint = d;
+            } catch (e) { /* ignorieren */ }
+        };
+        ns.ws.onclose = () => { ns.ws = null; };
+        return ns.ws;
+    }
+
+    /** Navi-Punktdaten (Tiefe/Pegel/Strömung) aktuell halten: über /ws/nav,
+     *  solange der Kanal offen ist, sonst throttled GET (8s / >~40m). */
     _maybeFetchNavPoint() {
-        if (!document.querySelector('[data-nav-instrument]')) return;
+        if (!document.querySelector('[data-nav-instrument]')) {
+            const ns = this._navStreamState;
+            if (ns && ns.ws) { ns.ws.close(); ns.ws = null; }
+            return;
+        }
         const c = (window.BoatOS && window.BoatOS.context) || {};
         const pos = c.currentPosition;
         if (!pos || typeof pos.lat !== 'number') return;
+
+        const ws = this._navStream();
+        if (ws && ws.readyState === WebSocket.OPEN) {
+            // Eigene Position nur mitschicken, wenn sie sich geändert hat —
+            // ob neu gerechnet wird, entscheidet das Backend (Schwelle)
+            const ns = this._navStreamState;
+            const cog = (typeof c.cog === 'number') ? Math.round(c.cog) : null;
+            const sog = (typeof c.sog === 'number') ? Math.round(c.sog * 10) / 10 : null;
+            const key = `${pos.lat.toFixed(4)},${pos.lon.toFixed(4)},${cog}`;
+            if (ns.sent !== key) {
+                ns.sent = key;
+                ws.send(JSON.stringify({ lat: pos.lat, lon: pos.lon, cog, sog }));
+            }
+            return;
+        }
+        if (ws) return;   // Verbindungsaufbau läuft
+
         const st = this._navPointState ||
             (this._navPointState = { t: 0, lat: null, lon: null, busy: false });
         if (st.busy) return;
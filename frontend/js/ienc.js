@@ -22,6 +22,13 @@ let clickHandlersBound = false;
 let popup = null;
 
 const TILES_URL = `${location.protocol}//${location.host}/api/enc/tiles/{z}/{x}/{y}.pbf`;
+// Datensatz-Version aus /api/enc/tiles/status — als ?v= an der Tile-URL darf
+// der Browser die Tiles unbegrenzt cachen; nach einem Rebuild neue Version
+let iencVersion = null;
+
+function _tilesUrl(version) {
+    return version ? `${TILES_URL}?v=${version}` : TILES_URL;
+}
 const BEFORE_LAYER = 'route-shadow-line'; // Route/Track bleiben über IENC
 
 // Deutsche Anzeigenamen der S-57-/IENC-Objektklassen (für Popups)
@@ -106,7 +113,11 @@ async function _addIENCLayersInner(map) {
     let available = false;
     try {
         const r = await fetch('/api/enc/tiles/status', { signal: AbortSignal.timeout(2000) });
-        if (r.ok) available = (await r.json()).available === true;
+        if (r.ok) {
+            const st = await r.json();
+            available = st.available === true;
+            iencVersion = st.version || null;
+        }
     } catch (_) {}
     if (!available) {
         console.log('IENC: keine Vektor-Tiles vorhanden (kein Gewässer installiert/aktiviert)');
@@ -122,7 +133,7 @@ async function _addIENCLayersInner(map) {
 
     map.addSource('ienc', {
         type: 'vector',
-        tiles: [TILES_URL],
+        tiles: [_tilesUrl(iencVersion)],
         minzoom: 8,
         maxzoom: 14, // darüber Overzoom
         attribution: '© WSV (Inland ENC)',
@@ -164,7 +175,28 @@ export function toggleIENCLayer(visible) {
             iencMap.setLayoutProperty(id, 'visibility', visible ? 'visible' : 'none');
         }
     }
+    if (visible) refreshIENCTiles();
+}
+
+/**
+ * Tile-URL auf die aktuelle Datensatz-Version umstellen (nach einem
+ * IENC-Rebuild). Unveränderte Version → nichts zu tun, der Browser-Cache
+ * bleibt gültig.
+ */
+export async function refreshIENCTiles() {
+    const src = iencMap && iencMap.getSource('ienc');
+    if (!src) return;
+    try {
+        const r = await fetch('/api/enc/tiles/status', { signal: AbortSignal.timeout(2000) });
+        if (!r.ok) return;
+        const version = (await r.json()).version || null;
+        if (version === iencVersion) return;
+        iencVersion = version;
+        src.setTiles([_tilesUrl(version)]);
+    } catch (_) {}
 }
+// charts.js (klassisches Script) ruft das nach Ende eines ENC-Jobs auf
+window.refreshIENCTiles = refreshIENCTiles;
 
 export function isIENCVisible() {
     return iencVisible;
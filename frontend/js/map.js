@@ -606,10 +606,15 @@ export async function addOpenSeaMapOverlays() {
 
         // Pruefen ob lokale Seamark-MBTiles verfuegbar
         let localAvailable = false;
+        let seamarkVersion = null;
         try {
             const r = await fetch('/api/map/seamarks/status',
                 { signal: AbortSignal.timeout(2000) });
-            if (r.ok) localAvailable = (await r.json()).available;
+            if (r.ok) {
+                const st = await r.json();
+                localAvailable = st.available;
+                seamarkVersion = st.version || null;
+            }
         } catch (_) {}
 
         if (localAvailable) {
@@ -625,7 +630,9 @@ export async function addOpenSeaMapOverlays() {
             // Lokale Vektor-Seezeichen
             map.addSource('seamark-local', {
                 type: 'vector',
-                tiles: [`${location.protocol}//${location.host}/api/map/seamarks/{z}/{x}/{y}.pbf`],
+                // ?v= = Datensatz-Version → Tiles dürfen im Browser 'immutable' sein
+                tiles: [`${location.protocol}//${location.host}/api/map/seamarks/{z}/{x}/{y}.pbf`
+                        + (seamarkVersion ? `?v=${seamarkVersion}` : '')],
                 minzoom: 8,
                 maxzoom: 14,
                 attribution: '© OpenSeaMap contributors'
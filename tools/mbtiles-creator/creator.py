@@ -8,7 +8,9 @@ import ctypes
 import json
 import re
 import shutil
+import struct
 import sys
+from array import array
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -343,6 +345,65 @@ def pbf_to_mbtiles_name(url: str) -> str:
     return stem + ".mbtiles"
 
 
+# ── Routing-Datei (.routing v2) ───────────────────────────────────────────────
+# Binärformat, das das BoatOS-Backend per mmap ohne Parsen nutzt. Spezifikation
+# und Lesecode: backend/app/osrm_routing.py ("ROUTING-FORMAT v2") — beide
+# Seiten müssen Byte für Byte übereinstimmen.
+
+ROUTING_V2_MAGIC = b"BOATRTG2"
+ROUTING_V2_HEADER = struct.Struct("<8sIIQQQdQQ")
+ROUTING_CELL_DEG = 0.1   # Gitterzelle des Backend-Routers (WaterwayGraphRouter.CELL)
+
+
+def _write_routing_v2(path: Path, nodes: dict, edges: list, meta: dict):
+    """nodes {osm_id: (lat, lon)}, edges [(von, nach, meter)] → .routing v2:
+    CSR-Arrays (dichte Knotenindizes) plus Knoten-Gitter, zuletzt JSON-Metadaten."""
+    ids = array('q', sorted(nodes))
+    n = len(ids)
+    index = {nid: i for i, nid in enumerate(ids)}
+    lat = array('d', (nodes[nid][0] for nid in ids))
+    lon = array('d', (nodes[nid][1] for nid in ids))
+
+    # Kanten stabil nach Startknoten sortiert → je Knoten bleibt die Weg-Reihenfolge
+    edges = sorted(((index[a], index[b], d) for a, b, d in edges), key=lambda e: e[0])
+    off = array('I', bytes(4 * (n + 1)))
+    for a, _, _ in edges:
+        off[a + 1] += 1
+    for i in range(n):
+        off[i + 1] += off[i]
+    tgt = array('I', (e[1] for e in edges))
+    dist = array('d', (e[2] for e in edges))
+
+    def cell_key(i):
+        return (((int(lon[i] / ROUTING_CELL_DEG) + 0x8000) << 16)
+                | (int(lat[i] / ROUTING_CELL_DEG) + 0x8000))
+    keys = [cell_key(i) for i in range(n)]
+    cell_nodes = array('I', sorted(range(n), key=keys.__getitem__))
+    cells, cell_off = array('q'), array('I')
+    for pos, i in enumerate(cell_nodes):
+        if not cells or cells[-1] != keys[i]:
+            cells.append(keys[i])
+            cell_off.append(pos)
+    cell_off.append(n)
+
+    sections = [ids, lat, lon, off, tgt, dist, cells, cell_off, cell_nodes]
+    meta = dict(meta, format=2, node_count=n, edge_count=len(edges))
+    meta_raw = json.dumps(meta).encode()
+    pos = ROUTING_V2_HEADER.size
+    for data in sections:
+        pos = (pos + len(data) * data.itemsize + 7) & ~7
+    with open(path, 'wb') as f:
+        f.write(ROUTING_V2_HEADER.pack(ROUTING_V2_MAGIC, 2, 0, n, len(edges), len(cells),
+                                       ROUTING_CELL_DEG, pos, len(meta_raw)))
+        for data in sections:
+            if sys.byteorder != 'little':
+                data = array(data.typecode, data)
+                data.byteswap()
+            f.write(data.tobytes())
+            f.write(bytes(-f.tell() % 8))
+        f.write(meta_raw)
+
+
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -1066,7 +1127,7 @@ class App(tk.Tk):
             return False
 
     def _step_build_routing(self, pbf_path: Path):
-        """Extract waterway network from PBF and write .routing SQLite file."""
+        """Extract waterway network from PBF and write a .routing (v2) file."""
         self._log_line(self.t('step_routing'))
 
         try:
@@ -1173,40 +1234,17 @@ class App(tk.Tk):
         self._set_progress(80, self.t('routing_write', name=routing_path.name))
 
         routing_path.unlink(missing_ok=True)
-        con = sqlite3.connect(str(routing_path))
-        try:
-            con.execute("PRAGMA journal_mode=DELETE")
-            con.execute("PRAGMA synchronous=FULL")
-            con.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)")
-            con.execute(
-                "CREATE TABLE nodes "
-                "(id INTEGER PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL)"
-            )
-            con.execute(
-                "CREATE TABLE edges "
-                "(from_node INTEGER NOT NULL, to_node INTEGER NOT NULL, distance_m REAL NOT NULL)"
-            )
-            lats = [v[0] for v in handler.nodes.values()]
-            lons = [v[1] for v in handler.nodes.values()]
-            con.executemany("INSERT OR IGNORE INTO metadata VALUES (?,?)", [
-                ("region", region),
-                ("node_count", str(n)),
-                ("edge_count", str(e)),
-                ("bbox_minlat", str(min(lats))),
-                ("bbox_maxlat", str(max(lats))),
-                ("bbox_minlon", str(min(lons))),
-                ("bbox_maxlon", str(max(lons))),
-                ("created_at", datetime.now().isoformat()),
-            ])
-            con.executemany(
-                "INSERT INTO nodes VALUES (?,?,?)",
-                [(nid, lat, lon) for nid, (lat, lon) in handler.nodes.items()],
-            )
-            con.executemany("INSERT INTO edges VALUES (?,?,?)", handler.edges)
-            con.execute("CREATE INDEX idx_edges_from ON edges(from_node)")
-            con.commit()
-        finally:
-            con.close()
+        lats = [v[0] for v in handler.nodes.values()]
+        lons = [v[1] for v in handler.nodes.values()]
+        _write_routing_v2(routing_path, handler.nodes, handler.edges, {
+            "region": region,
+            "sources": [region],
+            "bbox_minlat": min(lats),
+            "bbox_maxlat": max(lats),
+            "bbox_minlon": min(lons),
+            "bbox_maxlon": max(lons),
+            "created_at": datetime.now().isoformat(),
+        })
 
         mb = routing_path.stat().st_size / 1e6
         self._log_line(self.t('routing_done', name=routing_path.name, mb=mb))